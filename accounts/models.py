@@ -84,7 +84,9 @@ class User(AbstractUser):
     
     @property
     def warehouse_address(self):
-        return f"{self.get_full_name()} #{self.customer_id}\n123 NW 21st St\nMiami, FL 33142\nÉtats-Unis"
+        # Entrepôt par défaut en cache (addresses.warehouse) : aucune requête
+        from addresses.warehouse import get_warehouse_address
+        return get_warehouse_address(self)
     
     def __str__(self):
         return f"{self.email} ({self.get_role_display()})"
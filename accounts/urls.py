@@ -1,4 +1,5 @@
 from django.urls import path
+from core.async_api import deployment_view
 from . import views
 
 app_name = 'accounts'
@@ -14,7 +15,7 @@ urlpatterns = [
     path('profile/update/', views.update_profile_view, name='update_profile'),
     
     # Recherche clients (pour agents in)
-    path('clients/search/', views.search_clients_view, name='search_clients'),
+    path('clients/search/', deployment_view(views.search_clients_view, views.asearch_clients_view), name='search_clients'),
     
     # Admin endpoints
     path('admin/users/', views.UserListView.as_view(), name='admin_user_list'),
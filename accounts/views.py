@@ -5,8 +5,12 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
 from django.db.models import Q
 from django.core.paginator import Paginator
-from django.core.cache import cache
+from django.views.decorators.http import require_safe
+from asgiref.sync import sync_to_async
 import hashlib
+import math
+from core.async_api import aget_user, json_response, not_authenticated
+from core.cache import aget_or_compute, get_or_compute
 from .models import User
 from .serializers import (
     UserRegistrationSerializer,
@@ -15,6 +19,9 @@ from .serializers import (
     UserUpdateSerializer
 )
 
+SEARCH_CACHE_TIMEOUT = 300
+SEARCH_STALE_TIMEOUT = 60
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def register_view(request):
@@ -102,13 +109,50 @@ def search_clients_view(request):
             'page': page
         })
     
-    # Générer une clé de cache basée sur la requête
-    cache_key = f"client_search:{hashlib.md5(f'{query}:{page}:{page_size}'.encode()).hexdigest()}"
-    cached_result = cache.get(cache_key)
+    # 5 minutes, puis 1 minute de valeur périmée servie pendant le recalcul
+    result = get_or_compute(
+        'client_search', _search_cache_key(query, page, page_size), lambda: _search_clients(query, page, page_size),
+        SEARCH_CACHE_TIMEOUT, SEARCH_STALE_TIMEOUT,
+    )
+    return Response(result)
+
+@require_safe
+async def asearch_clients_view(request):
+    """search_clients_view pour un déploiement ASGI (vue async, ORM async)"""
+    user = await aget_user(request)
+    if user is None:
+        return not_authenticated(request)
+    
+    # Vérifier que l'utilisateur est un agent in
+    if user.role != 'agent_in':
+        return json_response(
+            {'error': 'Seuls les agents de réception peuvent rechercher des clients'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    query = request.GET.get('q', '').strip()
+    page = int(request.GET.get('page', 1))
+    page_size = min(int(request.GET.get('page_size', 10)), 50)  # Max 50 résultats par page
     
-    if cached_result:
-        return Response(cached_result)
+    if not query or len(query) < 2:
+        return json_response({
+            'results': [],
+            'count': 0,
+            'has_more': False,
+            'page': page
+        })
     
+    result = await aget_or_compute(
+        'client_search', _search_cache_key(query, page, page_size), lambda: _asearch_clients(query, page, page_size),
+        SEARCH_CACHE_TIMEOUT, SEARCH_STALE_TIMEOUT,
+    )
+    return json_response(result)
+
+def _search_cache_key(query, page, page_size):
+    return f"client_search:{hashlib.md5(f'{query}:{page}:{page_size}'.encode()).hexdigest()}"
+
+def _search_querysets(query):
+    """(correspondances exactes, correspondances partielles) ; aucune requête exécutée"""
     # Optimiser la requête avec select_related et préfiltrage
     base_queryset = User.objects.filter(role='client').select_related('profile')
     
@@ -118,40 +162,43 @@ def search_clients_view(request):
         Q(email__iexact=query)
     )
     
+    # Recherche sur tous les champs avec pondération intelligente
+    search_query = (
+        Q(first_name__icontains=query) |
+        Q(last_name__icontains=query) |
+        Q(customer_id__icontains=query) |
+        Q(phone__icontains=query) |
+        Q(email__icontains=query)
+    )
+    
+    partial_matches = base_queryset.filter(search_query)
+    
+    # Ordonner par pertinence : d'abord les correspondances au début du nom
+    partial_matches = partial_matches.extra(
+        select={
+            'name_match_priority': """
+                CASE 
+                    WHEN first_name ILIKE %s THEN 1
+                    WHEN last_name ILIKE %s THEN 1
+                    WHEN customer_id ILIKE %s THEN 2
+                    WHEN email ILIKE %s THEN 3
+                    WHEN phone ILIKE %s THEN 4
+                    ELSE 5
+                END
+            """
+        },
+        select_params=[f'{query}%', f'{query}%', f'{query}%', f'{query}%', f'{query}%']
+    ).order_by('name_match_priority', 'first_name', 'last_name')
+    return exact_matches, partial_matches
+
+def _search_clients(query, page, page_size):
+    """Page de résultats de la recherche, calculée quand le cache ne l'a pas"""
+    exact_matches, partial_matches = _search_querysets(query)
     # Recherche partielle si pas de correspondance exacte
-    if not exact_matches.exists():
-        # Recherche sur tous les champs avec pondération intelligente
-        search_query = (
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(customer_id__icontains=query) |
-            Q(phone__icontains=query) |
-            Q(email__icontains=query)
-        )
-        
-        partial_matches = base_queryset.filter(search_query)
-        
-        # Ordonner par pertinence : d'abord les correspondances au début du nom
-        partial_matches = partial_matches.extra(
-            select={
-                'name_match_priority': """
-                    CASE 
-                        WHEN first_name ILIKE %s THEN 1
-                        WHEN last_name ILIKE %s THEN 1
-                        WHEN customer_id ILIKE %s THEN 2
-                        WHEN email ILIKE %s THEN 3
-                        WHEN phone ILIKE %s THEN 4
-                        ELSE 5
-                    END
-                """
-            },
-            select_params=[f'{query}%', f'{query}%', f'{query}%', f'{query}%', f'{query}%']
-        ).order_by('name_match_priority', 'first_name', 'last_name')
-    else:
-        partial_matches = exact_matches
+    matches = exact_matches if exact_matches.exists() else partial_matches
     
     # Ordonner par pertinence (correspondances exactes d'abord)
-    clients_queryset = partial_matches.order_by('first_name', 'last_name')
+    clients_queryset = matches.order_by('first_name', 'last_name')
     
     # Pagination
     paginator = Paginator(clients_queryset, page_size)
@@ -161,18 +208,35 @@ def search_clients_view(request):
     except:
         clients_page = paginator.page(1)
     
-    # Sérialiser les résultats
-    serializer = UserSerializer(clients_page.object_list, many=True)
-    
-    result = {
-        'results': serializer.data,
+    return {
+        'results': UserSerializer(clients_page.object_list, many=True).data,
         'count': paginator.count,
         'has_more': clients_page.has_next(),
         'page': clients_page.number,
         'total_pages': paginator.num_pages
     }
+
+async def _asearch_clients(query, page, page_size):
+    """_search_clients avec l'ORM async"""
+    exact_matches, partial_matches = _search_querysets(query)
+    matches = exact_matches if await exact_matches.aexists() else partial_matches
+    clients_queryset = matches.order_by('first_name', 'last_name')
     
-    # Mettre en cache pendant 5 minutes
-    cache.set(cache_key, result, 300)
+    # Pagination (une page invalide renvoie la première, comme Paginator)
+    count = await clients_queryset.acount()
+    total_pages = max(1, math.ceil(count / page_size))
+    if not 1 <= page <= total_pages:
+        page = 1
+    offset = (page - 1) * page_size
+    clients = [client async for client in clients_queryset[offset:offset + page_size]]
     
-    return Response(result)
+    # Sérialiser les résultats (warehouse_address peut recharger un instantané : hors de la boucle async)
+    results = await sync_to_async(lambda: UserSerializer(clients, many=True).data)()
+    
+    return {
+        'results': results,
+        'count': count,
+        'has_more': page < total_pages,
+        'page': page,
+        'total_pages': total_pages
+    }
@@ -27,7 +27,8 @@ class AddressAdmin(admin.ModelAdmin):
             'fields': (
                 'country', 'city', 
                 'address_line1', 'address_line2', 
-                'postal_code'
+                'postal_code',
+                ('latitude', 'longitude'),
             )
         }),
         ('📞 Contact', {
@@ -39,16 +40,6 @@ class AddressAdmin(admin.ModelAdmin):
         }),
     )
     
-    def save_model(self, request, obj, form, change):
-        # S'assurer qu'il n'y a qu'un seul entrepôt par défaut
-        if obj.is_default_warehouse and obj.type == 'warehouse':
-            Address.objects.filter(
-                type='warehouse', 
-                is_default_warehouse=True
-            ).exclude(pk=obj.pk).update(is_default_warehouse=False)
-        
-        super().save_model(request, obj, form, change)
-    
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('services')
 
@@ -0,0 +1,102 @@
+"""
+Listes d'adresses pré-rendues en JSON, partagées par tous les utilisateurs,
+et index spatial des points de retrait construit à partir des mêmes données.
+
+Chaque adresse est sérialisée une seule fois par version ; seule
+personalized_address dépend de l'utilisateur : le JSON de l'adresse est
+découpé autour de ce champ et la valeur est insérée à chaque requête.
+La version est changée après toute écriture sur Address/AddressService.
+"""
+import json
+from collections import namedtuple
+
+from rest_framework.renderers import JSONRenderer
+
+from core.snapshots import VersionedSnapshot
+from .models import Address
+from .serializers import AddressSerializer
+from .spatial import KDTree
+
+ADDRESSES_VERSION_KEY = 'addresses:version'
+
+# Nom de liste -> type d'adresse (None : toutes les adresses actives)
+LISTINGS = {
+    'all': None,
+    'warehouse': 'warehouse',
+    'office': 'office',
+}
+
+# Types d'adresse proposés par la recherche de proximité
+PICKUP_TYPES = ('pickup_point', 'office')
+
+PERSONALIZED_PLACEHOLDER = '__personalized_address__'
+
+# head + valeur de personalized_address + tail = JSON de l'adresse
+RenderedAddress = namedtuple('RenderedAddress', ['head', 'tail', 'personalized_body'])
+
+AddressSnapshot = namedtuple('AddressSnapshot', ['listings', 'pickup_indexes'])
+
+
+def _render_address(address, data):
+    data['personalized_address'] = PERSONALIZED_PLACEHOLDER
+    head, tail = JSONRenderer().render(data).split(
+        json.dumps(PERSONALIZED_PLACEHOLDER).encode(), 1
+    )
+    return RenderedAddress(head, tail, address.personalized_address_body())
+
+
+def _build_pickup_indexes(addresses, rendered):
+    """Un arbre k-d par type de service disponible (clé None : tous les points)"""
+    located = {}
+    for address, entry in zip(addresses, rendered):
+        if address.type not in PICKUP_TYPES or address.latitude is None or address.longitude is None:
+            continue
+        point = (float(address.latitude), float(address.longitude), entry)
+        located.setdefault(None, []).append(point)
+        for service in address.services.all():
+            if service.is_available:
+                located.setdefault(service.service_type, []).append(point)
+    return {service_type: KDTree(points) for service_type, points in located.items()}
+
+
+def _load_addresses():
+    addresses = list(Address.objects.filter(is_active=True).prefetch_related('services'))
+    rendered = [
+        _render_address(address, data)
+        for address, data in zip(addresses, AddressSerializer(addresses, many=True).data)
+    ]
+    listings = {
+        name: tuple(
+            entry for address, entry in zip(addresses, rendered)
+            if address_type in (None, address.type)
+        )
+        for name, address_type in LISTINGS.items()
+    }
+    return AddressSnapshot(listings, _build_pickup_indexes(addresses, rendered))
+
+
+address_listings = VersionedSnapshot(ADDRESSES_VERSION_KEY, _load_addresses)
+
+
+def get_address_listing(name):
+    return address_listings.get().listings[name]
+
+
+def nearest_pickup_points(latitude, longitude, k, service_type=None):
+    """(distance_km, RenderedAddress) des k points de retrait actifs les plus proches"""
+    index = address_listings.get().pickup_indexes.get(service_type)
+    if index is None:
+        return []
+    return index.nearest(latitude, longitude, k)
+
+
+def render_address(entry, user):
+    """JSON d'une adresse avec personalized_address calculé pour l'utilisateur"""
+    value = None
+    if entry.personalized_body is not None and user.is_authenticated:
+        value = Address.format_personalized_address(entry.personalized_body, user)
+    return entry.head + json.dumps(value, ensure_ascii=False).encode() + entry.tail
+
+
+def render_address_list(entries, user):
+    return b'[' + b','.join(render_address(entry, user) for entry in entries) + b']'
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0002_address_state_address_street_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Longitude'),
+        ),
+    ]
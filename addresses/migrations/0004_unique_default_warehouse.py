@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def keep_single_default_warehouse(apps, schema_editor):
+    """Conserve comme entrepôt par défaut le plus récemment modifié"""
+    Address = apps.get_model('addresses', 'Address')
+    Address.objects.filter(is_default_warehouse=True).exclude(type='warehouse').update(
+        is_default_warehouse=False
+    )
+    defaults = Address.objects.filter(is_default_warehouse=True).order_by('-updated_at', '-pk')
+    keep = defaults.values_list('pk', flat=True).first()
+    if keep is not None:
+        defaults.exclude(pk=keep).update(is_default_warehouse=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0003_address_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_single_default_warehouse, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default_warehouse', True)), fields=('is_default_warehouse',), name='unique_default_warehouse'),
+        ),
+    ]
@@ -1,5 +1,5 @@
-from django.db import models
-from django.core.validators import RegexValidator
+from django.db import models, transaction
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 
 
 class Address(models.Model):
@@ -62,6 +62,24 @@ class Address(models.Model):
         verbose_name="Code postal"
     )
     
+    # Coordonnées GPS (recherche des points les plus proches)
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        verbose_name="Latitude"
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        verbose_name="Longitude"
+    )
+    
     # Contact
     phone_regex = RegexValidator(
         regex=r'^\+?1?\d{9,15}$',
@@ -107,10 +125,30 @@ class Address(models.Model):
         verbose_name = "Adresse"
         verbose_name_plural = "Adresses"
         ordering = ['display_order', 'name']
+        constraints = [
+            # Un seul entrepôt par défaut (index unique partiel)
+            models.UniqueConstraint(
+                fields=['is_default_warehouse'],
+                condition=models.Q(is_default_warehouse=True),
+                name='unique_default_warehouse',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.city}, {self.get_country_display()}"
     
+    def save(self, *args, **kwargs):
+        # Seul un entrepôt peut être l'entrepôt par défaut, et il remplace l'ancien
+        if self.type != 'warehouse':
+            self.is_default_warehouse = False
+        if not self.is_default_warehouse:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            Address.objects.filter(is_default_warehouse=True).exclude(pk=self.pk).update(
+                is_default_warehouse=False
+            )
+            super().save(*args, **kwargs)
+    
     @property
     def full_address(self):
         """Retourne l'adresse complète formatée"""
@@ -134,13 +172,12 @@ class Address(models.Model):
         }
         return flags.get(self.country, '🌍')
     
-    def get_personalized_address(self, user):
-        """Génère une adresse personnalisée pour un utilisateur"""
+    def personalized_address_body(self):
+        """Partie de l'adresse personnalisée commune à tous les utilisateurs"""
         if self.type != 'warehouse':
             return None
             
         lines = []
-        lines.append(f"{user.first_name} {user.last_name}")
         lines.append(self.name)
         lines.append(self.address_line1)
         if self.address_line2:
@@ -149,9 +186,20 @@ class Address(models.Model):
         if self.postal_code:
             lines.append(self.postal_code)
         lines.append(self.get_country_display())
-        lines.append(f"Ref: {user.id}")
         
         return "\n".join(lines)
+    
+    @staticmethod
+    def format_personalized_address(body, user):
+        """Ajoute le nom et l'identifiant client de l'utilisateur à la partie commune"""
+        return f"{user.get_full_name()} #{user.customer_id}\n{body}"
+    
+    def get_personalized_address(self, user):
+        """Génère une adresse personnalisée pour un utilisateur"""
+        body = self.personalized_address_body()
+        if body is None:
+            return None
+        return self.format_personalized_address(body, user)
 
 
 class AddressService(models.Model):
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Address, AddressService
 
@@ -26,7 +27,7 @@ class AddressSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'type', 'name', 'country', 'country_display', 'country_flag',
             'city', 'address_line1', 'address_line2', 'postal_code',
-            'phone', 'email', 'hours', 'full_address', 'personalized_address',
+            'latitude', 'longitude', 'phone', 'email', 'hours', 'full_address', 'personalized_address',
             'is_active', 'is_default_warehouse', 'display_order',
             'services'
         ]
@@ -51,43 +52,62 @@ class AddressWriteSerializer(serializers.ModelSerializer):
         model = Address
         fields = [
             'id', 'type', 'name', 'country', 'city', 'street_address',
-            'state', 'postal_code', 'phone', 'email', 'hours', 
+            'state', 'postal_code', 'latitude', 'longitude', 'phone', 'email', 'hours', 
             'is_active', 'is_default_warehouse', 'services'
         ]
     
+    def sync_services(self, address, service_types):
+        """
+        Applique la liste des services par différence : une requête de lecture,
+        un DELETE filtré, un UPDATE et un bulk_create, quel que soit le nombre
+        de services. Les services conservés gardent leur additional_info et,
+        comme avant, redeviennent disponibles (is_available=True).
+        """
+        wanted = list(dict.fromkeys(service_types))
+        # service_type -> is_available
+        existing = dict(address.services.values_list('service_type', 'is_available'))
+        
+        removed = set(existing).difference(wanted)
+        if removed:
+            AddressService.objects.filter(address=address, service_type__in=removed).delete()
+        
+        unavailable = [service_type for service_type in wanted if existing.get(service_type) is False]
+        if unavailable:
+            AddressService.objects.filter(address=address, service_type__in=unavailable).update(is_available=True)
+        
+        AddressService.objects.bulk_create([
+            AddressService(address=address, service_type=service_type, is_available=True)
+            for service_type in wanted
+            if service_type not in existing
+        ])
+    
     def create(self, validated_data):
         services_data = validated_data.pop('services', [])
-        address = Address.objects.create(**validated_data)
-        
-        # Créer les services associés
-        for service_type in services_data:
-            AddressService.objects.create(
-                address=address,
-                service_type=service_type,
-                is_available=True
-            )
+        with transaction.atomic():
+            address = Address.objects.create(**validated_data)
+            self.sync_services(address, services_data)
         
         return address
     
     def update(self, instance, validated_data):
         services_data = validated_data.pop('services', None)
         
-        # Mettre à jour l'adresse
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Mettre à jour les services si fournis
-        if services_data is not None:
-            # Supprimer les anciens services
-            instance.services.all().delete()
+        with transaction.atomic():
+            # Mettre à jour l'adresse (le signal post_save invalide aussi les listes en cache)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
             
-            # Créer les nouveaux services
-            for service_type in services_data:
-                AddressService.objects.create(
-                    address=instance,
-                    service_type=service_type,
-                    is_available=True
-                )
+            # Mettre à jour les services si fournis
+            if services_data is not None:
+                self.sync_services(instance, services_data)
         
-        return instance
\ No newline at end of file
+        return instance
+
+
+class NearestPickupQuerySerializer(serializers.Serializer):
+    """Paramètres de la recherche des points de retrait les plus proches"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    service_type = serializers.ChoiceField(choices=AddressService.SERVICE_CHOICES, required=False)
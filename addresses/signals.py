@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .listing import address_listings
+from .models import Address, AddressService
+
+
+@receiver([post_save, post_delete], sender=Address)
+@receiver([post_save, post_delete], sender=AddressService)
+def address_changed(sender, instance, **kwargs):
+    transaction.on_commit(address_listings.invalidate)
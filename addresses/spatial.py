@@ -0,0 +1,77 @@
+"""
+Index spatial en mémoire (arbre k-d) pour la recherche des points les plus proches.
+
+Les coordonnées sont converties en vecteurs unitaires 3D : la distance
+euclidienne entre vecteurs (corde) croît avec la distance sur la sphère,
+ce qui évite les cas particuliers de l'antiméridien et des pôles.
+"""
+import heapq
+import math
+from collections import namedtuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+_Node = namedtuple('_Node', ['point', 'item', 'axis', 'left', 'right'])
+
+
+def to_unit_vector(latitude, longitude):
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """Arbre k-d immuable sur des (latitude, longitude, item)"""
+    
+    def __init__(self, entries):
+        points = [(to_unit_vector(latitude, longitude), item) for latitude, longitude, item in entries]
+        self.size = len(points)
+        self.root = self._build(points, 0)
+    
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda entry: entry[0][axis])
+        middle = len(points) // 2
+        point, item = points[middle]
+        return _Node(
+            point, item, axis,
+            self._build(points[:middle], depth + 1),
+            self._build(points[middle + 1:], depth + 1),
+        )
+    
+    def nearest(self, latitude, longitude, k=5):
+        """Les k items les plus proches, sous forme de (distance_km, item) triés"""
+        if k <= 0 or self.root is None:
+            return []
+        target = to_unit_vector(latitude, longitude)
+        # Tas max (distances négatives) des k meilleurs candidats
+        best = []
+        counter = 0
+        # (noeud, distance minimale possible au sous-arbre)
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(best) == k and bound >= -best[0][0]):
+                continue
+            distance = math.dist(node.point, target)
+            if len(best) < k:
+                heapq.heappush(best, (-distance, counter, node.item))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, counter, node.item))
+            counter += 1
+            
+            delta = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if delta < 0 else (node.right, node.left)
+            # L'autre côté n'est exploré que s'il peut encore contenir un meilleur point
+            stack.append((far, abs(delta)))
+            stack.append((near, bound))
+        
+        return [
+            (chord_to_km(-distance), item)
+            for distance, _, item in sorted(best, reverse=True)
+        ]
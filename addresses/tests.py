@@ -1,3 +1,235 @@
-from django.test import TestCase
+import json
+import math
+import random
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from .models import Address, AddressService
+from .serializers import AddressSerializer, AddressWriteSerializer
+from .spatial import KDTree, chord_to_km, to_unit_vector
+from .warehouse import FALLBACK_WAREHOUSE_BODY, get_warehouse_address
+
+
+def distance_km(lat, lng, latitude, longitude):
+    return chord_to_km(math.dist(to_unit_vector(lat, lng), to_unit_vector(latitude, longitude)))
+
+
+def linear_nearest(entries, latitude, longitude, k):
+    """Parcours complet des points, remplacé par KDTree.nearest"""
+    return sorted((distance_km(lat, lng, latitude, longitude), item) for lat, lng, item in entries)[:k]
+
+
+def create_address(**fields):
+    values = {
+        'type': 'pickup_point', 'name': 'Point Delmas', 'country': 'HT', 'city': 'Port-au-Prince',
+        'address_line1': 'Delmas 33', 'phone': '+50937000000', 'email': 'delmas@example.com', 'hours': 'Lun-Ven',
+    }
+    values.update(fields)
+    return Address.objects.create(**values)
+
+
+SERVICE_TYPES = [service_type for service_type, _ in AddressService.SERVICE_CHOICES]
+
+
+class KDTreeTests(SimpleTestCase):
+    def assertMatchesLinearScan(self, entries, latitude, longitude, k):
+        found = KDTree(entries).nearest(latitude, longitude, k)
+        expected = linear_nearest(entries, latitude, longitude, k)
+
+        self.assertEqual(len(found), len(expected))
+        for (distance, _), (expected_distance, _) in zip(found, expected):
+            self.assertAlmostEqual(distance, expected_distance, places=6)
+        # En cas d'égalité, n'importe lequel des points à égale distance convient
+        items = [item for _, item in found]
+        self.assertEqual(len(set(items)), len(items))
+        by_item = {item: (lat, lng) for lat, lng, item in entries}
+        for distance, item in found:
+            self.assertAlmostEqual(distance_km(*by_item[item], latitude, longitude), distance, places=6)
+
+    def test_random_points_match_linear_scan(self):
+        rng = random.Random(39)
+        for size in (1, 2, 7, 50, 300):
+            entries = [(rng.uniform(-90, 90), rng.uniform(-180, 180), n) for n in range(size)]
+            for _ in range(20):
+                k = rng.randint(1, size + 2)
+                self.assertMatchesLinearScan(entries, rng.uniform(-90, 90), rng.uniform(-180, 180), k)
+
+    def test_haiti_points_match_linear_scan(self):
+        rng = random.Random(3)
+        entries = [(rng.uniform(18.0, 20.1), rng.uniform(-74.5, -71.6), n) for n in range(200)]
+        for _ in range(50):
+            self.assertMatchesLinearScan(entries, rng.uniform(18.0, 20.1), rng.uniform(-74.5, -71.6), 5)
+
+    def test_ties(self):
+        # Points confondus et points symétriques autour de la cible
+        entries = [(18.5, -72.3, n) for n in range(4)] + [(18.6, -72.3, 'nord'), (18.4, -72.3, 'sud')]
+        found = KDTree(entries).nearest(18.5, -72.3, 4)
+        self.assertEqual(sorted(item for _, item in found), [0, 1, 2, 3])
+        self.assertEqual({distance for distance, _ in found}, {0.0})
+
+        found = KDTree(entries).nearest(18.5, -72.3, 6)
+        self.assertEqual({item for _, item in found[4:]}, {'nord', 'sud'})
+        self.assertAlmostEqual(found[4][0], found[5][0], places=6)
+        for _ in range(10):
+            self.assertMatchesLinearScan(entries, 18.5, -72.3, 5)
+
+    def test_empty_tree_and_single_point(self):
+        self.assertEqual(KDTree([]).nearest(18.5, -72.3, 5), [])
+        tree = KDTree([(18.5, -72.3, 'seul')])
+        self.assertEqual(tree.nearest(18.5, -72.3, 0), [])
+        self.assertEqual(tree.nearest(18.5, -72.3, 3), [(0.0, 'seul')])
+        distance, item = tree.nearest(-18.5, 107.7, 1)[0]
+        self.assertEqual(item, 'seul')
+        self.assertAlmostEqual(distance, math.pi * 6371.0088, places=3)
+
+
+class SyncServicesTests(TestCase):
+    def setUp(self):
+        self.address = create_address()
+
+    def services(self):
+        return dict(self.address.services.values_list('service_type', 'is_available'))
+
+    def sync(self, service_types):
+        AddressWriteSerializer().sync_services(self.address, service_types)
+
+    def test_query_count_does_not_depend_on_service_count(self):
+        for count in (2, 4):
+            AddressService.objects.all().delete()
+            AddressService.objects.bulk_create([
+                AddressService(address=self.address, service_type=service_type, is_available=False)
+                for service_type in SERVICE_TYPES[:count * 2]
+            ])
+            # Lecture, suppression (lecture des lignes pour les signaux + DELETE), UPDATE, INSERT
+            with self.assertNumQueries(5):
+                self.sync(SERVICE_TYPES[count:count * 2] + SERVICE_TYPES[-count:])
+            self.assertEqual(set(self.services()), set(SERVICE_TYPES[count:count * 2] + SERVICE_TYPES[-count:]))
+
+        services = list(self.services())
+        with self.assertNumQueries(1):
+            self.sync(services)
+
+    def test_resubmitted_services_become_available_and_keep_their_info(self):
+        kept = AddressService.objects.create(
+            address=self.address, service_type='payments', is_available=False, additional_info='MonCash'
+        )
+        AddressService.objects.create(address=self.address, service_type='consolidation')
+        admin = User.objects.create_user(email='admin@example.com', username='admin', password='secret', is_staff=True)
+
+        response = self.client.patch(
+            reverse('address-update', args=[self.address.pk]),
+            {'services': ['payments', 'package_pickup']}, content_type='application/json',
+            headers={'Authorization': f"Token {Token.objects.create(user=admin).key}"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.services(), {'payments': True, 'package_pickup': True})
+        kept.refresh_from_db()
+        self.assertEqual(kept.additional_info, 'MonCash')
+
+
+class DefaultWarehouseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='client@example.com', username='client', password='secret', first_name='Marie', last_name='Joseph',
+        )
+
+    def create_warehouse(self, name, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_address(type='warehouse', name=name, city='Miami', country='US', **fields)
+
+    def test_second_default_is_rejected(self):
+        first = self.create_warehouse('Miami Nord', is_default_warehouse=True)
+        second = self.create_warehouse('Miami Sud')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.filter(pk=second.pk).update(is_default_warehouse=True)
+
+        # save() retire l'ancien entrepôt par défaut avant d'enregistrer le nouveau
+        second.is_default_warehouse = True
+        second.save()
+        self.assertEqual(list(Address.objects.filter(is_default_warehouse=True)), [second])
+        first.refresh_from_db()
+        self.assertFalse(first.is_default_warehouse)
+
+    def test_snapshot_reloads_after_default_changes(self):
+        self.assertIn(FALLBACK_WAREHOUSE_BODY, get_warehouse_address(self.user))
+
+        self.create_warehouse('Miami Nord', is_default_warehouse=True)
+        self.assertIn('Miami Nord', get_warehouse_address(self.user))
+        with self.assertNumQueries(0):
+            get_warehouse_address(self.user)
+
+        second = self.create_warehouse('Miami Sud')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.is_default_warehouse = True
+            second.save()
+        address = get_warehouse_address(self.user)
+        self.assertTrue(address.startswith(f"Marie Joseph #{self.user.customer_id}\nMiami Sud"))
+
+
+class AddressListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.warehouse = create_address(
+                type='warehouse', name='Miami Nord', city='Miami', country='US', is_default_warehouse=True,
+            )
+            create_address(name='Point Delmas')
+        self.readers = [
+            User.objects.create_user(
+                email=f"{name}@example.com", username=name, password='secret', first_name=name.title(),
+            )
+            for name in ('marie', 'jean')
+        ]
+        admin = User.objects.create_user(email='admin@example.com', username='admin', password='secret', is_staff=True)
+        self.admin_headers = self.auth(admin)
+
+    def auth(self, user):
+        return {'Authorization': f"Token {Token.objects.get_or_create(user=user)[0].key}"}
+
+    def listing(self, user):
+        response = self.client.get(reverse('address-list'), headers=self.auth(user))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return body['results'] if isinstance(body, dict) else body
+
+    def serialized(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        addresses = Address.objects.filter(is_active=True).prefetch_related('services')
+        return json.loads(json.dumps(AddressSerializer(addresses, many=True, context={'request': request}).data))
+
+    def test_overlay_matches_serializer_for_each_reader(self):
+        for user in self.readers:
+            self.assertEqual(self.listing(user), self.serialized(user))
+        warehouse = self.listing(self.readers[1])[0]
+        self.assertTrue(warehouse['personalized_address'].startswith(f"Jean #{self.readers[1].customer_id}\n"))
+
+    def test_write_invalidates_listing_for_other_readers(self):
+        for user in self.readers:
+            self.listing(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('address-update', args=[self.warehouse.pk]), {'name': 'Miami Doral'},
+                content_type='application/json', headers=self.admin_headers,
+            )
+        self.assertEqual(response.status_code, 200)
+
+        for user in self.readers:
+            listing = self.listing(user)
+            self.assertEqual(listing, self.serialized(user))
+            self.assertEqual(listing[0]['name'], 'Miami Doral')
+            self.assertIn('\nMiami Doral\n', listing[0]['personalized_address'])
+
+    def test_deleted_address_leaves_listing(self):
+        self.listing(self.readers[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            Address.objects.get(name='Point Delmas').delete()
+        self.assertEqual([address['name'] for address in self.listing(self.readers[1])], ['Miami Nord'])
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    AddressListView, WarehouseListView, OfficeListView,
+    AddressListView, WarehouseListView, OfficeListView, NearestPickupPointView,
     AddressCreateView, AddressUpdateView, AddressDeleteView
 )
 
@@ -11,4 +11,5 @@ urlpatterns = [
     path('<int:pk>/delete/', AddressDeleteView.as_view(), name='address-delete'),
     path('warehouses/', WarehouseListView.as_view(), name='warehouse-list'),
     path('offices/', OfficeListView.as_view(), name='office-list'),
+    path('nearest/', NearestPickupPointView.as_view(), name='address-nearest'),
 ]
\ No newline at end of file
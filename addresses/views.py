@@ -1,46 +1,81 @@
+import json
+
+from django.http import HttpResponse
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .listing import get_address_listing, nearest_pickup_points, render_address, render_address_list
 from .models import Address
-from .serializers import AddressSerializer, AddressWriteSerializer
+from .serializers import AddressSerializer, AddressWriteSerializer, NearestPickupQuerySerializer
 
 
-class AddressListView(generics.ListAPIView):
+class CachedAddressListView(generics.ListAPIView):
     """
-    Vue pour lister toutes les adresses actives
+    Liste servie depuis le JSON pré-rendu (addresses.listing) : aucune
+    requête SQL ni sérialisation, seule l'adresse personnalisée est calculée
     """
     serializer_class = AddressSerializer
     permission_classes = [IsAuthenticated]
+    listing = 'all'
     
-    def get_queryset(self):
-        return Address.objects.filter(is_active=True).prefetch_related('services')
+    def list(self, request, *args, **kwargs):
+        entries = self.paginate_queryset(get_address_listing(self.listing))
+        results = render_address_list(entries, request.user)
+        if self.paginator is None:
+            return HttpResponse(results, content_type='application/json')
+        
+        # Même enveloppe que PageNumberPagination.get_paginated_response
+        envelope = '{"count":%s,"next":%s,"previous":%s,"results":' % (
+            json.dumps(self.paginator.page.paginator.count),
+            json.dumps(self.paginator.get_next_link()),
+            json.dumps(self.paginator.get_previous_link()),
+        )
+        return HttpResponse(envelope.encode() + results + b'}', content_type='application/json')
+
+
+class AddressListView(CachedAddressListView):
+    """
+    Vue pour lister toutes les adresses actives
+    """
+    listing = 'all'
 
 
-class WarehouseListView(generics.ListAPIView):
+class WarehouseListView(CachedAddressListView):
     """
     Vue pour lister uniquement les entrepôts
     """
-    serializer_class = AddressSerializer
-    permission_classes = [IsAuthenticated]
-    
-    def get_queryset(self):
-        return Address.objects.filter(
-            type='warehouse', 
-            is_active=True
-        ).prefetch_related('services')
+    listing = 'warehouse'
 
 
-class OfficeListView(generics.ListAPIView):
+class OfficeListView(CachedAddressListView):
     """
     Vue pour lister uniquement les bureaux
     """
-    serializer_class = AddressSerializer
+    listing = 'office'
+
+
+class NearestPickupPointView(generics.GenericAPIView):
+    """
+    Points de retrait actifs les plus proches d'une position
+    (?lat=&lng=&k=&service_type=), triés par distance, sans accès à la base
+    """
+    serializer_class = NearestPickupQuerySerializer
     permission_classes = [IsAuthenticated]
     
-    def get_queryset(self):
-        return Address.objects.filter(
-            type='office', 
-            is_active=True
-        ).prefetch_related('services')
+    def get(self, request, *args, **kwargs):
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        
+        results = nearest_pickup_points(
+            params['lat'], params['lng'], params['k'], params.get('service_type')
+        )
+        items = [
+            b'{"distance_km":%s,"address":%s}' % (
+                json.dumps(round(distance, 3)).encode(), render_address(entry, request.user)
+            )
+            for distance, entry in results
+        ]
+        return HttpResponse(b'[' + b','.join(items) + b']', content_type='application/json')
 
 
 class AddressCreateView(generics.CreateAPIView):
@@ -0,0 +1,29 @@
+"""
+Entrepôt par défaut, chargé une fois par version des adresses.
+
+User.warehouse_address est affiché dans toutes les réponses qui contiennent
+un utilisateur : il est rendu à partir de cet instantané, sans requête SQL.
+"""
+from core.snapshots import VersionedSnapshot
+from .listing import ADDRESSES_VERSION_KEY
+from .models import Address
+
+# Adresse utilisée tant qu'aucun entrepôt par défaut n'est configuré
+FALLBACK_WAREHOUSE_BODY = "123 NW 21st St\nMiami, FL 33142\nÉtats-Unis"
+
+
+def _load_default_warehouse():
+    warehouse = Address.objects.filter(
+        type='warehouse', is_default_warehouse=True, is_active=True
+    ).first()
+    if warehouse is None:
+        return FALLBACK_WAREHOUSE_BODY
+    return warehouse.personalized_address_body()
+
+
+default_warehouse = VersionedSnapshot(ADDRESSES_VERSION_KEY, _load_default_warehouse, name='default_warehouse')
+
+
+def get_warehouse_address(user):
+    """Adresse de l'entrepôt par défaut personnalisée pour l'utilisateur"""
+    return Address.format_personalized_address(default_warehouse.get(), user)
@@ -112,19 +112,6 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ('available_variables', 'created_at', 'updated_at')
-    
-    def save_model(self, request, obj, form, change):
-        # Définir les variables disponibles selon le type de template
-        variables_map = {
-            'package_received': '{user_name}, {package_number}, {tracking_number}, {weight}',
-            'shipment_created': '{user_name}, {shipment_number}, {total_cost}, {delivery_address}',
-            'shipment_shipped': '{user_name}, {shipment_number}, {tracking_number}',
-            'shipment_delivered': '{user_name}, {shipment_number}, {delivery_date}',
-            'payment_received': '{user_name}, {amount}, {payment_method}',
-            'account_created': '{user_name}, {warehouse_address}',
-        }
-        obj.available_variables = variables_map.get(obj.name, '')
-        super().save_model(request, obj, form, change)
 
 
 @admin.register(MaintenanceMode)
@@ -0,0 +1,92 @@
+"""
+État du mode maintenance, pré-analysé et partagé par le middleware et la vue.
+
+Les IPs autorisées sont compilées une fois (adresses exactes dans un
+frozenset, plages CIDR dans un tuple de réseaux ipaddress) et l'état n'est
+rechargé que lorsqu'une sauvegarde de MaintenanceMode change la version.
+"""
+import ipaddress
+from collections import namedtuple
+
+from django.conf import settings
+
+from core.snapshots import VersionedSnapshot
+from .models import MaintenanceMode
+
+MAINTENANCE_VERSION_KEY = 'maintenance_mode:version'
+
+MaintenanceState = namedtuple(
+    'MaintenanceState',
+    ['is_enabled', 'message', 'estimated_end_time', 'allowed_addresses', 'allowed_networks']
+)
+
+DISABLED_STATE = MaintenanceState(False, '', None, frozenset(), ())
+
+
+def parse_allowed_ips(text):
+    """Analyse les lignes d'IPs/plages CIDR ; retourne (adresses, réseaux, lignes invalides)"""
+    addresses, networks, invalid = set(), [], []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            network = ipaddress.ip_network(line, strict=False)
+        except ValueError:
+            invalid.append(line)
+            continue
+        if network.num_addresses == 1:
+            addresses.add(network.network_address)
+        else:
+            networks.append(network)
+    return frozenset(addresses), tuple(networks), invalid
+
+
+def _load_state():
+    maintenance = MaintenanceMode.objects.first()
+    if maintenance is None or not maintenance.is_enabled:
+        return DISABLED_STATE
+    addresses, networks, _ = parse_allowed_ips(maintenance.allowed_ips)
+    return MaintenanceState(
+        is_enabled=True,
+        message=maintenance.message,
+        estimated_end_time=maintenance.estimated_end_time,
+        allowed_addresses=addresses,
+        allowed_networks=networks,
+    )
+
+
+maintenance_snapshot = VersionedSnapshot(MAINTENANCE_VERSION_KEY, _load_state)
+
+
+def get_maintenance_state():
+    return maintenance_snapshot.get()
+
+
+async def aget_maintenance_state():
+    return await maintenance_snapshot.aget()
+
+
+def is_ip_allowed(state, ip):
+    try:
+        address = ipaddress.ip_address((ip or '').strip())
+    except ValueError:
+        return False
+    if address in state.allowed_addresses:
+        return True
+    return any(address in network for network in state.allowed_networks)
+
+
+def get_client_ip(request):
+    """
+    IP du client : REMOTE_ADDR, ou derrière TRUSTED_PROXY_COUNT proxys l'entrée
+    de X-Forwarded-For ajoutée par le plus éloigné. Les entrées plus à gauche
+    viennent du client, qui peut les fixer librement.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if not proxies:
+        return request.META.get('REMOTE_ADDR')
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if len(hops) < proxies:
+        return None
+    return hops[-proxies]
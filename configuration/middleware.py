@@ -0,0 +1,42 @@
+from django.http import JsonResponse
+from django.utils.http import http_date
+
+from core.middleware import HybridMiddleware
+from .maintenance import aget_maintenance_state, get_client_ip, get_maintenance_state, is_ip_allowed
+
+
+class MaintenanceModeMiddleware(HybridMiddleware):
+    """
+    Applique le mode maintenance côté serveur sur toutes les routes API.
+    L'admin Django, la vérification de maintenance et la configuration
+    publique restent accessibles.
+    """
+    EXEMPT_PREFIXES = ('/api/config/maintenance/', '/api/config/public/')
+
+    def is_checked(self, request):
+        path = request.path
+        return path.startswith('/api/') and not path.startswith(self.EXEMPT_PREFIXES)
+
+    def call(self, request):
+        if self.is_checked(request):
+            state = get_maintenance_state()
+            if state.is_enabled and not is_ip_allowed(state, get_client_ip(request)):
+                return self.maintenance_response(state)
+        return self.get_response(request)
+
+    async def acall(self, request):
+        if self.is_checked(request):
+            state = await aget_maintenance_state()
+            if state.is_enabled and not is_ip_allowed(state, get_client_ip(request)):
+                return self.maintenance_response(state)
+        return await self.get_response(request)
+
+    def maintenance_response(self, state):
+        response = JsonResponse({
+            'maintenance_mode': True,
+            'message': state.message,
+            'estimated_end_time': state.estimated_end_time,
+        }, status=503)
+        if state.estimated_end_time:
+            response['Retry-After'] = http_date(state.estimated_end_time.timestamp())
+        return response
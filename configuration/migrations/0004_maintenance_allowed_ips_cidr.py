@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configuration', '0003_alter_appconfiguration_air_shipping_rate_per_kg_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenancemode',
+            name='allowed_ips',
+            field=models.TextField(blank=True, help_text='Une IP ou plage CIDR par ligne (ex: 192.168.1.0/24)', verbose_name='IPs autorisées'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator, FileExtensionValidator
 
 
@@ -227,6 +228,16 @@ class NotificationTemplate(models.Model):
         ('account_created', 'Compte créé'),
     ]
     
+    # Variables utilisables dans chaque type de template
+    TEMPLATE_VARIABLES = {
+        'package_received': ('user_name', 'package_number', 'tracking_number', 'weight', 'package_count'),
+        'shipment_created': ('user_name', 'shipment_number', 'total_cost', 'delivery_address'),
+        'shipment_shipped': ('user_name', 'shipment_number', 'tracking_number'),
+        'shipment_delivered': ('user_name', 'shipment_number', 'delivery_date'),
+        'payment_received': ('user_name', 'amount', 'payment_method'),
+        'account_created': ('user_name', 'warehouse_address'),
+    }
+    
     name = models.CharField(max_length=50, choices=TEMPLATE_TYPES, unique=True)
     
     # Email
@@ -253,6 +264,29 @@ class NotificationTemplate(models.Model):
     
     def __str__(self):
         return f"Template {self.get_name_display()}"
+    
+    def declared_variables(self):
+        return self.TEMPLATE_VARIABLES.get(self.name, ())
+    
+    def clean(self):
+        # Refuser les variables non déclarées avant qu'elles n'arrivent aux clients
+        from notifications.rendering import TEMPLATE_FIELDS, TemplateSyntaxError, validate_template
+        
+        errors = {}
+        for field in TEMPLATE_FIELDS:
+            try:
+                unknown = validate_template(getattr(self, field), self.declared_variables())
+            except TemplateSyntaxError as e:
+                errors[field] = f"Template invalide : {e}"
+                continue
+            if unknown:
+                errors[field] = f"Variables non disponibles : {', '.join('{%s}' % name for name in unknown)}"
+        if errors:
+            raise ValidationError(errors)
+    
+    def save(self, *args, **kwargs):
+        self.available_variables = ', '.join('{%s}' % name for name in self.declared_variables())
+        super().save(*args, **kwargs)
 
 
 class MaintenanceMode(models.Model):
@@ -267,7 +301,7 @@ class MaintenanceMode(models.Model):
     allowed_ips = models.TextField(
         blank=True,
         verbose_name="IPs autorisées",
-        help_text="Une IP par ligne"
+        help_text="Une IP ou plage CIDR par ligne (ex: 192.168.1.0/24)"
     )
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -280,3 +314,9 @@ class MaintenanceMode(models.Model):
     def __str__(self):
         status = "Actif" if self.is_enabled else "Inactif"
         return f"Maintenance {status}"
+    
+    def clean(self):
+        from .maintenance import parse_allowed_ips
+        _, _, invalid = parse_allowed_ips(self.allowed_ips)
+        if invalid:
+            raise ValidationError({'allowed_ips': f"Adresses invalides : {', '.join(invalid)}"})
@@ -0,0 +1,113 @@
+"""
+Réponses pré-rendues de la configuration publique.
+
+Le JSON (et sa version gzip) est produit une seule fois par configuration,
+langue et hôte, puis servi tel quel. L'ETag dérive de updated_at, de la
+langue et de l'hôte (les URLs des médias sont absolues) : un If-None-Match
+valide reçoit un 304 avant toute sérialisation.
+"""
+import gzip
+import hashlib
+import threading
+
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .serializers import AppConfigurationSerializer
+
+WELCOME_FIELDS = {
+    'fr': 'welcome_message_fr',
+    'en': 'welcome_message_en',
+}
+DEFAULT_LANGUAGE = 'fr'
+GZIP_MIN_LENGTH = 1024
+
+_lock = threading.Lock()
+_rendered = {}
+_rendered_config = None
+
+
+def available_languages(config):
+    languages = [code.strip().lower() for code in config.available_languages.split(',') if code.strip()]
+    return languages or [DEFAULT_LANGUAGE]
+
+
+def _accept_language_codes(header):
+    """Codes de langue de l'en-tête Accept-Language, par préférence décroissante"""
+    weighted = []
+    for position, item in enumerate(header.split(',')):
+        code, _, params = item.strip().partition(';')
+        if not code or code == '*':
+            continue
+        try:
+            quality = float(params.strip()[2:]) if params.strip().startswith('q=') else 1.0
+        except ValueError:
+            quality = 0.0
+        weighted.append((-quality, position, code.split('-')[0].lower()))
+    return [code for _, _, code in sorted(weighted)]
+
+
+def select_language(config, request):
+    """Langue demandée (?lang= puis Accept-Language) parmi available_languages"""
+    languages = available_languages(config)
+    requested = request.GET.get('lang')
+    if requested:
+        candidates = [requested.lower()]
+    else:
+        candidates = _accept_language_codes(request.META.get('HTTP_ACCEPT_LANGUAGE', ''))
+    for code in candidates:
+        if code in languages:
+            return code
+    return languages[0]
+
+
+def _origin(request):
+    return request.build_absolute_uri('/')
+
+
+def public_config_etag(config, language, request):
+    origin = hashlib.md5(_origin(request).encode()).hexdigest()[:8]
+    return f'W/"{config.id}-{config.updated_at.timestamp():.6f}-{language}-{origin}"'
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # Comparaison faible : les préfixes W/ sont ignorés
+    weak = etag.removeprefix('W/')
+    return any(tag == '*' or tag.removeprefix('W/') == weak for tag in parse_etags(header))
+
+
+def _render(config, language, request):
+    data = dict(AppConfigurationSerializer(config, context={'request': request}).data)
+    # Seul le message d'accueil de la langue demandée est envoyé
+    welcome_field = WELCOME_FIELDS.get(language, WELCOME_FIELDS[DEFAULT_LANGUAGE])
+    for field in WELCOME_FIELDS.values():
+        if field != welcome_field:
+            data.pop(field, None)
+    data['language'] = language
+    return JSONRenderer().render(data)
+
+
+def render_public_config(config, language, request, accepts_gzip):
+    """Retourne (corps, content_encoding) pré-rendu pour cette configuration"""
+    global _rendered_config
+
+    key = (_origin(request), language, accepts_gzip)
+    with _lock:
+        if _rendered_config is not config:
+            _rendered.clear()
+            _rendered_config = config
+        cached = _rendered.get(key)
+    if cached is not None:
+        return cached
+
+    body, encoding = _render(config, language, request), None
+    if accepts_gzip and len(body) >= GZIP_MIN_LENGTH:
+        body, encoding = gzip.compress(body), 'gzip'
+
+    with _lock:
+        if _rendered_config is config:
+            _rendered[key] = (body, encoding)
+    return body, encoding
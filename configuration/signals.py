@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from notifications.rendering import templates_snapshot
+from .maintenance import maintenance_snapshot
+from .models import AppConfiguration, MaintenanceMode, NotificationTemplate
+from .snapshot import config_snapshot
+
+
+@receiver([post_save, post_delete], sender=AppConfiguration)
+def app_configuration_changed(sender, instance, **kwargs):
+    transaction.on_commit(config_snapshot.invalidate)
+
+
+@receiver([post_save, post_delete], sender=MaintenanceMode)
+def maintenance_mode_changed(sender, instance, **kwargs):
+    transaction.on_commit(maintenance_snapshot.invalidate)
+
+
+@receiver([post_save, post_delete], sender=NotificationTemplate)
+def notification_template_changed(sender, instance, **kwargs):
+    transaction.on_commit(templates_snapshot.invalidate)
@@ -0,0 +1,37 @@
+"""
+Instantané en mémoire de la configuration active.
+
+Toutes les lectures de configuration passent par get_config_snapshot() :
+aucune requête ni désérialisation par requête HTTP, rechargement uniquement
+quand une sauvegarde d'AppConfiguration change la version partagée.
+"""
+from collections import namedtuple
+
+from core.snapshots import VersionedSnapshot
+from .models import AppConfiguration
+
+CONFIG_VERSION_KEY = 'app_config:version'
+
+ConfigSnapshot = namedtuple(
+    'ConfigSnapshot',
+    [field.name for field in AppConfiguration._meta.concrete_fields]
+)
+
+
+def _load_config():
+    config = AppConfiguration.get_active_config()
+    return ConfigSnapshot(**{
+        name: getattr(config, name) for name in ConfigSnapshot._fields
+    })
+
+
+config_snapshot = VersionedSnapshot(CONFIG_VERSION_KEY, _load_config)
+
+
+def get_config_snapshot():
+    """Configuration active, immuable (namedtuple)"""
+    return config_snapshot.get()
+
+
+async def aget_config_snapshot():
+    return await config_snapshot.aget()
@@ -1,3 +1,61 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from .maintenance import maintenance_snapshot
+from .models import AppConfiguration, MaintenanceMode
+
+
+class MaintenanceModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        MaintenanceMode.objects.create(is_enabled=True, allowed_ips='10.0.0.5\n192.168.1.0/24')
+        maintenance_snapshot.invalidate()
+        self.url = reverse('shipments:shipping_rates')
+
+    def test_blocks_api_outside_allowlist(self):
+        response = self.client.get(self.url, REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 503)
+
+    def test_allowlisted_address_and_network_pass(self):
+        for ip in ('10.0.0.5', '192.168.1.42'):
+            response = self.client.get(self.url, REMOTE_ADDR=ip)
+            self.assertNotEqual(response.status_code, 503, ip)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxy(self):
+        response = self.client.get(self.url, REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='10.0.0.5')
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_trusted_proxy_hop_is_used(self):
+        # Le client ajoute une fausse entrée à gauche ; le proxy ajoute l'IP réelle à droite
+        spoofed = self.client.get(self.url, REMOTE_ADDR='10.1.1.1', HTTP_X_FORWARDED_FOR='10.0.0.5, 203.0.113.9')
+        self.assertEqual(spoofed.status_code, 503)
+
+        allowed = self.client.get(self.url, REMOTE_ADDR='10.1.1.1', HTTP_X_FORWARDED_FOR='203.0.113.9, 10.0.0.5')
+        self.assertNotEqual(allowed.status_code, 503)
+
+    def test_maintenance_check_stays_reachable(self):
+        response = self.client.get(reverse('configuration:maintenance-check'), REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['maintenance_mode'])
+
+
+class PublicConfigurationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        AppConfiguration.objects.create(is_active=True)
+        self.url = reverse('configuration:public-config')
+
+    def test_revalidation_returns_304(self):
+        etag = self.client.get(self.url, HTTP_HOST='localhost')['ETag']
+        response = self.client.get(self.url, HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(ALLOWED_HOSTS=['localhost', '127.0.0.1'])
+    def test_etag_differs_per_host(self):
+        first = self.client.get(self.url, HTTP_HOST='localhost')
+        other = self.client.get(self.url, HTTP_HOST='127.0.0.1', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other['ETag'], first['ETag'])
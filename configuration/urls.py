@@ -1,20 +1,21 @@
 from django.urls import path
+from core.async_api import deployment_view
 from . import views
 
 app_name = 'configuration'
 
 urlpatterns = [
     # Configuration publique
-    path('public/', views.PublicConfigurationView.as_view(), name='public-config'),
+    path('public/', deployment_view(views.PublicConfigurationView.as_view(), views.apublic_configuration), name='public-config'),
     
     # Configuration admin
     path('admin/', views.AdminConfigurationView.as_view(), name='admin-config'),
     
     # Maintenance
-    path('maintenance/', views.check_maintenance_mode, name='maintenance-check'),
+    path('maintenance/', deployment_view(views.check_maintenance_mode, views.acheck_maintenance_mode), name='maintenance-check'),
     
     # Tarifs d'expédition
-    path('shipping-rates/', views.get_shipping_rates, name='shipping-rates'),
+    path('shipping-rates/', deployment_view(views.get_shipping_rates, views.aget_shipping_rates), name='shipping-rates'),
     path('calculate-shipping/', views.calculate_shipping_cost, name='calculate-shipping'),
     
     # Templates de notification
@@ -1,31 +1,61 @@
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.core.cache import cache
-from .models import AppConfiguration, NotificationTemplate, MaintenanceMode
+from core.async_api import json_response
+from .maintenance import aget_maintenance_state, get_client_ip, get_maintenance_state, is_ip_allowed
+from .models import AppConfiguration, NotificationTemplate
+from .public import etag_matches, public_config_etag, render_public_config, select_language
+from .snapshot import aget_config_snapshot, get_config_snapshot
 from .serializers import (
     AppConfigurationSerializer, 
     AppConfigurationAdminSerializer,
-    NotificationTemplateSerializer,
-    MaintenanceModeSerializer
+    NotificationTemplateSerializer
 )
 
 
+def public_config_response(request, config):
+    """Réponse pré-rendue de la configuration publique, avec ETag/304"""
+    language = select_language(config, request)
+    etag = public_config_etag(config, language, request)
+    
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        accepts_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        body, encoding = render_public_config(config, language, request, accepts_gzip)
+        response = HttpResponse(body, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept-Encoding', 'Accept-Language'))
+    return response
+
+
 class PublicConfigurationView(generics.RetrieveAPIView):
     """
     Endpoint public pour récupérer la configuration de l'app
-    Accessible sans authentification
+    Accessible sans authentification. Réponse pré-rendue, avec ETag/304
+    et variante par langue (?lang= ou Accept-Language).
     """
     serializer_class = AppConfigurationSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_object(self):
-        # Cache la configuration pour 5 minutes
-        config = cache.get('app_config')
-        if not config:
-            config = AppConfiguration.get_active_config()
-            cache.set('app_config', config, 300)  # 5 minutes
-        return config
+        return get_config_snapshot()
+    
+    def retrieve(self, request, *args, **kwargs):
+        return public_config_response(request, self.get_object())
+
+
+@require_safe
+async def apublic_configuration(request):
+    """PublicConfigurationView pour un déploiement ASGI (vue async)"""
+    return public_config_response(request, await aget_config_snapshot())
 
 
 class AdminConfigurationView(generics.RetrieveUpdateAPIView):
@@ -37,12 +67,21 @@ class AdminConfigurationView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAdminUser]
     
     def get_object(self):
-        return AppConfiguration.get_active_config()
-    
-    def update(self, request, *args, **kwargs):
-        # Vider le cache après mise à jour
-        cache.delete('app_config')
-        return super().update(request, *args, **kwargs)
+        # L'instantané suffit en lecture ; la mise à jour a besoin de l'instance
+        # (sa sauvegarde invalide l'instantané de tous les processus)
+        if self.request.method in ('PUT', 'PATCH'):
+            return AppConfiguration.get_active_config()
+        return get_config_snapshot()
+
+
+def maintenance_payload(request, state):
+    if state.is_enabled and not is_ip_allowed(state, get_client_ip(request)):
+        return {
+            'maintenance_mode': True,
+            'message': state.message,
+            'estimated_end_time': state.estimated_end_time
+        }
+    return {'maintenance_mode': False}
 
 
 @api_view(['GET'])
@@ -51,30 +90,16 @@ def check_maintenance_mode(request):
     """
     Vérifie si l'app est en mode maintenance
     """
-    maintenance = MaintenanceMode.objects.first()
-    if maintenance and maintenance.is_enabled:
-        # Vérifier si l'IP est autorisée
-        client_ip = get_client_ip(request)
-        allowed_ips = maintenance.allowed_ips.split('\n') if maintenance.allowed_ips else []
-        
-        if client_ip not in allowed_ips:
-            return Response({
-                'maintenance_mode': True,
-                'message': maintenance.message,
-                'estimated_end_time': maintenance.estimated_end_time
-            })
-    
-    return Response({'maintenance_mode': False})
+    return Response(maintenance_payload(request, get_maintenance_state()))
 
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def get_shipping_rates(request):
-    """
-    Récupère les tarifs d'expédition actuels
-    """
-    config = AppConfiguration.get_active_config()
-    
+@require_safe
+async def acheck_maintenance_mode(request):
+    """check_maintenance_mode pour un déploiement ASGI (vue async)"""
+    return json_response(maintenance_payload(request, await aget_maintenance_state()))
+
+
+def shipping_rates_payload(config):
     rates = {}
     if config.air_shipping_enabled:
         rates['air'] = float(config.air_shipping_rate_per_kg)
@@ -83,12 +108,27 @@ def get_shipping_rates(request):
     if config.express_shipping_enabled:
         rates['express'] = float(config.express_shipping_rate_per_kg)
     
-    return Response({
+    return {
         'rates': rates,
         'handling_fee': float(config.handling_fee_per_package),
         'vat_rate': float(config.vat_rate),
         'usd_to_htg_rate': float(config.usd_to_htg_rate)
-    })
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def get_shipping_rates(request):
+    """
+    Récupère les tarifs d'expédition actuels
+    """
+    return Response(shipping_rates_payload(get_config_snapshot()))
+
+
+@require_safe
+async def aget_shipping_rates(request):
+    """get_shipping_rates pour un déploiement ASGI (vue async)"""
+    return json_response(shipping_rates_payload(await aget_config_snapshot()))
 
 
 @api_view(['POST'])
@@ -100,7 +140,7 @@ def calculate_shipping_cost(request):
     weight = request.data.get('weight', 0)
     shipping_type = request.data.get('shipping_type', 'sea')
     
-    config = AppConfiguration.get_active_config()
+    config = get_config_snapshot()
     
     rate_map = {
         'air': config.air_shipping_rate_per_kg,
@@ -139,12 +179,3 @@ def get_notification_templates(request):
     serializer = NotificationTemplateSerializer(templates, many=True)
     return Response(serializer.data)
 
-
-def get_client_ip(request):
-    """Récupère l'IP réelle du client"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.http import HttpResponse
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'route', 'status_code', 'duration_ms', 'sample_count', 'user')
+    list_filter = ('route', 'status_code')
+    search_fields = ('path', 'route', 'user__email')
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
+    actions = ['download_collapsed_stacks']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Télécharger les piles (format collapsed)')
+    def download_collapsed_stacks(self, request, queryset):
+        content = '\n'.join(profile.collapsed_stacks for profile in queryset if profile.collapsed_stacks)
+        response = HttpResponse(content + '\n', content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="profiles.collapsed"'
+        return response
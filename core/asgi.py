@@ -11,6 +11,8 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'belpanye_backend.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Vues async pour les routes de lecture (core.async_api.deployment_view)
+os.environ.setdefault('ASGI_DEPLOYMENT', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,92 @@
+"""
+Outils communs aux vues async, servies sans DRF.
+
+Sous ASGI, ces vues lisent la base avec l'ORM async de Django et ne
+bloquent pas de thread pendant les requêtes SQL. Sous WSGI, Django les
+exécuterait via async_to_sync avec un changement de thread par requête SQL :
+deployment_view() y garde la vue DRF synchrone. L'authentification reprend
+celle de l'API : session, puis en-tête « Authorization: Token <clé> ».
+"""
+import math
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+NOT_AUTHENTICATED = "Informations d'authentification non fournies."
+
+
+def deployment_view(sync_view, async_view):
+    """Vue async sous ASGI (réglage ASGI_DEPLOYMENT), vue DRF synchrone sinon"""
+    return async_view if settings.ASGI_DEPLOYMENT else sync_view
+
+
+async def aget_user(request):
+    """Utilisateur actif authentifié par session ou par jeton, sinon None"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    header = request.headers.get('Authorization', '').split()
+    if len(header) != 2 or header[0].lower() != 'token':
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=header[1])
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    # Comme DRF : visible des middlewares (journalisation, Server-Timing)
+    request.user = token.user
+    return token.user
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def not_authenticated(request):
+    """
+    Même réponse que DRF : 401 avec WWW-Authenticate si la première classe
+    d'authentification en fournit un, 403 sinon (session)
+    """
+    authenticate_header = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]().authenticate_header(request)
+    if not authenticate_header:
+        return json_response({'detail': NOT_AUTHENTICATED}, status=403)
+    response = json_response({'detail': NOT_AUTHENTICATED}, status=401)
+    response['WWW-Authenticate'] = authenticate_header
+    return response
+
+
+def paginate_list(request, items):
+    """
+    Équivalent de PageNumberPagination pour une liste en mémoire (instantané,
+    cache) : retourne (éléments de la page, enveloppe count/next/previous),
+    ou None si la page n'existe pas.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        return None
+    num_pages = max(1, math.ceil(len(items) / page_size))
+    if not 1 <= number <= num_pages:
+        return None
+
+    offset = (number - 1) * page_size
+    url = request.build_absolute_uri()
+    previous = None
+    if number == 2:
+        previous = remove_query_param(url, 'page')
+    elif number > 2:
+        previous = replace_query_param(url, 'page', number - 1)
+    return items[offset:offset + page_size], {
+        'count': len(items),
+        'next': replace_query_param(url, 'page', number + 1) if number < num_pages else None,
+        'previous': previous,
+    }
+
+
+def invalid_page():
+    return json_response({'detail': 'Page non valide.'}, status=404)
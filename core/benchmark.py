@@ -0,0 +1,400 @@
+"""
+Banc d'essai des endpoints de l'API.
+
+Chaque route de core/urls.py sous api/ est appelée via le client de test
+DRF sur un jeu de données réaliste ; on mesure le temps total, le nombre de
+requêtes SQL et le temps SQL. Chaque appel s'exécute dans une transaction
+annulée : toutes les itérations voient les mêmes données.
+"""
+import json
+import random
+import statistics
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from time import perf_counter
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from addresses.models import Address, AddressService
+from configuration.models import AppConfiguration, NotificationTemplate
+from packages.models import Package, PackageConsolidation
+from reports.rollups import local_day, refresh_days
+from shipments.models import Payment, Shipment, ShippingRate
+from shipments.webhooks import sign_payload
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+BENCHMARK_WEBHOOK_SECRET = 'benchmark-webhook-secret'
+
+HARNESS_SQL = {'BEGIN', 'ROLLBACK'}
+
+Case = namedtuple(
+    'Case',
+    ['url_name', 'method', 'role', 'kwargs', 'data', 'expected_status', 'headers', 'known_failure'],
+    defaults=('get', 'client', None, None, None, None, None),
+)
+
+
+def _value(value, fixtures):
+    return value(fixtures) if callable(value) else value
+
+
+def _webhook_body(fixtures):
+    """Corps brut (bytes) d'une notification MonCash pour le paiement du jeu de données"""
+    return json.dumps({
+        'transaction_id': 'BENCH-TX-2', 'reference': str(fixtures.payment.pk),
+        'amount': str(fixtures.payment.amount), 'status': 'completed',
+    }).encode()
+
+
+def _webhook_headers(fixtures):
+    return {'X-Webhook-Signature': sign_payload(BENCHMARK_WEBHOOK_SECRET, _webhook_body(fixtures))}
+
+
+# --- Données ---------------------------------------------------------------
+
+def seed_benchmark_data(clients=50, packages_per_client=20, seed=42):
+    """Crée le jeu de données et retourne les objets utilisés par les scénarios"""
+    rnd = random.Random(seed)
+    now = timezone.now()
+    password = make_password(BENCHMARK_PASSWORD)
+
+    AppConfiguration.objects.create(is_active=True)
+    for name, label in NotificationTemplate.TEMPLATE_TYPES:
+        NotificationTemplate.objects.create(
+            name=name, email_subject=label, email_body=f"Bonjour {{user_name}}, {label}", sms_body=label
+        )
+
+    admin = User.objects.create(
+        username='bench-admin', email='admin@bench.test', password=password,
+        first_name='Admin', last_name='Bench', role='admin', is_staff=True, is_superuser=True,
+    )
+    agent_in = User.objects.create(
+        username='bench-agent', email='agent@bench.test', password=password,
+        first_name='Agent', last_name='Bench', role='agent_in',
+    )
+    users = User.objects.bulk_create([
+        User(
+            username=f'client{i}', email=f'client{i}@bench.test', password=password,
+            first_name=rnd.choice(['Jean', 'Marie', 'Pierre', 'Rose', 'Paul']), last_name=f'Client{i}',
+            phone=f'+509{i:08d}', customer_id=f'BC{i:06d}', role='client',
+        )
+        for i in range(clients)
+    ])
+
+    ShippingRate.objects.bulk_create([
+        ShippingRate(shipping_type=shipping_type, min_weight=low, max_weight=high,
+                     price_per_kg=price, delivery_days=days)
+        for shipping_type, price, days in (('air', Decimal('4.50'), 5), ('sea', Decimal('2.00'), 21))
+        for low, high in ((0, 50), (Decimal('50.01'), 9999))
+    ])
+
+    warehouse = Address.objects.create(
+        type='warehouse', name='Belpanye Miami', country='US', city='Doral',
+        address_line1='8000 NW 25th St', postal_code='33122', phone='+13055550100',
+        email='miami@bench.test', hours='Lun-Ven: 9h-17h', is_default_warehouse=True,
+    )
+    points = [warehouse]
+    for i in range(30):
+        points.append(Address.objects.create(
+            type='pickup_point' if i % 3 else 'office', name=f'Point {i}', country='HT', city='Port-au-Prince',
+            address_line1=f'{i} Rue Capois', phone='+50922220000', email=f'point{i}@bench.test',
+            hours='Lun-Sam: 8h-16h', latitude=Decimal('18.5') + Decimal(i) / 100,
+            longitude=Decimal('-72.3') + Decimal(i % 5) / 100, display_order=i,
+        ))
+    AddressService.objects.bulk_create([
+        AddressService(address=point, service_type=service_type)
+        for point in points
+        for service_type in ('package_pickup', 'payments', 'customer_service')
+    ])
+
+    packages = []
+    for user in users:
+        for j in range(packages_per_client):
+            announced_at = now - timedelta(days=rnd.randint(0, 60), minutes=rnd.randint(0, 1440))
+            received = j % 5 != 0
+            packages.append(Package(
+                user=user, agent_in=agent_in if received else None,
+                tracking_number=f'BP{user.customer_id}{j:04d}', sender='Amazon',
+                description='Colis', weight=Decimal(rnd.randint(1, 400)) / 10,
+                length=30, width=20, height=10, value=Decimal(rnd.randint(10, 500)),
+                status='received' if received else 'announced', shipping_mode=rnd.choice(['plane', 'boat']),
+                destination='Port-au-Prince', announced_at=announced_at,
+                received_at=announced_at + timedelta(days=2) if received else None,
+            ))
+    Package.objects.bulk_create(packages)
+
+    shipments, payments, shipment_packages = [], [], []
+    for user in users:
+        user_packages = [package for package in packages if package.user_id == user.pk and package.status == 'received']
+        shipped = user_packages[-3:]
+        weight = sum(package.weight for package in shipped)
+        shipment = Shipment(
+            user=user, shipment_number=f'SH{user.customer_id}', shipping_type='air', total_weight=weight,
+            shipping_cost=weight * Decimal('4.50'), total_cost=weight * Decimal('4.50'),
+            delivery_address='Port-au-Prince', recipient_name=user.get_full_name(), recipient_phone=user.phone,
+        )
+        shipments.append(shipment)
+        payments.append(Payment(shipment=shipment, payment_method='moncash', amount=shipment.total_cost))
+        shipment_packages += [(shipment, package) for package in shipped]
+    Shipment.objects.bulk_create(shipments)
+    Payment.objects.bulk_create(payments)
+    Shipment.packages.through.objects.bulk_create([
+        Shipment.packages.through(shipment_id=shipment.pk, package_id=package.pk)
+        for shipment, package in shipment_packages
+    ])
+
+    client = users[0]
+    client_packages = [package for package in packages if package.user_id == client.pk]
+    received = [package for package in client_packages if package.status == 'received']
+    consolidation = PackageConsolidation.objects.create(user=client)
+    consolidation.packages.set(received[:2])
+    consolidation.calculate_totals()
+
+    refresh_days({local_day(package.received_at or package.announced_at) for package in packages})
+
+    return SimpleNamespace(
+        admin=admin,
+        agent_in=agent_in,
+        client=client,
+        package=received[0],
+        spare_packages=received[2:4],
+        announced_package=next(package for package in client_packages if package.status == 'announced'),
+        consolidation=consolidation,
+        shipment=shipments[0],
+        payment=payments[0],
+        rate=ShippingRate.objects.first(),
+        address=points[1],
+    )
+
+
+# --- Scénarios ---------------------------------------------------------------
+
+CASES = [
+    # Comptes
+    Case('accounts:register', 'post', 'anonymous', data={
+        'email': 'new@bench.test', 'username': 'new-client', 'first_name': 'Nouveau', 'last_name': 'Client',
+        'phone': '+50900000001', 'password': BENCHMARK_PASSWORD, 'password_confirm': BENCHMARK_PASSWORD,
+    }),
+    Case('accounts:login', 'post', 'anonymous', data=lambda f: {'email': f.client.email, 'password': BENCHMARK_PASSWORD}),
+    Case('accounts:logout', 'post'),
+    Case('accounts:profile'),
+    Case('accounts:update_profile', 'patch', data={'first_name': 'Jean'}),
+    Case('accounts:search_clients', role='agent_in', data={'q': 'Jean'}),
+    Case('accounts:admin_user_list', role='admin'),
+    Case('accounts:admin_user_detail', role='admin', kwargs=lambda f: {'pk': f.client.pk}),
+
+    # Colis
+    Case('packages:package_list_create'),
+    Case('packages:package_list_create', 'post', data={
+        'sender': 'Amazon', 'description': 'Colis', 'weight': 2, 'length': 10, 'width': 10, 'height': 10, 'value': 50,
+    }),
+    Case('packages:package_detail', kwargs=lambda f: {'pk': f.package.pk}),
+    Case('packages:package_tracking', role='anonymous', kwargs=lambda f: {'tracking_number': f.package.tracking_number}),
+    Case('packages:package_registration', 'post', 'agent_in', data=lambda f: {
+        'client_email': f.client.email, 'sender': 'eBay', 'description': 'Colis', 'weight': 3,
+        'length': 10, 'width': 10, 'height': 10, 'value': 80, 'shipping_mode': 'plane',
+    }),
+    Case('packages:announced_packages', role='agent_in'),
+    Case('packages:process_announced_package', 'post', 'agent_in',
+         kwargs=lambda f: {'package_id': f.announced_package.pk}, data={'weight': 3}),
+    Case('packages:agent_in_packages', role='agent_in'),
+    Case('packages:update_package_status', 'patch', 'agent_in',
+         kwargs=lambda f: {'package_id': f.announced_package.pk}, data={'status': 'received'}),
+    Case('packages:package_announcement', 'post', data={'sender': 'Amazon', 'description': 'Colis annoncé'},
+         known_failure="l'annonce n'envoie pas les dimensions, non nullables en base (erreur 500)"),
+    Case('packages:consolidation_list_create'),
+    Case('packages:consolidation_list_create', 'post',
+         data=lambda f: {'package_ids': [str(package.pk) for package in f.spare_packages]}),
+    Case('packages:consolidation_detail', kwargs=lambda f: {'pk': f.consolidation.pk}),
+    Case('packages:add_package_to_consolidation', 'post', kwargs=lambda f: {'consolidation_id': f.consolidation.pk},
+         data=lambda f: {'package_id': str(f.spare_packages[0].pk)}),
+    Case('packages:remove_package_from_consolidation', 'delete', kwargs=lambda f: {
+        'consolidation_id': f.consolidation.pk, 'package_id': f.consolidation.packages.first().pk,
+    }),
+    Case('packages:admin_package_list', role='admin'),
+    Case('packages:admin_package_detail', role='admin', kwargs=lambda f: {'pk': f.package.pk}),
+
+    # Expéditions et paiements
+    Case('shipments:shipping_rates'),
+    Case('shipments:calculate_shipping_cost', 'post', data={'weight': 10, 'shipping_type': 'air'},
+         known_failure="Decimal (price_per_kg) multiplié par un float (erreur 500)"),
+    Case('shipments:shipment_list_create'),
+    Case('shipments:shipment_list_create', 'post', data=lambda f: {
+        'shipping_type': 'air', 'package_ids': [str(package.pk) for package in f.spare_packages],
+        'delivery_address': 'Port-au-Prince', 'recipient_name': 'Jean', 'recipient_phone': '+50900000000',
+    }, known_failure="l'expédition est créée avant le calcul des poids et coûts non nullables (erreur 500)"),
+    Case('shipments:shipment_detail', kwargs=lambda f: {'pk': f.shipment.pk}),
+    Case('shipments:create_payment', 'post', kwargs=lambda f: {'shipment_id': f.shipment.pk},
+         data={'payment_method': 'moncash'}),
+    Case('shipments:payment_list'),
+    Case('shipments:payment_detail', kwargs=lambda f: {'pk': f.payment.pk}),
+    Case('shipments:confirm_payment', 'post', kwargs=lambda f: {'payment_id': f.payment.pk},
+         data={'transaction_id': 'BENCH-TX-1'}),
+    Case('shipments:payment_webhook', 'post', 'anonymous', kwargs={'provider': 'moncash'},
+         data=_webhook_body, headers=_webhook_headers),
+    Case('shipments:admin_shipment_list', role='admin'),
+    Case('shipments:admin_shipment_detail', role='admin', kwargs=lambda f: {'pk': f.shipment.pk}),
+    Case('shipments:admin_rate_list_create', role='admin'),
+    Case('shipments:admin_rate_detail', role='admin', kwargs=lambda f: {'pk': f.rate.pk}),
+
+    # Configuration
+    Case('configuration:public-config', role='anonymous'),
+    Case('configuration:admin-config', role='admin'),
+    Case('configuration:maintenance-check', role='anonymous'),
+    Case('configuration:shipping-rates'),
+    Case('configuration:calculate-shipping', 'post', 'admin', data={'weight': 10, 'shipping_type': 'air'}),
+    Case('configuration:notification-templates', role='admin'),
+
+    # Adresses
+    Case('address-list'),
+    Case('address-create', 'post', 'admin', data={
+        'type': 'office', 'name': 'Bureau Cap', 'country': 'HT', 'city': 'Cap-Haïtien',
+        'phone': '+50922220001', 'email': 'cap@bench.test', 'hours': 'Lun-Ven', 'services': ['payments'],
+    }, expected_status=201),
+    Case('address-update', 'patch', 'admin', kwargs=lambda f: {'pk': f.address.pk},
+         data={'hours': 'Lun-Sam: 8h-18h', 'services': ['payments', 'package_pickup']}),
+    Case('address-delete', 'delete', 'admin', kwargs=lambda f: {'pk': f.address.pk}),
+    Case('warehouse-list'),
+    Case('office-list'),
+    Case('address-nearest', data={'lat': 18.55, 'lng': -72.31, 'k': 5, 'service_type': 'package_pickup'}),
+
+    # Rapports
+    Case('reports:report_summary', role='admin', data={'period': 'month'}),
+]
+
+
+def case_label(case):
+    return f"{case.method.upper()} {case.url_name}"
+
+
+def api_route_names(patterns=None, prefix='', namespace=''):
+    """Noms complets (avec espace de noms) des routes de core/urls.py sous api/"""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            child_namespace = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+            names |= api_route_names(pattern.url_patterns, route, child_namespace)
+        elif isinstance(pattern, URLPattern) and route.startswith('api/') and pattern.name:
+            names.add(namespace + pattern.name)
+    return names
+
+
+def uncovered_routes(cases=CASES):
+    return sorted(api_route_names() - {case.url_name for case in cases})
+
+
+def known_failures(cases=CASES):
+    """Scénarios d'endpoints cassés (label -> raison) : non mesurés ni enregistrés en référence"""
+    return {case_label(case): case.known_failure for case in cases if case.known_failure}
+
+
+# --- Mesures -----------------------------------------------------------------
+
+def run_case(client, case, fixtures, iterations=5, warmup=1):
+    """Exécute un scénario et retourne ses mesures (médianes sur les itérations)"""
+    user = None if case.role == 'anonymous' else getattr(fixtures, case.role)
+    path = reverse(case.url_name, kwargs=_value(case.kwargs, fixtures))
+    walls, sql_times, query_counts, statuses = [], [], [], set()
+    # Les vues async (hors DRF) ignorent force_authenticate : elles lisent le jeton
+    credentials = {'HTTP_AUTHORIZATION': f"Token {Token.objects.get_or_create(user=user)[0].key}"} if user else {}
+
+    for iteration in range(warmup + iterations):
+        client.force_authenticate(user)
+        client.credentials(**credentials)
+        data = _value(case.data, fixtures)
+        headers = _value(case.headers, fixtures) or {}
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                started = perf_counter()
+                if case.method == 'get':
+                    response = client.get(path, data, headers=headers)
+                elif isinstance(data, bytes):
+                    # Corps signé : envoyé tel quel
+                    response = getattr(client, case.method)(
+                        path, data, content_type='application/json', headers=headers
+                    )
+                else:
+                    response = getattr(client, case.method)(path, data, format='json', headers=headers)
+                elapsed = perf_counter() - started
+                transaction.set_rollback(True)
+        client.force_authenticate(None)
+        client.credentials()
+        client.logout()
+
+        statuses.add(response.status_code)
+        if iteration < warmup:
+            continue
+        # BEGIN/ROLLBACK de la transaction du banc ne comptent pas
+        view_queries = [query for query in queries.captured_queries if query['sql'] not in HARNESS_SQL]
+        walls.append(elapsed * 1000)
+        sql_times.append(sum(float(query['time']) for query in view_queries) * 1000)
+        query_counts.append(len(view_queries))
+
+    status_code = max(statuses)
+    if case.expected_status is not None:
+        ok = statuses == {case.expected_status}
+    else:
+        ok = status_code < 400
+    return {
+        'method': case.method.upper(),
+        'path': path,
+        'status': status_code,
+        'ok': ok,
+        'wall_ms': round(statistics.median(walls), 2),
+        'wall_max_ms': round(max(walls), 2),
+        'sql_ms': round(statistics.median(sql_times), 2),
+        'queries': max(query_counts),
+    }
+
+
+def run_benchmarks(fixtures, cases=CASES, iterations=5, warmup=1):
+    # Les erreurs 500 sont mesurées comme les autres réponses au lieu d'interrompre le banc
+    client = APIClient(raise_request_exception=False)
+    secrets = {**settings.PAYMENT_WEBHOOK_SECRETS, 'moncash': BENCHMARK_WEBHOOK_SECRET}
+    with override_settings(PAYMENT_WEBHOOK_SECRETS=secrets):
+        return {
+            case_label(case): run_case(client, case, fixtures, iterations, warmup)
+            for case in cases
+            if not case.known_failure
+        }
+
+
+# --- Budgets -----------------------------------------------------------------
+
+def make_baseline(results, latency_tolerance=0.5, latency_slack_ms=5.0):
+    """Mesures de référence avec leurs budgets (modifiables à la main dans le JSON)"""
+    return {
+        label: {
+            **{key: value for key, value in result.items() if key not in ('path', 'ok')},
+            'query_budget': result['queries'],
+            'latency_budget_ms': round(result['wall_ms'] * (1 + latency_tolerance) + latency_slack_ms, 1),
+        }
+        for label, result in results.items()
+    }
+
+
+def check_budgets(results, baseline):
+    """Liste des dépassements (label, message) par rapport à la référence"""
+    failures = []
+    for label, result in results.items():
+        if not result['ok']:
+            failures.append((label, f"statut HTTP {result['status']}"))
+        reference = baseline.get(label)
+        if reference is None:
+            continue
+        if result['queries'] > reference['query_budget']:
+            failures.append((label, f"{result['queries']} requêtes SQL (budget {reference['query_budget']})"))
+        if result['wall_ms'] > reference['latency_budget_ms']:
+            failures.append((label, f"{result['wall_ms']} ms (budget {reference['latency_budget_ms']} ms)"))
+    return failures
@@ -0,0 +1,345 @@
+"""
+Cache à deux niveaux pour les déploiements multi-workers.
+
+CACHES['default'] est un TieredCache : chaque processus garde un petit L1
+en mémoire (LRU de l1_max_entries entrées, chacune au plus l1_timeout
+secondes) devant le cache partagé CACHES['shared'] : Redis si REDIS_URL
+est défini, sinon un LocMemCache propre au processus (tests, développement).
+
+Seules les clés commençant par un des préfixes l1_key_prefixes (valeurs
+lues partout et rarement écrites : instantanés, recherches) passent par le
+L1 ; les autres (verrous, compteurs, marques de routage, idempotence) vont
+directement au cache partagé, sans coût supplémentaire à l'écriture.
+
+Toute écriture d'une clé du L1 est faite dans le cache partagé puis publiée
+dans un journal d'invalidation partagé : un compteur et une clé par
+écriture. Chaque processus relit le compteur au plus toutes les
+sync_interval secondes et retire de son L1 les clés écrites par les autres ;
+s'il a manqué des entrées, il vide son L1. Une valeur modifiée par un autre
+worker est ainsi visible après au plus sync_interval secondes, une valeur
+expirée dans le cache partagé après au plus l1_timeout secondes. add() et
+incr() restent atomiques : ils sont exécutés par le cache partagé.
+
+get_or_compute() / aget_or_compute() évitent les recalculs simultanés d'une
+même valeur (single-flight) : un verrou posé par cache.add() désigne la
+seule requête qui recalcule ; les autres servent la valeur périmée si elle
+existe encore (stale-while-revalidate), sinon attendent au plus
+CACHE_COMPUTE_WAIT secondes avant de calculer elles-mêmes.
+"""
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache, record_coalesced
+
+INVALIDATION_SEQ_KEY = 'cache_l1:seq'
+INVALIDATION_ENTRY_KEY = 'cache_l1:inv:{}'
+INVALIDATION_ENTRY_TIMEOUT = 300
+# Au-delà, relire le journal coûterait plus que repartir d'un L1 vide
+MAX_SYNC_ENTRIES = 500
+CLEAR_ALL = '*'
+
+# Hors des préfixes du L1 : posé et retiré à chaque recalcul
+COMPUTE_LOCK_KEY = 'compute_lock:{}'
+COMPUTE_POLL_INTERVAL = 0.05
+
+_missing = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('shared', 'shared')
+        self.l1_max_entries = int(options.get('l1_max_entries', 1000))
+        self.l1_timeout = float(options.get('l1_timeout', 5))
+        self.sync_interval = float(options.get('sync_interval', 0.5))
+        self.l1_key_prefixes = tuple(options.get('l1_key_prefixes', ()))
+        # (clé, version) -> (échéance monotonic, valeur picklée comme LocMemCache :
+        # chaque lecture obtient sa propre copie)
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+        self._seen_seq = None
+        # Numéros du journal publiés par ce processus, à ne pas rejouer
+        self._own_seqs = set()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _version(self, version):
+        return self.version if version is None else version
+
+    def _l1_key(self, key, version):
+        return (key, self._version(version))
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _in_l1(self, key):
+        return key.startswith(self.l1_key_prefixes)
+
+    # L1
+
+    def _l1_get(self, l1_key):
+        with self._lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return _missing
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._l1[l1_key]
+                return _missing
+            self._l1.move_to_end(l1_key)
+        return pickle.loads(pickled)
+
+    def _l1_store(self, l1_key, value, timeout):
+        if timeout is not None and timeout <= 0:
+            self._l1_discard([l1_key])
+            return
+        if not self.l1_max_entries:
+            return
+        ttl = self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[l1_key] = (time.monotonic() + ttl, pickled)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, l1_keys):
+        with self._lock:
+            for l1_key in l1_keys:
+                self._l1.pop(l1_key, None)
+
+    def _l1_clear(self):
+        with self._lock:
+            self._l1.clear()
+
+    # Journal d'invalidation
+
+    def _publish(self, l1_keys):
+        shared = self.shared
+        for l1_key in l1_keys:
+            try:
+                seq = shared.incr(INVALIDATION_SEQ_KEY)
+            except ValueError:
+                shared.add(INVALIDATION_SEQ_KEY, 0, None)
+                seq = shared.incr(INVALIDATION_SEQ_KEY)
+            shared.set(INVALIDATION_ENTRY_KEY.format(seq), l1_key, INVALIDATION_ENTRY_TIMEOUT)
+            self._own_seqs.add(seq)
+
+    def _sync(self):
+        """Applique les écritures des autres processus (au plus toutes les sync_interval s)"""
+        if time.monotonic() < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sync = time.monotonic() + self.sync_interval
+            seq = self.shared.get(INVALIDATION_SEQ_KEY) or 0
+            seen, self._seen_seq = self._seen_seq, seq
+            if seen is None or seq == seen:
+                return
+            # Compteur perdu (cache partagé vidé ou redémarré) ou trop d'écritures manquées
+            if seq < seen or seq - seen > MAX_SYNC_ENTRIES:
+                self._own_seqs.clear()
+                self._l1_clear()
+                return
+            numbers = [n for n in range(seen + 1, seq + 1) if n not in self._own_seqs]
+            self._own_seqs = {n for n in self._own_seqs if n > seq}
+            entries = self.shared.get_many([INVALIDATION_ENTRY_KEY.format(n) for n in numbers])
+            if len(entries) < len(numbers) or CLEAR_ALL in entries.values():
+                self._l1_clear()
+            else:
+                self._l1_discard(tuple(l1_key) for l1_key in entries.values())
+        finally:
+            self._sync_lock.release()
+
+    # API du cache
+
+    def get(self, key, default=None, version=None):
+        if not self._in_l1(key):
+            return self.shared.get(key, default, version=self._version(version))
+        l1_key = self._l1_key(key, version)
+        self._sync()
+        value = self._l1_get(l1_key)
+        if value is not _missing:
+            return value
+        value = self.shared.get(key, _missing, version=l1_key[1])
+        if value is _missing:
+            return default
+        self._l1_store(l1_key, value, None)
+        return value
+
+    async def aget(self, key, default=None, version=None):
+        """Lecture du L1 sans changer de thread ; le cache partagé passe par sync_to_async"""
+        if self._in_l1(key) and time.monotonic() < self._next_sync:
+            value = self._l1_get(self._l1_key(key, version))
+            if value is not _missing:
+                return value
+        return await sync_to_async(self.get)(key, default, version)
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missing = {}, []
+        for key in keys:
+            value = self._l1_get(self._l1_key(key, version)) if self._in_l1(key) else _missing
+            if value is _missing:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.shared.get_many(missing, version=self._version(version))
+            for key, value in fetched.items():
+                if self._in_l1(key):
+                    self._l1_store(self._l1_key(key, version), value, None)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self._l1_key(key, version)
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout, version=l1_key[1])
+        if not self._in_l1(key):
+            return
+        self._publish([l1_key])
+        self._l1_store(l1_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self._l1_key(key, version)
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=l1_key[1])
+        if added and self._in_l1(key):
+            self._publish([l1_key])
+            self._l1_store(l1_key, value, timeout)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout, version=self._version(version))
+        stored = [key for key in data if key not in failed and self._in_l1(key)]
+        self._publish([self._l1_key(key, version) for key in stored])
+        for key in stored:
+            self._l1_store(self._l1_key(key, version), data[key], timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._timeout(timeout), version=self._version(version))
+
+    def delete(self, key, version=None):
+        l1_key = self._l1_key(key, version)
+        deleted = self.shared.delete(key, version=l1_key[1])
+        if not self._in_l1(key):
+            return deleted
+        self._publish([l1_key])
+        self._l1_discard([l1_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        l1_keys = [self._l1_key(key, version) for key in keys if self._in_l1(key)]
+        self.shared.delete_many(keys, version=self._version(version))
+        self._publish(l1_keys)
+        self._l1_discard(l1_keys)
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self._l1_key(key, version)
+        value = self.shared.incr(key, delta, version=l1_key[1])
+        if not self._in_l1(key):
+            return value
+        self._publish([l1_key])
+        self._l1_discard([l1_key])
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        self._publish([CLEAR_ALL])
+        self._l1_clear()
+
+
+def _envelope(value, timeout):
+    """Valeur et échéance de fraîcheur (None : toujours fraîche)"""
+    return (None if timeout is None else time.time() + timeout, value)
+
+
+def _is_fresh(envelope):
+    return envelope[0] is None or envelope[0] > time.time()
+
+
+def _cache_timeout(timeout, stale_timeout):
+    return None if timeout is None else timeout + stale_timeout
+
+
+def get_or_compute(name, key, compute, timeout, stale_timeout=0):
+    """
+    Valeur de `key`, calculée par compute() par une seule requête à la fois.
+
+    La valeur est fraîche pendant `timeout` secondes puis servie périmée
+    pendant `stale_timeout` secondes aux requêtes qui arrivent pendant son
+    recalcul. `name` étiquette les métriques (hit/miss, requêtes coalescées).
+    """
+    envelope = cache.get(key)
+    if envelope is not None and _is_fresh(envelope):
+        record_cache(name, True)
+        return envelope[1]
+    record_cache(name, False)
+
+    lock_key = COMPUTE_LOCK_KEY.format(key)
+    deadline = time.monotonic() + settings.CACHE_COMPUTE_WAIT
+    while True:
+        if cache.add(lock_key, True, settings.CACHE_COMPUTE_LOCK_TIMEOUT):
+            try:
+                value = compute()
+                cache.set(key, _envelope(value, timeout), _cache_timeout(timeout, stale_timeout))
+                return value
+            finally:
+                cache.delete(lock_key)
+        if envelope is not None:
+            record_coalesced(name, 'stale')
+            return envelope[1]
+        if time.monotonic() >= deadline:
+            record_coalesced(name, 'timeout')
+            return compute()
+        time.sleep(COMPUTE_POLL_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            record_coalesced(name, 'waited')
+            return envelope[1]
+
+
+async def aget_or_compute(name, key, compute, timeout, stale_timeout=0):
+    """get_or_compute() pour les vues async : compute() retourne un awaitable"""
+    envelope = await cache.aget(key)
+    if envelope is not None and _is_fresh(envelope):
+        record_cache(name, True)
+        return envelope[1]
+    record_cache(name, False)
+
+    lock_key = COMPUTE_LOCK_KEY.format(key)
+    deadline = time.monotonic() + settings.CACHE_COMPUTE_WAIT
+    while True:
+        if await cache.aadd(lock_key, True, settings.CACHE_COMPUTE_LOCK_TIMEOUT):
+            try:
+                value = await compute()
+                await cache.aset(key, _envelope(value, timeout), _cache_timeout(timeout, stale_timeout))
+                return value
+            finally:
+                await cache.adelete(lock_key)
+        if envelope is not None:
+            record_coalesced(name, 'stale')
+            return envelope[1]
+        if time.monotonic() >= deadline:
+            record_coalesced(name, 'timeout')
+            return await compute()
+        await asyncio.sleep(COMPUTE_POLL_INTERVAL)
+        envelope = await cache.aget(key)
+        if envelope is not None:
+            record_coalesced(name, 'waited')
+            return envelope[1]
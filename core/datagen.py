@@ -0,0 +1,449 @@
+"""
+Génération d'un jeu de données synthétique à l'échelle de la production.
+
+Les lignes sont écrites par tranches avec COPY (psycopg 3), ou par INSERT
+multi-lignes sur les autres pilotes, sans passer par save() ni les signaux.
+Toutes les valeurs (UUID compris) viennent d'un random.Random initialisé
+avec la graine : deux exécutions avec la même graine produisent les mêmes
+données, aux identifiants auto-incrémentés et à la date de référence près.
+"""
+import random
+import uuid
+from bisect import bisect
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from accounts.models import PackageVisa, Profile, User
+from addresses.models import Address, AddressService
+from packages.models import Package, PackageConsolidation, PackageDelivery, PackagePayment
+from shipments.models import Payment, Shipment, ShipmentCostAudit
+
+GENERATED_DOMAIN = 'gen.belpanye.test'
+GENERATED_PASSWORD = 'generated-password'
+
+FIRST_NAMES = [
+    'Jean', 'Marie', 'Pierre', 'Rose', 'Paul', 'Nadège', 'Wilson', 'Fabiola', 'Jacques', 'Guerline',
+    'Ricardo', 'Mirlande', 'Stanley', 'Judith', 'Frantz', 'Esther', 'Emmanuel', 'Sabine', 'Daniel', 'Nathalie',
+]
+LAST_NAMES = [
+    'Joseph', 'Jean-Baptiste', 'Pierre', 'Louis', 'Charles', 'Desir', 'Alexis', 'Augustin', 'Michel', 'Noël',
+    'Étienne', 'Saint-Fleur', 'Delva', 'Toussaint', 'Dorvil', 'Baptiste', 'Celestin', 'François', 'Paul', 'Belizaire',
+]
+CITIES = [
+    ('Port-au-Prince', 18.5392, -72.3350), ('Pétion-Ville', 18.5125, -72.2853), ('Cap-Haïtien', 19.7578, -72.2042),
+    ('Les Cayes', 18.1933, -73.7461), ('Gonaïves', 19.4472, -72.6892), ('Jacmel', 18.2342, -72.5347),
+    ('Saint-Marc', 19.1081, -72.6939), ('Delmas', 18.5447, -72.3028),
+]
+SENDERS = ['Amazon', 'eBay', 'Walmart', 'Shein', 'Temu', 'Best Buy', 'Target', 'AliExpress', 'Nike', 'Apple']
+DESCRIPTIONS = ['Vêtements', 'Chaussures', 'Électronique', 'Téléphone', 'Livres', 'Cosmétiques',
+                'Pièces auto', 'Jouets', 'Ustensiles de cuisine', 'Médicaments']
+
+# Répartitions observées (poids relatifs)
+PACKAGE_STATUSES = (('announced', 8), ('received', 22), ('inTransit', 10), ('available', 10), ('delivered', 50))
+SHIPPING_MODES = (('plane', 70), ('boat', 25), ('express', 5))
+FRAGILITIES = (('normal', 85), ('fragile', 12), ('very_fragile', 3))
+PAYMENT_METHODS = (('moncash', 60), ('bank_transfer', 20), ('stripe', 15), ('paypal', 5))
+PRICE_PER_LB_CENTS = {'air': 450, 'sea': 200}
+
+# Statut d'expédition selon le statut (commun) de ses colis
+SHIPMENT_STATUSES = {
+    'inTransit': (('shipped', 40), ('in_transit', 60)),
+    'available': (('in_transit', 100),),
+    'delivered': (('delivered', 100),),
+}
+PENDING_SHIPMENT_STATUSES = (('pending', 50), ('paid', 25), ('processing', 20), ('cancelled', 5))
+
+SHIPPED_SHARE_OF_RECEIVED = 0.3
+CONSOLIDATED_SHARE_OF_RECEIVED = 0.2
+PROFILE_SHARE = 0.6
+VISA_SHARE = 0.1
+FAILED_PAYMENT_SHARE = 0.05
+
+
+class TableWriter:
+    """
+    Accumule des lignes (champ -> valeur) et les écrit par tranches de
+    `chunk_size`. Les champs absents prennent la valeur par défaut du modèle ;
+    ceux dont le défaut est calculé (uuid4, now) doivent être fournis.
+    """
+
+    def __init__(self, model, chunk_size):
+        self.model = model
+        self.chunk_size = chunk_size
+        self.fields = [
+            field for field in model._meta.concrete_fields
+            if not isinstance(field, models.AutoField)
+        ]
+        self.attnames = [field.attname for field in self.fields]
+        self.defaults = {
+            field.attname: field.get_default()
+            for field in self.fields
+            if not (field.has_default() and callable(field.default))
+        }
+        self.rows = []
+        self.count = 0
+
+    def add(self, **values):
+        values = {**self.defaults, **values}
+        self.rows.append(tuple(values[name] for name in self.attnames))
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy'):
+                with raw.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in self.rows:
+                        copy.write_row(row)
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                    [
+                        [field.get_db_prep_save(value, connection) for field, value in zip(self.fields, row)]
+                        for row in self.rows
+                    ],
+                )
+        self.count += len(self.rows)
+        self.rows = []
+
+
+class WeightedChoice:
+    """Tirage pondéré en O(log n) sur des poids cumulés précalculés"""
+
+    def __init__(self, rnd, choices):
+        self.rnd = rnd
+        self.values = [value for value, _ in choices]
+        self.cum_weights = list(accumulate(weight for _, weight in choices))
+        self.total = self.cum_weights[-1]
+
+    def __call__(self):
+        return self.values[bisect(self.cum_weights, self.rnd.random() * self.total)]
+
+
+def generated_users():
+    return User.objects.filter(email__endswith=f'@{GENERATED_DOMAIN}')
+
+
+def delete_generated_data():
+    """
+    Supprime les données générées. Les grosses tables sont vidées par des
+    DELETE ensemblistes (sans charger les objets ni envoyer de signaux) ;
+    le reste part en cascade avec les utilisateurs.
+    """
+    def table(model):
+        return connection.ops.quote_name(model._meta.db_table)
+
+    def column(model, name):
+        return connection.ops.quote_name(model._meta.get_field(name).column)
+
+    users = f"SELECT id FROM {table(User)} WHERE email LIKE %s"
+    shipments = f"SELECT id FROM {table(Shipment)} WHERE user_id IN ({users})"
+    consolidations = f"SELECT id FROM {table(PackageConsolidation)} WHERE user_id IN ({users})"
+    packages = f"SELECT id FROM {table(Package)} WHERE user_id IN ({users})"
+    shipment_links = Shipment.packages.through
+    consolidation_links = PackageConsolidation.packages.through
+    deletes = [
+        (ShipmentCostAudit, 'shipment', shipments),
+        (Payment, 'shipment', shipments),
+        (shipment_links, 'shipment', shipments),
+        (Shipment, 'user', users),
+        (consolidation_links, 'packageconsolidation', consolidations),
+        (PackageConsolidation, 'user', users),
+        (PackageDelivery, 'package', packages),
+        (PackagePayment, 'package', packages),
+        (Package, 'user', users),
+    ]
+    pattern = f'%@{GENERATED_DOMAIN}'
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, field, subquery in deletes:
+            cursor.execute(f"DELETE FROM {table(model)} WHERE {column(model, field)} IN ({subquery})", [pattern])
+        Address.objects.filter(email__endswith=f'@{GENERATED_DOMAIN}').delete()
+        return generated_users().delete()
+
+
+class DatasetGenerator:
+    def __init__(self, clients, packages, seed=42, chunk_size=10000, days=730, pickup_points=40):
+        self.rnd = random.Random(seed)
+        self.clients = clients
+        self.packages = packages
+        self.chunk_size = chunk_size
+        self.days = days
+        self.pickup_points = pickup_points
+        self.now = timezone.now()
+        self.password = make_password(GENERATED_PASSWORD)
+        self.sequences = {}
+
+        rnd = self.rnd
+        self.package_status = WeightedChoice(rnd, PACKAGE_STATUSES)
+        self.shipping_mode = WeightedChoice(rnd, SHIPPING_MODES)
+        self.fragility = WeightedChoice(rnd, FRAGILITIES)
+        self.payment_method = WeightedChoice(rnd, PAYMENT_METHODS)
+        self.shipment_status = {status: WeightedChoice(rnd, choices) for status, choices in SHIPMENT_STATUSES.items()}
+        self.pending_shipment_status = WeightedChoice(rnd, PENDING_SHIPMENT_STATUSES)
+
+        self.writers = {
+            model: TableWriter(model, chunk_size)
+            for model in (User, Profile, PackageVisa, Package, PackageConsolidation, PackageDelivery,
+                          Shipment, Payment)
+        }
+        self.writers['consolidation_packages'] = TableWriter(PackageConsolidation.packages.through, chunk_size)
+        self.writers['shipment_packages'] = TableWriter(Shipment.packages.through, chunk_size)
+
+    # --- Utilitaires ------------------------------------------------------
+
+    def uuid(self):
+        return uuid.UUID(int=self.rnd.getrandbits(128), version=4)
+
+    def next_number(self, prefix):
+        number = self.sequences.get(prefix, 0) + 1
+        self.sequences[prefix] = number
+        return f"{prefix}{number:09d}"
+
+    def past_datetime(self):
+        # Activité croissante : plus de colis récents que d'anciens
+        age = self.days * self.rnd.random() ** 1.6
+        return self.now - timedelta(days=age)
+
+    def later(self, moment, min_hours, max_hours):
+        return min(moment + timedelta(hours=self.rnd.uniform(min_hours, max_hours)), self.now)
+
+    @staticmethod
+    def money(cents):
+        return Decimal(cents).scaleb(-2)
+
+    # --- Génération -------------------------------------------------------
+
+    def run(self):
+        self.create_addresses()
+        self.create_users()
+        self.create_visas()
+        for start in range(0, self.packages, self.chunk_size):
+            self.create_package_chunk(min(self.chunk_size, self.packages - start))
+        for writer in self.writers.values():
+            writer.flush()
+        return {
+            writer.model._meta.label: writer.count for writer in self.writers.values()
+        }
+
+    def create_addresses(self):
+        """Points de retrait et bureaux (volume faible : ORM et signaux habituels)"""
+        rnd = self.rnd
+        if not Address.objects.filter(is_default_warehouse=True).exists():
+            Address.objects.create(
+                type='warehouse', name='Belpanye Miami', country='US', city='Doral', state='FL',
+                address_line1='8000 NW 25th St', postal_code='33122', phone='+13055550100',
+                email=f'miami@{GENERATED_DOMAIN}', hours='Lun-Ven: 9h-17h', is_default_warehouse=True,
+            )
+        services = []
+        for i in range(self.pickup_points):
+            city, lat, lng = rnd.choice(CITIES)
+            address = Address.objects.create(
+                type='office' if i % 5 == 0 else 'pickup_point', name=f'Belpanye {city} {i}', country='HT',
+                city=city, address_line1=f'{rnd.randint(1, 200)} Rue {rnd.choice(LAST_NAMES)}',
+                phone=f'+5092{rnd.randint(0, 9999999):07d}', email=f'point{i}@{GENERATED_DOMAIN}',
+                hours='Lun-Sam: 8h-17h', display_order=i,
+                latitude=Decimal(f'{lat + rnd.uniform(-0.05, 0.05):.6f}'),
+                longitude=Decimal(f'{lng + rnd.uniform(-0.05, 0.05):.6f}'),
+            )
+            service_types = ['package_pickup', 'customer_service']
+            if rnd.random() < 0.7:
+                service_types.append('payments')
+            services += [AddressService(address=address, service_type=service_type) for service_type in service_types]
+        AddressService.objects.bulk_create(services)
+
+    def create_users(self):
+        rnd = self.rnd
+        writer = self.writers[User]
+        staff = max(2, self.clients // 5000)
+        roles = [('admin', 1), ('agent_in', staff), ('agent_out', staff)]
+        staff_accounts = [(role, i) for role, count in roles for i in range(count)]
+        for number, (role, i) in enumerate(staff_accounts):
+            writer.add(
+                username=f'{role}{i}.gen', email=f'{role}{i}@{GENERATED_DOMAIN}', password=self.password,
+                first_name=rnd.choice(FIRST_NAMES), last_name=rnd.choice(LAST_NAMES), role=role,
+                is_staff=role == 'admin', is_superuser=role == 'admin', is_active=True,
+                customer_id=f'GS{number:08d}', date_joined=self.now - timedelta(days=self.days),
+            )
+
+        self.client_info = []
+        for i in range(self.clients):
+            first_name, last_name = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+            city = rnd.choice(CITIES)[0]
+            phone = f'+509{rnd.randint(30000000, 49999999)}'
+            address = f'{rnd.randint(1, 300)} Rue {rnd.choice(LAST_NAMES)}, {city}'
+            writer.add(
+                username=f'client{i}.gen', email=f'client{i}@{GENERATED_DOMAIN}', password=self.password,
+                first_name=first_name, last_name=last_name, phone=phone, address_haiti=address,
+                customer_id=f'GEN{i:07d}', role='client', is_active=True,
+                date_joined=self.now - timedelta(days=self.days * rnd.random()),
+            )
+            self.client_info.append((f'{first_name} {last_name}', phone, address))
+        writer.flush()
+
+        ids = dict(generated_users().values_list('email', 'id'))
+        self.staff_ids = {
+            role: [ids[f'{role}{i}@{GENERATED_DOMAIN}'] for i in range(count)] for role, count in roles
+        }
+        self.client_ids = [ids[f'client{i}@{GENERATED_DOMAIN}'] for i in range(self.clients)]
+
+        # Quelques gros clients, beaucoup de petits : activité de Pareto
+        self.client_weights = list(accumulate(rnd.paretovariate(1.2) for _ in range(self.clients)))
+
+        profiles = self.writers[Profile]
+        for user_id in self.client_ids:
+            if rnd.random() < PROFILE_SHARE:
+                created_at = self.past_datetime()
+                profiles.add(user_id=user_id, passport_number=f'PP{rnd.randint(0, 99999999):08d}',
+                             date_of_birth=(self.now - timedelta(days=rnd.randint(18 * 365, 70 * 365))).date(),
+                             created_at=created_at, updated_at=created_at)
+
+    def create_visas(self):
+        rnd = self.rnd
+        writer = self.writers[PackageVisa]
+        for user_id in self.client_ids:
+            if rnd.random() >= VISA_SHARE:
+                continue
+            for _ in range(rnd.randint(1, 3)):
+                created_at = self.past_datetime()
+                used = rnd.random() < 0.5
+                writer.add(
+                    client_id=user_id, delegate_name=f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}',
+                    delegate_phone=f'+509{rnd.randint(30000000, 49999999)}',
+                    delegate_id_number=f'{rnd.randint(0, 9999999999):010d}', is_active=not used,
+                    created_at=created_at, used_at=self.later(created_at, 24, 24 * 30) if used else None,
+                )
+
+    def create_package_chunk(self, count):
+        rnd = self.rnd
+        packages = self.writers[Package]
+        agents_in = self.staff_ids['agent_in']
+        owners = [bisect(self.client_weights, rnd.random() * self.client_weights[-1]) for _ in range(count)]
+
+        groups = {}
+        for client in owners:
+            status = self.package_status()
+            announced_at = self.past_datetime()
+            received_at = None if status == 'announced' else self.later(announced_at, 24, 24 * 7)
+            weight_cents = int(min(max(rnd.lognormvariate(1.3, 0.9), 0.1), 9999) * 100)
+            value_cents = int(min(rnd.lognormvariate(3.8, 1.0), 99999999) * 100)
+            package = SimpleNamespace(
+                id=self.uuid(), client=client, status=status, received_at=received_at,
+                weight_cents=weight_cents, value_cents=value_cents, mode=self.shipping_mode(),
+            )
+            packages.add(
+                id=package.id, user_id=self.client_ids[client], tracking_number=self.next_number('BPG'),
+                sender=rnd.choice(SENDERS), description=rnd.choice(DESCRIPTIONS),
+                weight=self.money(weight_cents), length=rnd.randint(10, 80), width=rnd.randint(10, 60),
+                height=rnd.randint(5, 50), value=self.money(value_cents), status=status,
+                fragility=self.fragility(), shipping_mode=package.mode, destination=self.client_info[client][2],
+                announced_at=announced_at, received_at=received_at,
+                agent_in_id=rnd.choice(agents_in) if received_at else None,
+            )
+            if status == 'received':
+                draw = rnd.random()
+                if draw < SHIPPED_SHARE_OF_RECEIVED:
+                    status = 'awaiting_shipment'
+                elif draw < SHIPPED_SHARE_OF_RECEIVED + CONSOLIDATED_SHARE_OF_RECEIVED:
+                    status = 'consolidated'
+            if status not in ('announced', 'received'):
+                groups.setdefault((client, status), []).append(package)
+
+        for (client, status), members in groups.items():
+            while members:
+                split = min(len(members), rnd.randint(1, 5))
+                batch, members = members[:split], members[split:]
+                if status == 'consolidated':
+                    self.create_consolidation(client, batch)
+                else:
+                    self.create_shipment(client, status, batch)
+
+    def create_consolidation(self, client, packages):
+        consolidation_id = self.uuid()
+        self.writers[PackageConsolidation].add(
+            id=consolidation_id, user_id=self.client_ids[client],
+            consolidation_number=self.next_number('CONSG'),
+            total_weight=self.money(sum(package.weight_cents for package in packages)),
+            total_value=self.money(sum(package.value_cents for package in packages)),
+            created_at=self.later(max(package.received_at for package in packages), 1, 48), is_active=True,
+        )
+        links = self.writers['consolidation_packages']
+        for package in packages:
+            links.add(packageconsolidation_id=consolidation_id, package_id=package.id)
+
+    def create_shipment(self, client, package_status, packages):
+        rnd = self.rnd
+        name, phone, address = self.client_info[client]
+        if package_status == 'awaiting_shipment':
+            status = self.pending_shipment_status()
+        else:
+            status = self.shipment_status[package_status]()
+
+        shipping_type = 'sea' if packages[0].mode == 'boat' else 'air'
+        weight_cents = sum(package.weight_cents for package in packages)
+        shipping_cents = weight_cents * PRICE_PER_LB_CENTS[shipping_type] // 100
+        insurance_cents = sum(package.value_cents for package in packages) * 2 // 100 if rnd.random() < 0.3 else 0
+        total_cents = shipping_cents + insurance_cents
+
+        created_at = self.later(max(package.received_at for package in packages), 1, 72)
+        paid_at = shipped_at = delivered_at = None
+        if status not in ('pending', 'cancelled'):
+            paid_at = self.later(created_at, 0.1, 72)
+        if status in ('shipped', 'in_transit', 'delivered'):
+            shipped_at = self.later(paid_at, 12, 24 * (21 if shipping_type == 'sea' else 4))
+        if status == 'delivered':
+            delivered_at = self.later(shipped_at, 24 * 2, 24 * (30 if shipping_type == 'sea' else 7))
+
+        shipment_id = self.uuid()
+        self.writers[Shipment].add(
+            id=shipment_id, user_id=self.client_ids[client], shipment_number=self.next_number('SHG'),
+            shipping_type=shipping_type, total_weight=self.money(weight_cents),
+            shipping_cost=self.money(shipping_cents), insurance_cost=self.money(insurance_cents),
+            total_cost=self.money(total_cents), delivery_address=address, recipient_name=name,
+            recipient_phone=phone, status=status,
+            tracking_number_haiti=self.next_number('HT') if shipped_at else '',
+            created_at=created_at, paid_at=paid_at, shipped_at=shipped_at, delivered_at=delivered_at,
+        )
+        links = self.writers['shipment_packages']
+        for package in packages:
+            links.add(shipment_id=shipment_id, package_id=package.id)
+
+        self.create_payments(shipment_id, status, total_cents, created_at, paid_at)
+        if package_status == 'delivered':
+            self.create_deliveries(packages, name, delivered_at)
+
+    def create_payments(self, shipment_id, status, total_cents, created_at, paid_at):
+        rnd = self.rnd
+        writer = self.writers[Payment]
+        method = self.payment_method()
+        if status == 'cancelled' or (paid_at and rnd.random() < FAILED_PAYMENT_SHARE):
+            writer.add(id=self.uuid(), shipment_id=shipment_id, payment_method=method,
+                       amount=self.money(total_cents), status='failed', created_at=created_at)
+        if paid_at:
+            writer.add(id=self.uuid(), shipment_id=shipment_id, payment_method=method,
+                       amount=self.money(total_cents), status='completed', created_at=created_at,
+                       completed_at=paid_at, transaction_id=f'TX{rnd.getrandbits(48):012X}')
+        elif status == 'pending' and rnd.random() < 0.5:
+            writer.add(id=self.uuid(), shipment_id=shipment_id, payment_method=method,
+                       amount=self.money(total_cents), status='pending', created_at=created_at)
+
+    def create_deliveries(self, packages, client_name, delivered_at):
+        rnd = self.rnd
+        writer = self.writers[PackageDelivery]
+        for package in packages:
+            writer.add(
+                package_id=package.id, agent_out_id=rnd.choice(self.staff_ids['agent_out']),
+                recipient_name=client_name, recipient_id=f'{rnd.randint(0, 9999999999):010d}',
+                delivered_at=self.later(delivered_at, 1, 24 * 5), delivery_photo=None,
+            )
@@ -0,0 +1,137 @@
+"""
+Routage des lectures vers un réplica PostgreSQL (alias « replica »).
+
+Les écritures et les migrations vont toujours sur « default ». Une lecture
+ne part sur le réplica que pendant une requête GET, HEAD ou OPTIONS dont la
+vue l'autorise : nom de vue listé dans REPLICA_READ_VIEWS, ou décorateurs
+use_replica / use_primary, qui priment sur ce réglage. Après une requête
+d'écriture, le même client (même jeton ou même session) lit sur le
+primaire pendant REPLICA_STICKY_SECONDS pour voir ses propres écritures
+malgré le retard de réplication. Jetons et sessions sont toujours lus sur
+le primaire, comme toute lecture faite dans une transaction.
+
+Sans alias « replica » dans DATABASES, tout reste sur « default ».
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DB_ALIAS = 'replica'
+STICKY_KEY = 'replica:sticky:{}'
+PRIMARY_ONLY_MODELS = {'authtoken.token', 'sessions.session'}
+
+_routing = ContextVar('replica_routing', default=None)
+_primary_only = ContextVar('replica_primary_only', default=False)
+
+
+def replica_enabled():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def use_replica(view):
+    """Lectures de la vue sur le réplica (fonction, à placer au-dessus de @api_view, ou classe)"""
+    view.use_replica = True
+    return view
+
+
+def use_primary(view):
+    """Lectures de la vue sur le primaire, même si elle figure dans REPLICA_READ_VIEWS"""
+    view.use_replica = False
+    return view
+
+
+@contextmanager
+def primary_reads():
+    """Force les lectures du bloc sur le primaire (ex. chargement d'un cache partagé)"""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+def client_identity(request):
+    """Empreinte du jeton ou de la session du client, calculée sans requête SQL"""
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+def mark_sticky(request):
+    identity = client_identity(request)
+    if identity is not None:
+        cache.set(STICKY_KEY.format(identity), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(request):
+    identity = client_identity(request)
+    return identity is not None and cache.get(STICKY_KEY.format(identity)) is not None
+
+
+def view_uses_replica(resolver_match):
+    func = resolver_match.func
+    for target in (func, getattr(func, 'cls', None), getattr(func, 'view_class', None)):
+        flag = getattr(target, 'use_replica', None)
+        if flag is not None:
+            return flag
+    return resolver_match.view_name in settings.REPLICA_READ_VIEWS
+
+
+class RequestRouting:
+    """Décision de routage d'une requête, prise à la première lecture après la résolution de l'URL"""
+
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+
+    def read_alias(self):
+        if self.alias is None:
+            match = self.request.resolver_match
+            if match is None:
+                return DEFAULT_DB_ALIAS
+            use_replica = (
+                self.request.method in SAFE_METHODS
+                and view_uses_replica(match)
+                and not is_sticky(self.request)
+            )
+            self.alias = REPLICA_DB_ALIAS if use_replica else DEFAULT_DB_ALIAS
+        return self.alias
+
+
+def start_routing(request):
+    return _routing.set(RequestRouting(request))
+
+
+def end_routing(token):
+    _routing.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or _primary_only.get()
+            or model._meta.label_lower in PRIMARY_ONLY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même données des deux côtés
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
@@ -0,0 +1,115 @@
+"""
+Charge HTTP concurrente contre un serveur lancé en sous-processus.
+
+Utilisé pour comparer les déploiements (uvicorn/ASGI contre gunicorn/WSGI) :
+chaque client est un thread avec sa propre connexion keep-alive, les
+latences sont mesurées côté client et résumées en débit et percentiles.
+"""
+import http.client
+import os
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+SERVER_START_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, env=None):
+    """Lance le serveur et attend qu'il accepte les connexions"""
+    process = subprocess.Popen(
+        shlex.split(command), cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté au démarrage : {process.stderr.read().decode()[-2000:]}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"Le serveur n'écoute pas sur le port {port} après {SERVER_START_TIMEOUT}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(port, path, headers=None, concurrency=50, requests=2000, timeout=30):
+    """
+    Envoie `requests` GET sur `path` avec `concurrency` clients simultanés.
+    Retourne débit, percentiles (ms) et répartition des statuts.
+    """
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        local_latencies, local_statuses = [], Counter()
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers or {})
+                    response = connection.getresponse()
+                    response.read()
+                    local_statuses[response.status] += 1
+                except (OSError, http.client.HTTPException):
+                    local_statuses['error'] += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                local_latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status != 'error' and status < 500)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'errors': len(latencies) - ok,
+        'statuses': {str(status): count for status, count in statuses.items()},
+    }
@@ -0,0 +1,108 @@
+import importlib.util
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from core.loadtest import free_port, run_load, start_server, stop_server
+from packages.models import Package
+
+WSGI_COMMAND = (
+    "gunicorn core.wsgi:application --bind 127.0.0.1:{port} --workers {workers} "
+    "--worker-class gthread --threads {threads} --log-level warning"
+)
+
+# Variables d'environnement de chaque mode (voir DATABASES dans core/settings.py)
+MODES = {
+    'sans persistance': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistantes': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'},
+    'pool': {'DB_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût d'une connexion PostgreSQL neuve puis la charge HTTP d'un "
+        "endpoint selon le mode de connexion : sans persistance, persistantes, pool psycopg"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200, help='Connexions mesurées directement (défaut: 200)')
+        parser.add_argument('--requests', type=int, default=2000, help='Requêtes HTTP par mode (défaut: 2000)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Clients simultanés (défaut: 8)')
+        parser.add_argument('--workers', type=int, default=1, help='Workers gunicorn (défaut: 1)')
+        parser.add_argument('--threads', type=int, default=8, help='Threads par worker (défaut: 8)')
+        parser.add_argument('--path', help='Chemin mesuré (défaut: suivi public du premier colis)')
+        parser.add_argument('--skip-http', action='store_true', help='Ne faire que la mesure directe')
+
+    def handle(self, *args, **options):
+        self.measure_connect(options['samples'])
+        if not options['skip_http']:
+            self.measure_http(options)
+
+    def measure_connect(self, samples):
+        """Connexion neuve + SELECT 1 contre SELECT 1 sur une connexion ouverte"""
+        params = connection.get_connection_params()
+        database = connection.Database
+
+        started = perf_counter()
+        for _ in range(samples):
+            raw = database.connect(**params)
+            raw.execute('SELECT 1')
+            raw.close()
+        fresh_ms = (perf_counter() - started) * 1000 / samples
+
+        raw = database.connect(**params)
+        try:
+            started = perf_counter()
+            for _ in range(samples):
+                raw.execute('SELECT 1')
+            reused_ms = (perf_counter() - started) * 1000 / samples
+        finally:
+            raw.close()
+
+        self.stdout.write(f"Connexion neuve + SELECT 1   : {fresh_ms:.2f} ms")
+        self.stdout.write(f"SELECT 1 connexion ouverte   : {reused_ms:.2f} ms")
+        self.stdout.write(self.style.SUCCESS(f"Économie par requête HTTP    : {fresh_ms - reused_ms:.2f} ms"))
+
+    def measure_http(self, options):
+        path = options['path'] or self.default_path()
+        modes = dict(MODES)
+        if importlib.util.find_spec('psycopg_pool') is None:
+            self.stderr.write("psycopg_pool absent (pip install 'psycopg[pool]') : mode pool non mesuré")
+            del modes['pool']
+
+        env = {
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'DEBUG': 'False',
+            'REQUEST_LOG_LEVEL': 'WARNING',
+        }
+        results = {}
+        for mode, mode_env in modes.items():
+            port = free_port()
+            command = WSGI_COMMAND.format(port=port, workers=options['workers'], threads=options['threads'])
+            try:
+                process = start_server(command, port, {**env, **mode_env})
+            except (OSError, RuntimeError) as e:
+                raise CommandError(f"Impossible de démarrer gunicorn ({mode}) : {e}")
+            try:
+                run_load(port, path, concurrency=options['concurrency'], requests=options['concurrency'])
+                results[mode] = run_load(port, path, concurrency=options['concurrency'], requests=options['requests'])
+            finally:
+                stop_server(process)
+
+        self.stdout.write(f"\n{path} ({options['requests']} requêtes, {options['concurrency']} clients)")
+        self.stdout.write(f"{'Mode':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erreurs':>9}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<20}{result['requests_per_second']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>9}"
+            )
+
+    def default_path(self):
+        tracking_number = Package.objects.values_list('tracking_number', flat=True).first()
+        if not tracking_number:
+            raise CommandError("Aucun colis : lancer generate_dataset ou préciser --path")
+        return reverse('packages:package_tracking', kwargs={'tracking_number': tracking_number})
@@ -0,0 +1,96 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+from core.benchmark import (
+    CASES, check_budgets, known_failures, make_baseline, run_benchmarks, seed_benchmark_data,
+    uncovered_routes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque endpoint de l'API (temps, requêtes SQL, temps SQL) sur une base de test "
+        "et échoue si un budget de la référence JSON est dépassé"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5, help='Appels mesurés par endpoint (défaut: 5)')
+        parser.add_argument('--baseline', default=str(settings.BENCHMARK_BASELINE_PATH),
+                            help='Fichier JSON de référence')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Enregistrer les mesures comme nouvelle référence')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Marge de latence des budgets générés (défaut: 0.5 = +50%%)')
+        parser.add_argument('--only', default='', help='Ne mesurer que les endpoints dont le nom contient ce texte')
+        parser.add_argument('--clients', type=int, default=50, help='Clients du jeu de données (défaut: 50)')
+        parser.add_argument('--packages-per-client', type=int, default=20, help='Colis par client (défaut: 20)')
+        parser.add_argument('--output', help='Écrire aussi les mesures dans ce fichier JSON')
+        parser.add_argument('--keepdb', action='store_true', help='Conserver la base de test')
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes()
+        if missing and not options['only']:
+            raise CommandError(f"Routes sans scénario de benchmark : {', '.join(missing)}")
+
+        cases = [case for case in CASES if options['only'] in case.url_name]
+        # Une ligne de log par appel mesuré noierait le rapport
+        logging.getLogger('core.middleware').setLevel(logging.ERROR)
+        runner = DiscoverRunner(verbosity=0, keepdb=options['keepdb'], interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            fixtures = seed_benchmark_data(options['clients'], options['packages_per_client'])
+            results = run_benchmarks(fixtures, cases, options['iterations'])
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        self.report(results)
+        skipped = known_failures(cases)
+        for label, reason in skipped.items():
+            self.stdout.write(self.style.WARNING(f"{label} ignoré (échec connu : {reason})"))
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline = make_baseline(results, options['latency_tolerance'])
+            if options['only'] and baseline_path.exists():
+                baseline = {**json.loads(baseline_path.read_text())['endpoints'], **baseline}
+            baseline = {label: value for label, value in baseline.items() if label not in skipped}
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({
+                'dataset': {'clients': options['clients'], 'packages_per_client': options['packages_per_client']},
+                'iterations': options['iterations'],
+                'endpoints': dict(sorted(baseline.items())),
+            }, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Référence enregistrée dans {baseline_path}"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())['endpoints'] if baseline_path.exists() else {}
+        if not baseline:
+            self.stdout.write(self.style.WARNING(f"Aucune référence ({baseline_path}) : budgets non vérifiés"))
+        new = sorted(set(results) - set(baseline)) if baseline else []
+        if new:
+            self.stdout.write(self.style.WARNING(f"Endpoints sans référence : {', '.join(new)}"))
+
+        failures = check_budgets(results, baseline)
+        if failures:
+            for label, message in failures:
+                self.stderr.write(f"  {label}: {message}")
+            raise CommandError(f"{len(failures)} dépassement(s) de budget")
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} endpoint(s) dans les budgets"))
+
+    def report(self, results):
+        width = max(len(label) for label in results)
+        self.stdout.write(f"{'endpoint'.ljust(width)}  status  requêtes   sql ms  total ms")
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label.ljust(width)}  {result['status']:>6}  {result['queries']:>8}"
+                f"  {result['sql_ms']:>7.2f}  {result['wall_ms']:>8.2f}"
+            )
@@ -0,0 +1,115 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from core.loadtest import free_port, run_load, start_server, stop_server
+from packages.models import Package
+
+SERVERS = {
+    'wsgi': (
+        "gunicorn core.wsgi:application --bind 127.0.0.1:{port} --workers {workers} "
+        "--worker-class gthread --threads {threads} --log-level warning"
+    ),
+    'asgi': "uvicorn core.asgi:application --host 127.0.0.1 --port {port} --workers {workers} --log-level warning",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare débit et latences des endpoints de lecture sous uvicorn (ASGI, vues async) "
+        "et gunicorn (WSGI, vues DRF), sur la base configurée (voir generate_dataset)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50, help='Clients simultanés (défaut: 50)')
+        parser.add_argument('--requests', type=int, default=2000, help='Requêtes par endpoint (défaut: 2000)')
+        parser.add_argument('--workers', type=int, default=1, help='Processus par serveur (défaut: 1)')
+        parser.add_argument('--threads', type=int, default=8, help='Threads par worker gunicorn (défaut: 8)')
+        parser.add_argument('--wsgi-command', default=SERVERS['wsgi'], help='Commande du serveur WSGI')
+        parser.add_argument('--asgi-command', default=SERVERS['asgi'], help='Commande du serveur ASGI')
+        parser.add_argument('--only', default='', help="Ne mesurer que les endpoints dont le nom contient ce texte")
+        parser.add_argument('--output', help='Écrire aussi les mesures dans ce fichier JSON')
+
+    def targets(self):
+        """(nom, chemin, en-têtes) des endpoints mesurés"""
+        targets = [
+            ('configuration:public-config', reverse('configuration:public-config'), {}),
+            ('configuration:maintenance-check', reverse('configuration:maintenance-check'), {}),
+            ('configuration:shipping-rates', reverse('configuration:shipping-rates'), {}),
+        ]
+        tracking_number = Package.objects.values_list('tracking_number', flat=True).first()
+        if tracking_number:
+            targets.append((
+                'packages:package_tracking',
+                reverse('packages:package_tracking', kwargs={'tracking_number': tracking_number}), {},
+            ))
+        else:
+            self.stderr.write("Aucun colis : suivi public non mesuré")
+
+        agent = User.objects.filter(role='agent_in', is_active=True).first()
+        if agent:
+            headers = {'Authorization': f"Token {Token.objects.get_or_create(user=agent)[0].key}"}
+            targets.append(('shipments:shipping_rates', reverse('shipments:shipping_rates'), headers))
+            client = User.objects.filter(role='client').exclude(last_name='').first()
+            query = (client.last_name if client else 'Jean')[:4]
+            targets.append(('accounts:search_clients', f"{reverse('accounts:search_clients')}?q={query}", headers))
+        else:
+            self.stderr.write("Aucun agent de réception : tarifs et recherche de clients non mesurés")
+        return [target for target in targets if self.only in target[0]]
+
+    def handle(self, *args, **options):
+        self.only = options['only']
+        targets = self.targets()
+        if not targets:
+            raise CommandError("Aucun endpoint à mesurer")
+
+        # Serveurs sans DEBUG (pas d'enregistrement des requêtes SQL) ni log par requête
+        env = {
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'DEBUG': 'False',
+            'REQUEST_LOG_LEVEL': 'WARNING',
+        }
+        commands = {'wsgi': options['wsgi_command'], 'asgi': options['asgi_command']}
+        results = {}
+        for server, command in commands.items():
+            port = free_port()
+            command = command.format(port=port, workers=options['workers'], threads=options['threads'])
+            self.stdout.write(f"Démarrage {server} : {command}")
+            try:
+                process = start_server(command, port, {**env, 'ASGI_DEPLOYMENT': str(server == 'asgi')})
+            except (OSError, RuntimeError) as e:
+                raise CommandError(f"Impossible de démarrer le serveur {server} : {e}")
+            try:
+                for name, path, headers in targets:
+                    # Tour de chauffe : instantanés, connexions, caches
+                    run_load(port, path, headers, options['concurrency'], options['concurrency'])
+                    results.setdefault(name, {})[server] = run_load(
+                        port, path, headers, options['concurrency'], options['requests']
+                    )
+            finally:
+                stop_server(process)
+
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+
+    def report(self, results):
+        width = max(len(name) for name in results) + 2
+        self.stdout.write(
+            f"{'Endpoint':<{width}}{'serveur':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erreurs':>9}"
+        )
+        for name, servers in results.items():
+            for server, result in servers.items():
+                self.stdout.write(
+                    f"{name:<{width}}{server:>8}{result['requests_per_second']:>10}{result['p50_ms']:>10}"
+                    f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>9}"
+                )
+            wsgi, asgi = servers.get('wsgi'), servers.get('asgi')
+            if wsgi and asgi and wsgi['requests_per_second']:
+                ratio = asgi['requests_per_second'] / wsgi['requests_per_second']
+                self.stdout.write(self.style.SUCCESS(f"{'':<{width}}{'asgi/wsgi':>8} x{ratio:.2f}"))
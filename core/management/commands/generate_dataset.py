@@ -0,0 +1,54 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.datagen import GENERATED_DOMAIN, DatasetGenerator, delete_generated_data, generated_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique reproductible (clients, colis, consolidations, "
+        "expéditions, paiements, livraisons, visas, points de retrait)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=10000, help='Nombre de clients (défaut: 10000)')
+        parser.add_argument('--packages', type=int, default=200000, help='Nombre de colis (défaut: 200000)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur aléatoire (défaut: 42)')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Lignes écrites par tranche (défaut: 10000)')
+        parser.add_argument('--days', type=int, default=730, help="Profondeur d'historique en jours (défaut: 730)")
+        parser.add_argument('--pickup-points', type=int, default=40, help='Points de retrait et bureaux (défaut: 40)')
+        parser.add_argument('--replace', action='store_true',
+                            help='Supprimer au préalable les données générées par une exécution précédente')
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help='Ne pas reconstruire les agrégats des rapports')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1:
+            raise CommandError("--clients doit être au moins 1")
+
+        if generated_users().exists():
+            if not options['replace']:
+                raise CommandError(
+                    f"Des données générées (@{GENERATED_DOMAIN}) existent déjà ; utilisez --replace pour les remplacer"
+                )
+            started = time.perf_counter()
+            delete_generated_data()
+            self.stdout.write(f"Anciennes données supprimées en {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        generator = DatasetGenerator(
+            clients=options['clients'], packages=options['packages'], seed=options['seed'],
+            chunk_size=options['chunk_size'], days=options['days'], pickup_points=options['pickup_points'],
+        )
+        with transaction.atomic():
+            counts = generator.run()
+
+        for label, count in counts.items():
+            self.stdout.write(f"  {label:<45} {count:>12}")
+        self.stdout.write(self.style.SUCCESS(f"Jeu de données généré en {time.perf_counter() - started:.1f}s"))
+
+        if not options['skip_rollups']:
+            call_command('refresh_report_rollups', all=True, stdout=self.stdout)
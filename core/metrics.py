@@ -0,0 +1,87 @@
+"""
+Métriques Prometheus du service, exposées sur /metrics.
+
+Derrière gunicorn, chaque worker écrit ses valeurs dans des fichiers
+mmap du répertoire PROMETHEUS_MULTIPROC_DIR (mode multiprocess de
+prometheus_client) et /metrics agrège tous les workers. Le répertoire doit
+être vidé au démarrage du serveur et le hook gunicorn child_exit doit
+appeler prometheus_client.multiprocess.mark_process_dead(worker.pid).
+Sans cette variable, chaque processus expose ses propres compteurs.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LATENCY = Histogram(
+    'belpanye_http_request_duration_seconds', "Durée des requêtes HTTP par route",
+    ['route', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    'belpanye_http_requests', "Requêtes HTTP par route et code de statut",
+    ['route', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'belpanye_http_request_db_queries', "Requêtes SQL par requête HTTP",
+    ['route'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'belpanye_http_request_db_duration_seconds', "Temps SQL par requête HTTP",
+    ['route'], buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'belpanye_cache_requests', "Lectures de cache (hit/miss) par cache",
+    ['cache', 'result'],
+)
+CACHE_COALESCED = Counter(
+    'belpanye_cache_coalesced_requests', "Requêtes servies sans recalcul pendant qu'une autre recalcule la valeur",
+    ['cache', 'outcome'],
+)
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def record_coalesced(name, outcome):
+    """outcome : 'stale' (valeur périmée servie), 'waited' (valeur attendue) ou 'timeout' (recalcul local)"""
+    CACHE_COALESCED.labels(name, outcome).inc()
+
+
+def observe_request(route, method, status, duration, query_count, query_duration):
+    route = route or UNMATCHED_ROUTE
+    REQUEST_LATENCY.labels(route, method).observe(duration)
+    REQUESTS.labels(route, method, str(status)).inc()
+    DB_QUERIES.labels(route).observe(query_count)
+    DB_DURATION.labels(route).observe(query_duration)
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def _is_authorized(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    # REMOTE_ADDR et non X-Forwarded-For, que le client peut fixer librement
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Métriques au format texte Prometheus (jeton ou IPs autorisées)"""
+    if not _is_authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,376 @@
+"""
+Instrumentation des requêtes : nombre de requêtes SQL, temps SQL, requête
+la plus lente et temps de la vue.
+
+Les mesures passent par connection.execute_wrapper, uniquement pour les
+requêtes HTTP échantillonnées (REQUEST_INSTRUMENTATION_SAMPLE_RATE) : à 0,
+le middleware n'ajoute qu'un tirage aléatoire par requête. Chaque requête
+mesurée produit une ligne de log JSON ; les administrateurs reçoivent aussi
+les mesures dans l'en-tête Server-Timing. Les requêtes SQL lentes et les
+requêtes HTTP trop bavardes partent dans le log « slow » avec un résumé de
+la pile d'appel.
+"""
+import json
+import logging
+import random
+import threading
+import traceback
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_router import end_routing, mark_sticky, replica_enabled, start_routing
+from .metrics import observe_request
+from .models import RequestProfile
+from .profiler import StackSampler, acquire_slot, is_profile_requested, release_slot, request_staff_user
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f'{__name__}.slow')
+
+STACK_DEPTH = 6
+SQL_PREVIEW_LENGTH = 300
+
+
+def stack_summary(depth=STACK_DEPTH):
+    """Dernières frames du code du projet (hors Django, DRF et ce module)"""
+    project_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(project_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return [f"{frame.filename[len(project_dir) + 1:]}:{frame.lineno} in {frame.name}" for frame in frames[-depth:]]
+
+
+def wrap_connections(stack, wrapper):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+class QueryCounter:
+    """Wrapper d'exécution SQL : nombre et durée totale des requêtes"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+class QueryRecorder(QueryCounter):
+    """Wrapper d'exécution SQL qui accumule les mesures détaillées d'une requête HTTP"""
+
+    def __init__(self, slow_query_ms, max_queries):
+        super().__init__()
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.max_queries = max_queries
+        self.slowest_duration = 0.0
+        self.slowest_sql = ''
+        self.slow_queries = []
+        # Pile capturée à la requête qui dépasse le budget (une seule fois)
+        self.overflow_stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+            if duration >= self.slow_query_seconds:
+                self.slow_queries.append((duration, sql, stack_summary()))
+            if self.count == self.max_queries + 1:
+                self.overflow_stack = stack_summary()
+
+
+def resolved_route(request):
+    return request.resolver_match.view_name if request.resolver_match else None
+
+
+def view_is_async(request):
+    """Vrai si la vue de la requête est une coroutine (exécutée sur la boucle d'événements)"""
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return False
+    return iscoroutinefunction(match.func)
+
+
+class HybridMiddleware:
+    """
+    Base des middlewares utilisables en WSGI comme en ASGI : sous ASGI,
+    __call__ retourne la coroutine de acall() et la chaîne reste async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+
+def _request_user(request):
+    user = getattr(request, 'user', None)
+    return user if user is not None and user.is_authenticated else None
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Alimente les histogrammes Prometheus (core.metrics) pour chaque requête"""
+
+    def call(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, counter)
+            response = self.get_response(request)
+        self.observe(request, response, perf_counter() - started, counter)
+        return response
+
+    async def acall(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, counter)
+            response = await self.get_response(request)
+        self.observe(request, response, perf_counter() - started, counter)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration, counter):
+        observe_request(
+            resolved_route(request), request.method, response.status_code,
+            duration, counter.count, counter.duration,
+        )
+
+
+class RequestInstrumentationMiddleware(HybridMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = settings.REQUEST_INSTRUMENTATION_SAMPLE_RATE
+        self.slow_query_ms = settings.SLOW_QUERY_MS
+        self.max_queries = settings.SLOW_REQUEST_QUERIES
+
+    def is_sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def call(self, request):
+        if not self.is_sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder(self.slow_query_ms, self.max_queries)
+        started = perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, recorder)
+            response = self.get_response(request)
+        total = perf_counter() - started
+        self.report(request, response, _request_user(request), recorder, total)
+        return response
+
+    async def acall(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder(self.slow_query_ms, self.max_queries)
+        started = perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, recorder)
+            response = await self.get_response(request)
+        total = perf_counter() - started
+        # request.user peut être paresseux (requête SQL) : évalué hors de la boucle
+        user = await sync_to_async(_request_user)(request)
+        self.report(request, response, user, recorder, total)
+        return response
+
+    def report(self, request, response, user, recorder, total):
+        route = resolved_route(request)
+        self.log_request(request, response, route, user, recorder, total)
+        self.log_slow(request, route, recorder)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = self.server_timing(recorder, total)
+
+    @staticmethod
+    def server_timing(recorder, total):
+        return ', '.join([
+            f'sql;dur={recorder.duration * 1000:.1f};desc="{recorder.count} SQL"',
+            f'sql-slowest;dur={recorder.slowest_duration * 1000:.1f}',
+            f'app;dur={(total - recorder.duration) * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    @staticmethod
+    def log_request(request, response, route, user, recorder, total):
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': route,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None else None,
+            'duration_ms': round(total * 1000, 2),
+            'sql_count': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'sql_slowest_ms': round(recorder.slowest_duration * 1000, 2),
+            'sql_slowest': recorder.slowest_sql[:SQL_PREVIEW_LENGTH],
+        }, ensure_ascii=False))
+
+    def log_slow(self, request, route, recorder):
+        for duration, sql, stack in recorder.slow_queries:
+            slow_logger.warning(json.dumps({
+                'kind': 'slow_query',
+                'path': request.path,
+                'route': route,
+                'duration_ms': round(duration * 1000, 2),
+                'sql': sql[:SQL_PREVIEW_LENGTH],
+                'stack': stack,
+            }, ensure_ascii=False))
+        if recorder.count > self.max_queries:
+            slow_logger.warning(json.dumps({
+                'kind': 'too_many_queries',
+                'path': request.path,
+                'route': route,
+                'sql_count': recorder.count,
+                'budget': self.max_queries,
+                'stack': recorder.overflow_stack,
+            }, ensure_ascii=False))
+
+
+class RequestProfilerMiddleware(HybridMiddleware):
+    """
+    Profile la requête d'un administrateur qui le demande (voir core.profiler).
+    Sous ASGI, une vue synchrone s'exécute dans le thread de sync_to_async
+    propre à la requête : l'échantillonneur y est démarré pour suivre ce
+    thread plutôt que la boucle d'événements, qui n'exécute que les vues async.
+    """
+
+    def call(self, request):
+        if not is_profile_requested(request):
+            return self.get_response(request)
+        user = request_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        if not acquire_slot():
+            return self.skipped(self.get_response(request))
+
+        try:
+            sampler = self.start_sampler()
+            started = perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            duration = perf_counter() - started
+        finally:
+            release_slot()
+
+        profile = RequestProfile.objects.create(**self.profile_fields(request, response, user, sampler, duration))
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    async def acall(self, request):
+        if not is_profile_requested(request):
+            return await self.get_response(request)
+        user = await sync_to_async(request_staff_user)(request)
+        if user is None:
+            return await self.get_response(request)
+        if not acquire_slot():
+            return self.skipped(await self.get_response(request))
+
+        try:
+            if view_is_async(request):
+                sampler = self.start_sampler()
+            else:
+                sampler = await sync_to_async(self.start_sampler)()
+            started = perf_counter()
+            try:
+                response = await self.get_response(request)
+            finally:
+                sampler.stop()
+            duration = perf_counter() - started
+        finally:
+            release_slot()
+
+        profile = await RequestProfile.objects.acreate(**self.profile_fields(request, response, user, sampler, duration))
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    @staticmethod
+    def skipped(response):
+        response['X-Profile-Skipped'] = 'rate-limited'
+        return response
+
+    @staticmethod
+    def start_sampler():
+        sampler = StackSampler(
+            threading.get_ident(), settings.REQUEST_PROFILER_INTERVAL_MS, settings.REQUEST_PROFILER_MAX_SECONDS
+        )
+        sampler.start()
+        return sampler
+
+    @staticmethod
+    def profile_fields(request, response, user, sampler, duration):
+        return {
+            'user': user,
+            'method': request.method,
+            'path': request.get_full_path()[:500],
+            'route': resolved_route(request) or '',
+            'status_code': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'interval_ms': settings.REQUEST_PROFILER_INTERVAL_MS,
+            'sample_count': sampler.sample_count,
+            'collapsed_stacks': sampler.collapsed(),
+        }
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Routage des lectures de la requête vers le réplica selon la vue, et
+    lectures sur le primaire après une écriture du client (voir core.db_router).
+    """
+
+    def __init__(self, get_response):
+        if not replica_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        token = start_routing(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_routing(token)
+        if request.method not in SAFE_METHODS:
+            mark_sticky(request)
+        return response
+
+    async def acall(self, request):
+        token = start_routing(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_routing(token)
+        if request.method not in SAFE_METHODS:
+            mark_sticky(request)
+        return response
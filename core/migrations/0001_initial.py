@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('route', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('interval_ms', models.FloatField()),
+                ('sample_count', models.PositiveIntegerField()),
+                ('collapsed_stacks', models.TextField(blank=True, help_text='Piles agrégées au format « collapsed » (flamegraph.pl, speedscope)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Profil d'échantillonnage d'une requête, déclenché par un administrateur"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='request_profiles',
+        verbose_name='Demandé par'
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    route = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    interval_ms = models.FloatField()
+    sample_count = models.PositiveIntegerField()
+    collapsed_stacks = models.TextField(
+        blank=True,
+        help_text="Piles agrégées au format « collapsed » (flamegraph.pl, speedscope)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Profil de requête'
+        verbose_name_plural = 'Profils de requêtes'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,117 @@
+"""
+Profilage à la demande d'une requête par échantillonnage.
+
+Un thread lit la pile du thread qui traite la requête toutes les
+REQUEST_PROFILER_INTERVAL_MS via sys._current_frames() : la requête
+profilée n'est pas instrumentée (pas de sys.setprofile) et le coût reste
+celui d'un parcours de pile par intervalle. Les piles sont agrégées au
+format « collapsed » (une ligne « a;b;c N » par pile distincte), lisible
+par flamegraph.pl ou speedscope.
+
+Seuls les administrateurs peuvent déclencher un profil (en-tête
+X-Profile: 1 ou paramètre ?_profile=1) ; un seul profil à la fois par
+processus et REQUEST_PROFILER_MAX_PER_MINUTE profils par minute au total.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+RATE_LIMIT_KEY = 'request_profiler:minute:{}'
+
+_profiling = threading.Lock()
+
+
+def is_profile_requested(request):
+    return request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_QUERY_PARAM) == '1'
+
+
+def request_staff_user(request):
+    """Administrateur authentifié par session ou par jeton, sinon None"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = result[0] if result else None
+    return user if user is not None and user.is_staff else None
+
+
+def acquire_slot():
+    """Réserve le droit de profiler ; retourne False si la limite est atteinte"""
+    if not _profiling.acquire(blocking=False):
+        return False
+    key = RATE_LIMIT_KEY.format(int(time.time() // 60))
+    cache.add(key, 0, 120)
+    if cache.incr(key) > settings.REQUEST_PROFILER_MAX_PER_MINUTE:
+        _profiling.release()
+        return False
+    return True
+
+
+def release_slot():
+    _profiling.release()
+
+
+def _frame_label(code, prefixes):
+    filename = code.co_filename
+    for prefix in prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f"{code.co_name} ({filename})"
+
+
+class StackSampler:
+    """Échantillonne la pile d'un thread jusqu'à stop() ou la durée maximale"""
+
+    def __init__(self, thread_id, interval_ms, max_seconds):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        # Chemins raccourcis dans les libellés (le plus long d'abord)
+        self._prefixes = sorted(
+            {str(settings.BASE_DIR), *(path for path in sys.path if path.endswith('-packages'))},
+            key=len, reverse=True,
+        )
+        self._labels = {}
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code, self._prefixes)
+                stack.append(label)
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
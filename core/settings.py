@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,20 +32,28 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
+    'core',
     'accounts',
     'packages',
     'shipments',
     'configuration',
     'addresses',
+    'reports',
+    'notifications',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestInstrumentationMiddleware',
+    'configuration.middleware.MaintenanceModeMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,20 +77,120 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Vrai quand le serveur charge core.asgi (qui le positionne) : les routes de
+# lecture y sont servies par des vues async, sous WSGI par les vues DRF
+ASGI_DEPLOYMENT = config('ASGI_DEPLOYMENT', default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connexions persistantes (DB_CONN_MAX_AGE secondes, 0 = une connexion par
+# requête), vérifiées avant réutilisation. Sous ASGI, chaque requête s'exécute
+# dans un thread différent et les connexions persistantes s'accumulent : 0 par
+# défaut, DB_POOL=True (pool psycopg 3, paquet psycopg[pool]) pour réutiliser
+# les connexions. Django refuse de combiner pool et connexions persistantes.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_CONN_MAX_AGE = 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=0 if ASGI_DEPLOYMENT else 60, cast=int)
+if ASGI_DEPLOYMENT and DB_CONN_MAX_AGE:
+    raise ImproperlyConfigured(
+        "DB_CONN_MAX_AGE doit valoir 0 sous ASGI (connexions persistantes) ; utiliser DB_POOL=True"
+    )
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'belpanye',
-        'USER': 'postgres',
-        'PASSWORD': '4443',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': config('DB_NAME', default='belpanye'),
+        'USER': config('DB_USER', default='postgres'),
+        'PASSWORD': config('DB_PASSWORD', default='4443'),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Réplica en lecture (core.db_router), déclaré dès que DB_REPLICA_HOST ou
+# DB_REPLICA_NAME est renseigné ; les autres réglages reprennent ceux du primaire
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+DB_REPLICA_NAME = config('DB_REPLICA_NAME', default='')
+if DB_REPLICA_HOST or DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DB_REPLICA_NAME or DATABASES['default']['NAME'],
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': DB_REPLICA_HOST or DATABASES['default']['HOST'],
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        # Les tests lisent la base de test du primaire
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Vues dont les lectures peuvent partir sur le réplica (décorateurs
+# use_replica / use_primary prioritaires) et durée de lecture sur le primaire
+# après une écriture du même client
+REPLICA_READ_VIEWS = (
+    'packages:agent_in_packages',
+    'packages:admin_package_list',
+    'reports:report_summary',
+)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+# Cache (core.cache) : L1 par processus devant le cache partagé entre les
+# workers, Redis (paquet redis) si REDIS_URL est défini. Sans REDIS_URL, le
+# cache partagé est un LocMemCache propre à chaque processus (tests,
+# développement avec un seul worker).
+REDIS_URL = config('REDIS_URL', default='')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'shared': 'shared',
+            'l1_max_entries': config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int),
+            'l1_timeout': config('CACHE_L1_TIMEOUT', default=5, cast=float),
+            'sync_interval': config('CACHE_L1_SYNC_INTERVAL', default=0.5, cast=float),
+            # Seules ces clés (lues à chaque requête, rarement écrites) passent par
+            # le L1 ; les autres (routage, idempotence, profilage, verrous) vont
+            # directement au cache partagé
+            'l1_key_prefixes': (
+                'snapshot:', 'app_config:', 'maintenance_mode:', 'shipping_rates:', 'addresses:',
+                'notification_templates:', 'client_search:',
+            ),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'belpanye',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'belpanye-shared',
+    },
+}
+
+# Recalculs coalescés (core.cache.get_or_compute) : attente maximale d'une
+# valeur recalculée par une autre requête, durée de vie du verrou de calcul
+CACHE_COMPUTE_WAIT = config('CACHE_COMPUTE_WAIT', default=2.0, cast=float)
+CACHE_COMPUTE_LOCK_TIMEOUT = config('CACHE_COMPUTE_LOCK_TIMEOUT', default=30, cast=int)
+
+# Âge maximal d'un instantané (core.snapshots) : la clé de version expire et
+# force un rechargement, même si l'invalidation d'un autre worker n'a pas
+# atteint ce processus (cache partagé propre au processus sans REDIS_URL)
+SNAPSHOT_MAX_AGE = config('SNAPSHOT_MAX_AGE', default=300, cast=int)
 
 
 # Password validation
@@ -140,3 +249,73 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 AUTH_USER_MODEL = 'accounts.User'
+
+# Secrets HMAC des webhooks de paiement : sans secret, le récepteur du
+# fournisseur répond 503 (événements non signés acceptés en DEBUG seulement)
+PAYMENT_WEBHOOK_SECRETS = {
+    'moncash': config('MONCASH_WEBHOOK_SECRET', default=''),
+    'stripe': config('STRIPE_WEBHOOK_SECRET', default=''),
+    'bank_transfer': config('BANK_WEBHOOK_SECRET', default=''),
+}
+
+# Envoi des notifications (commande send_notifications)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Belpanye <noreply@belpanye.com>')
+EMAIL_HOST_PASSWORD = config('SMTP_PASSWORD', default='')
+NOTIFICATION_PROVIDERS = {
+    'sms': {
+        'url': config('SMS_PROVIDER_URL', default=''),
+        'token': config('SMS_PROVIDER_TOKEN', default=''),
+    },
+    'whatsapp': {
+        'url': config('WHATSAPP_PROVIDER_URL', default=''),
+        'token': config('WHATSAPP_PROVIDER_TOKEN', default=''),
+    },
+}
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=6, cast=int)
+NOTIFICATION_TIMEOUT = config('NOTIFICATION_TIMEOUT', default=10, cast=int)
+# Regroupement des notifications : fenêtre en secondes (0 pour désactiver)
+NOTIFICATION_DIGEST_WINDOW = config('NOTIFICATION_DIGEST_WINDOW', default=600, cast=int)
+NOTIFICATION_DIGEST_EVENTS = ('package_received',)
+
+# Référence des budgets de la commande benchmark_endpoints
+BENCHMARK_BASELINE_PATH = BASE_DIR / 'benchmarks' / 'baseline.json'
+
+# Instrumentation des requêtes (core.middleware) : part des requêtes mesurées
+# (désactivée par défaut, 1 pour mesurer et journaliser chaque requête), seuil
+# des requêtes SQL lentes et budget de requêtes SQL
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = config('REQUEST_INSTRUMENTATION_SAMPLE_RATE', default=0.0, cast=float)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=int)
+SLOW_REQUEST_QUERIES = config('SLOW_REQUEST_QUERIES', default=50, cast=int)
+
+# Nombre de proxys de confiance devant l'application (nginx, répartiteur) :
+# l'IP du client est lue dans X-Forwarded-For à cette profondeur (mode
+# maintenance). 0 : REMOTE_ADDR
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
+# Accès à /metrics : jeton Bearer si défini, sinon IPs autorisées
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Profilage à la demande (core.profiler) : intervalle d'échantillonnage,
+# durée maximale et nombre de profils par minute pour tous les workers
+REQUEST_PROFILER_INTERVAL_MS = config('REQUEST_PROFILER_INTERVAL_MS', default=5, cast=float)
+REQUEST_PROFILER_MAX_SECONDS = config('REQUEST_PROFILER_MAX_SECONDS', default=30, cast=int)
+REQUEST_PROFILER_MAX_PER_MINUTE = config('REQUEST_PROFILER_MAX_PER_MINUTE', default=6, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'line': {'format': '{asctime} {levelname} {name} {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'line'},
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': config('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
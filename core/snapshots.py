@@ -0,0 +1,77 @@
+"""
+Instantanés immuables par processus, invalidés par une clé de version partagée.
+
+Chaque lecture ne coûte qu'un cache.get de la clé de version : la valeur
+n'est rechargée (requête SQL) que lorsque la version change, c'est-à-dire
+après une écriture qui appelle invalidate(). Le rechargement passe par
+get_or_compute() : après une invalidation, un seul processus lit la base et
+les autres reprennent sa valeur depuis le cache partagé.
+
+La clé de version expire après SNAPSHOT_MAX_AGE secondes : un instantané
+n'a jamais plus de SNAPSHOT_MAX_AGE (plus l1_timeout du L1) secondes, même
+quand l'invalidation n'atteint pas les autres processus (cache partagé
+propre à chaque processus).
+"""
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_or_compute
+from .db_router import primary_reads
+from .metrics import record_cache
+
+SNAPSHOT_VALUE_KEY = 'snapshot:{}:{}'
+# Valeurs publiées dans le cache partagé, une par version
+SNAPSHOT_VALUE_TIMEOUT = 3600
+
+
+class VersionedSnapshot:
+    def __init__(self, version_key, loader, name=None):
+        self.version_key = version_key
+        self.name = name or version_key
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Premier processus à lire : initialiser la version partagée
+            cache.add(self.version_key, uuid.uuid4().hex, settings.SNAPSHOT_MAX_AGE)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self):
+        version = self.current_version()
+        record_cache(self.name, version == self._version)
+        if version != self._version or version is None:
+            with self._lock:
+                if version != self._version or version is None:
+                    # Jamais depuis le réplica : la valeur serait figée sous la nouvelle version
+                    with primary_reads():
+                        self._value = self.load(version)
+                    self._version = version
+        return self._value
+
+    def load(self, version):
+        if version is None:
+            return self.loader()
+        return get_or_compute(
+            f'{self.name}:load', SNAPSHOT_VALUE_KEY.format(self.name, version), self.loader, SNAPSHOT_VALUE_TIMEOUT
+        )
+
+    async def aget(self):
+        """get() pour les vues async : seul un rechargement change de thread"""
+        version = await cache.aget(self.version_key)
+        if version is None or version != self._version:
+            return await sync_to_async(self.get)()
+        record_cache(self.name, True)
+        return self._value
+
+    def invalidate(self):
+        """Change la version partagée : tous les processus rechargeront à la prochaine lecture"""
+        cache.set(self.version_key, uuid.uuid4().hex, settings.SNAPSHOT_MAX_AGE)
@@ -0,0 +1,410 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import skipUnless
+from django.urls import path, resolve, reverse
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from packages.models import Package
+from accounts.views import asearch_clients_view
+from shipments.models import ShippingRate
+from shipments.views import ashipping_rate_list
+from .async_api import deployment_view
+from .cache import COMPUTE_LOCK_KEY, INVALIDATION_SEQ_KEY, TieredCache, aget_or_compute, get_or_compute
+from .models import RequestProfile
+from .snapshots import VersionedSnapshot
+from .db_router import (
+    REPLICA_DB_ALIAS, ReplicaRouter, end_routing, mark_sticky, primary_reads, replica_enabled, start_routing,
+    use_primary,
+)
+
+def slow_sync_view(request):
+    time.sleep(0.1)
+    return JsonResponse({})
+
+
+# Vues async montées sur les chemins de l'API, comme sous ASGI
+urlpatterns = [
+    path('api/shipments/rates/', ashipping_rate_list),
+    path('api/auth/clients/search/', asearch_clients_view),
+    path('slow/', slow_sync_view),
+]
+
+
+class DeploymentViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ShippingRate.objects.create(
+            shipping_type='air', min_weight=0, max_weight=50, price_per_kg=Decimal('4.50'), delivery_days=5
+        )
+        self.agent = User.objects.create_user(
+            email='agent@example.com', username='agent', password='secret', role='agent_in'
+        )
+        User.objects.create_user(
+            email='jean@example.com', username='jean', password='secret', first_name='Jean', role='client'
+        )
+        self.token = Token.objects.create(user=self.agent).key
+
+    def get_both(self, url, headers=None):
+        """Réponses de la vue DRF (WSGI) et de la vue async (ASGI) pour la même requête"""
+        sync_response = self.client.get(url, headers=headers)
+        cache.clear()
+        with override_settings(ROOT_URLCONF='core.tests'):
+            async_response = async_to_sync(self.async_client.get)(url, headers=headers)
+        return sync_response, async_response
+
+    def test_wsgi_routes_use_drf_views(self):
+        for url in ('/api/shipments/rates/', '/api/auth/clients/search/', '/api/config/public/'):
+            view = resolve(url).func
+            self.assertFalse(asyncio.iscoroutinefunction(view), url)
+            self.assertTrue(hasattr(view, 'cls'), url)
+
+    def test_selection_follows_deployment(self):
+        with override_settings(ASGI_DEPLOYMENT=True):
+            self.assertIs(deployment_view(None, ashipping_rate_list), ashipping_rate_list)
+        self.assertIsNone(deployment_view(None, ashipping_rate_list))
+
+    def test_anonymous_requests_are_refused_like_drf(self):
+        for url in ('/api/shipments/rates/', '/api/auth/clients/search/?q=Jean'):
+            sync_response, async_response = self.get_both(url)
+            self.assertEqual(async_response.status_code, sync_response.status_code, url)
+            self.assertEqual(async_response.json(), sync_response.json(), url)
+            self.assertEqual(async_response.get('WWW-Authenticate'), sync_response.get('WWW-Authenticate'), url)
+            if async_response.status_code == 401:
+                self.assertTrue(async_response.has_header('WWW-Authenticate'), url)
+
+    @override_settings(REST_FRAMEWORK={
+        'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication'],
+        'PAGE_SIZE': 20,
+    })
+    def test_token_first_answers_401_with_challenge(self):
+        with override_settings(ROOT_URLCONF='core.tests'):
+            response = async_to_sync(self.async_client.get)('/api/shipments/rates/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    def test_token_authenticated_responses_match(self):
+        for url in ('/api/shipments/rates/', '/api/auth/clients/search/?q=Jean'):
+            sync_response, async_response = self.get_both(url, {'Authorization': f"Token {self.token}"})
+            self.assertEqual(sync_response.status_code, 200, url)
+            self.assertEqual(async_response.status_code, 200, url)
+            self.assertEqual(async_response.json(), sync_response.json(), url)
+
+
+class ConnectionSettingsTests(TestCase):
+    def load_settings(self, **env):
+        """CONN_MAX_AGE calculé par core/settings.py dans un processus neuf"""
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(('DB_', 'ASGI_'))}
+        return subprocess.run(
+            [sys.executable, '-c', "import core.settings as s; print(s.DATABASES['default']['CONN_MAX_AGE'])"],
+            cwd=settings.BASE_DIR, env={**environ, **env}, capture_output=True, text=True,
+        )
+
+    def test_persistent_connections_only_under_wsgi(self):
+        self.assertEqual(self.load_settings().stdout.strip(), '60')
+        self.assertEqual(self.load_settings(ASGI_DEPLOYMENT='True').stdout.strip(), '0')
+        self.assertEqual(self.load_settings(ASGI_DEPLOYMENT='True', DB_POOL='True').stdout.strip(), '0')
+
+    def test_asgi_refuses_persistent_connections(self):
+        result = self.load_settings(ASGI_DEPLOYMENT='True', DB_CONN_MAX_AGE='60')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Décisions du routeur, sans base de données"""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def request(self, method, view_name, token='agent-token'):
+        url = reverse(view_name)
+        request = getattr(RequestFactory(), method)(url, HTTP_AUTHORIZATION=f"Token {token}")
+        request.resolver_match = resolve(url)
+        return request
+
+    def read_alias(self, request, model=Package):
+        routing = start_routing(request)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            end_routing(routing)
+
+    def test_reads_outside_a_request_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Package), 'default')
+
+    def test_listed_view_reads_from_replica(self):
+        self.assertEqual(self.read_alias(self.request('get', 'packages:agent_in_packages')), REPLICA_DB_ALIAS)
+        self.assertEqual(self.read_alias(self.request('get', 'packages:package_list_create')), 'default')
+
+    def test_unsafe_methods_and_credentials_use_primary(self):
+        request = self.request('post', 'packages:agent_in_packages')
+        self.assertEqual(self.read_alias(request), 'default')
+        self.assertEqual(self.read_alias(self.request('get', 'packages:agent_in_packages'), Token), 'default')
+        with primary_reads():
+            self.assertEqual(self.read_alias(self.request('get', 'packages:agent_in_packages')), 'default')
+
+    def test_writer_sticks_to_primary(self):
+        mark_sticky(self.request('patch', 'accounts:update_profile'))
+
+        self.assertEqual(self.read_alias(self.request('get', 'packages:agent_in_packages')), 'default')
+        other = self.request('get', 'packages:agent_in_packages', token='other-token')
+        self.assertEqual(self.read_alias(other), REPLICA_DB_ALIAS)
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_stickiness_expires(self):
+        mark_sticky(self.request('patch', 'accounts:update_profile'))
+        self.assertEqual(self.read_alias(self.request('get', 'packages:agent_in_packages')), REPLICA_DB_ALIAS)
+
+    def test_use_primary_overrides_setting(self):
+        request = self.request('get', 'packages:agent_in_packages')
+        view = resolve(request.path).func
+        self.addCleanup(delattr, view, 'use_replica')
+        use_primary(view)
+        self.assertEqual(self.read_alias(request), 'default')
+
+
+@skipUnless(replica_enabled(), "Réplica non configuré (DB_REPLICA_NAME ou DB_REPLICA_HOST)")
+class ReplicaRoutingTests(TransactionTestCase):
+    """Requêtes réelles sur les deux connexions (le réplica de test reflète la base de test du primaire)"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.agent = User.objects.create_user(
+            email='agent@example.com', username='agent', password='secret', role='agent_in'
+        )
+        self.headers = {'Authorization': f"Token {Token.objects.create(user=self.agent).key}"}
+        other = User.objects.create_user(email='other@example.com', username='other', password='secret', role='agent_in')
+        self.other_headers = {'Authorization': f"Token {Token.objects.create(user=other).key}"}
+
+    def get(self, headers):
+        """Requêtes sur les colis de la liste des colis, sur (primaire, réplica)"""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+                response = self.client.get(reverse('packages:agent_in_packages'), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return tuple(
+            [query['sql'] for query in queries.captured_queries if 'packages_package' in query['sql']]
+            for queries in (primary, replica)
+        )
+
+    def test_list_reads_from_replica(self):
+        primary, replica = self.get(self.headers)
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_client_reads_its_writes_on_primary(self):
+        response = self.client.patch(
+            reverse('accounts:update_profile'), {'first_name': 'Agent'}, content_type='application/json',
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        primary, replica = self.get(self.headers)
+        self.assertEqual(replica, [])
+        self.assertNotEqual(primary, [])
+
+        # Les autres clients continuent de lire sur le réplica
+        primary, replica = self.get(self.other_headers)
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Deux instances sur le même cache partagé, comme deux workers"""
+
+    def setUp(self):
+        cache.clear()
+        params = {'OPTIONS': {'shared': 'shared', 'sync_interval': 0, 'l1_key_prefixes': ('snapshot:',)}}
+        self.worker, self.other = TieredCache('', params), TieredCache('', params)
+        self.shared = self.worker.shared
+
+    def test_write_mostly_keys_bypass_l1(self):
+        seq = self.shared.get(INVALIDATION_SEQ_KEY)
+        for n in range(3):
+            self.worker.set(f"replica:sticky:{n}", True)
+            self.worker.add(f"request_profiler:minute:{n}", 0)
+            self.worker.incr(f"request_profiler:minute:{n}")
+            self.worker.delete(f"replica:sticky:{n}")
+
+        self.assertEqual(self.shared.get(INVALIDATION_SEQ_KEY), seq)
+        self.assertEqual(self.worker._l1, {})
+        self.assertEqual(self.other.get('request_profiler:minute:0'), 1)
+        self.assertEqual(self.other._l1, {})
+
+    def test_l1_keys_are_invalidated_across_workers(self):
+        self.worker.set('snapshot:rates:1', 'old')
+        self.assertEqual(self.other.get('snapshot:rates:1'), 'old')
+
+        seq = self.shared.get(INVALIDATION_SEQ_KEY)
+        self.worker.set('snapshot:rates:1', 'new')
+        self.assertEqual(self.shared.get(INVALIDATION_SEQ_KEY), seq + 1)
+        self.assertEqual(self.other.get('snapshot:rates:1'), 'new')
+
+
+
+class VersionedSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.rows = ['v1']
+        self.loads = 0
+        self.snapshot = VersionedSnapshot('test_snapshot:version', self.load, name='test_snapshot')
+
+    def load(self):
+        self.loads += 1
+        return list(self.rows)
+
+    def test_reloads_only_after_invalidate(self):
+        self.assertEqual(self.snapshot.get(), ['v1'])
+        self.rows.append('v2')
+        self.assertEqual(self.snapshot.get(), ['v1'])
+        self.snapshot.invalidate()
+        self.assertEqual(self.snapshot.get(), ['v1', 'v2'])
+        self.assertEqual(self.loads, 2)
+
+    @override_settings(SNAPSHOT_MAX_AGE=1)
+    def test_missed_invalidation_is_bounded_by_max_age(self):
+        # Écriture faite par un autre worker dont l'invalidation n'arrive pas ici
+        self.assertEqual(self.snapshot.get(), ['v1'])
+        self.rows.append('v2')
+        self.assertEqual(self.snapshot.get(), ['v1'])
+
+        time.sleep(1.1)
+        self.assertEqual(self.snapshot.get(), ['v1', 'v2'])
+        self.assertEqual(self.loads, 2)
+
+
+@override_settings(ROOT_URLCONF='core.tests', REQUEST_PROFILER_INTERVAL_MS=2)
+class AsgiProfilerTests(TestCase):
+    def test_sync_view_stack_is_sampled(self):
+        cache.clear()
+        admin = User.objects.create_user(email='admin@example.com', username='admin', password='secret', is_staff=True)
+        headers = {'Authorization': f"Token {Token.objects.create(user=admin).key}", 'X-Profile': '1'}
+
+        response = async_to_sync(self.async_client.get)('/slow/', headers=headers)
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertIn('slow_sync_view', profile.collapsed_stacks)
+
+
+class RequestInstrumentationTests(TestCase):
+    def test_disabled_by_default(self):
+        with self.assertNoLogs('core.middleware', level='INFO'):
+            self.client.get(reverse('configuration:maintenance-check'))
+
+    @override_settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_full_sampling_is_opt_in(self):
+        with self.assertLogs('core.middleware', level='INFO') as logs:
+            self.client.get(reverse('configuration:maintenance-check'))
+        self.assertIn('"route": "configuration:maintenance-check"', logs.output[0])
+
+
+class GetOrComputeTests(SimpleTestCase):
+    key = 'compute_test:value'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='calculé'):
+        self.calls += 1
+        return value
+
+    def hold_lock(self):
+        """Verrou posé par une autre requête en train de recalculer"""
+        cache.add(COMPUTE_LOCK_KEY.format(self.key), True, 30)
+
+    def test_concurrent_callers_compute_once(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_compute():
+            started.set()
+            release.wait(5)
+            return self.compute()
+
+        results = []
+
+        def call():
+            results.append(get_or_compute('test', self.key, slow_compute, 60))
+
+        # Chaque thread a sa propre instance du cache (son L1), comme un worker
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['calculé'] * 8)
+
+    def test_stale_value_is_served_during_recompute(self):
+        get_or_compute('test', self.key, lambda: self.compute('ancien'), 0, stale_timeout=60)
+        self.hold_lock()
+
+        self.assertEqual(get_or_compute('test', self.key, self.compute, 60), 'ancien')
+        self.assertEqual(self.calls, 1)
+
+        # Verrou libéré : la valeur périmée est recalculée
+        cache.delete(COMPUTE_LOCK_KEY.format(self.key))
+        self.assertEqual(get_or_compute('test', self.key, self.compute, 60), 'calculé')
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(CACHE_COMPUTE_WAIT=0.1)
+    def test_computes_itself_when_the_other_caller_is_too_slow(self):
+        self.hold_lock()
+        self.assertEqual(get_or_compute('test', self.key, self.compute, 60), 'calculé')
+        self.assertEqual(self.calls, 1)
+
+    def test_waits_for_the_value_computed_elsewhere(self):
+        self.hold_lock()
+        # Le calcul « ailleurs » écrit la valeur ; ce thread-ci ne doit pas calculer
+        timer = threading.Timer(0.1, cache.set, args=(self.key, (None, 'autre')))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(get_or_compute('test', self.key, self.compute, 60), 'autre')
+        self.assertEqual(self.calls, 0)
+
+    def test_failing_loader_releases_the_lock(self):
+        def fail():
+            raise ValueError('base indisponible')
+
+        with self.assertRaises(ValueError):
+            get_or_compute('test', self.key, fail, 60)
+        self.assertIsNone(cache.get(self.key))
+        self.assertIsNone(cache.get(COMPUTE_LOCK_KEY.format(self.key)))
+        self.assertEqual(get_or_compute('test', self.key, self.compute, 60), 'calculé')
+
+    def test_async_variant(self):
+        async def compute():
+            return self.compute()
+
+        async def fail():
+            raise ValueError('base indisponible')
+
+        run = async_to_sync(aget_or_compute)
+        with self.assertRaises(ValueError):
+            run('test', self.key, fail, 0)
+        self.assertIsNone(cache.get(COMPUTE_LOCK_KEY.format(self.key)))
+
+        self.assertEqual(run('test', self.key, compute, 0, 60), 'calculé')
+        self.hold_lock()
+        self.assertEqual(run('test', self.key, compute, 0, 60), 'calculé')
+        self.assertEqual(self.calls, 1)
@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
@@ -26,6 +28,8 @@ urlpatterns = [
     path('api/shipments/', include('shipments.urls')),
     path('api/config/', include('configuration.urls')),
     path('api/addresses/', include('addresses.urls')),
+    path('api/reports/', include('reports.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
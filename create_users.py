@@ -8,7 +8,7 @@ import sys
 import django
 
 
-sys.path.append('/Users/davidjeudy/belpanye/belpanye_backend')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Configuration Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -19,9 +19,6 @@ from accounts.models import User
 def create_test_users():
     """Créer des utilisateurs de test"""
     
-
-    User.objects.all().delete()
-    
     users_data = [
         {
             'email': 'client@example.com',
@@ -90,6 +87,9 @@ def create_test_users():
         }
     ]
     
+    # Ne supprimer que les comptes de test recréés ci-dessous
+    User.objects.filter(email__in=[user_data['email'] for user_data in users_data]).delete()
+    
     created_users = []
     
     for user_data in users_data:
@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import NotificationDigest, NotificationOutbox
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('event', 'channel', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel', 'event')
+    search_fields = ('recipient', 'user__email')
+    readonly_fields = ('created_at', 'sent_at')
+    raw_id_fields = ('user',)
+
+
+@admin.register(NotificationDigest)
+class NotificationDigestAdmin(admin.ModelAdmin):
+    list_display = ('event', 'channel', 'recipient', 'send_after', 'created_at')
+    list_filter = ('channel', 'event')
+    search_fields = ('recipient', 'user__email')
+    raw_id_fields = ('user',)
@@ -0,0 +1,118 @@
+"""
+Regroupement des notifications par utilisateur et canal.
+
+Les événements de NOTIFICATION_DIGEST_EVENTS ne vont pas directement dans
+l'outbox : ils sont ajoutés à un NotificationDigest par INSERT ... ON
+CONFLICT DO UPDATE, atomique entre processus. À l'expiration de la
+fenêtre, flush_due_digests() transforme chaque groupe en une seule
+notification dont le contexte agrège les événements ({package_count}).
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import NotificationDigest, NotificationOutbox
+
+# Variables additionnées dans un groupe ; les autres sont jointes par des virgules
+SUM_VARIABLES = {'weight', 'amount', 'total_cost'}
+
+UPSERT_SQL = """
+INSERT INTO {table} (user_id, channel, event, recipient, items, send_after, created_at)
+VALUES {values}
+ON CONFLICT (user_id, channel, event) DO UPDATE
+SET items = {table}.items || EXCLUDED.items,
+    recipient = EXCLUDED.recipient
+"""
+
+
+def is_digest_event(event):
+    return settings.NOTIFICATION_DIGEST_WINDOW > 0 and event in settings.NOTIFICATION_DIGEST_EVENTS
+
+
+def add_to_digests(event, entries):
+    """Ajoute les (user_id, channel, recipient, context) aux groupes ouverts"""
+    grouped = {}
+    for user_id, channel, recipient, context in entries:
+        key = (user_id, channel)
+        if key not in grouped:
+            grouped[key] = (recipient, [])
+        grouped[key][1].append(context)
+    if not grouped:
+        return
+
+    # Un seul INSERT pour tous les groupes (une ligne par clé de conflit)
+    now = timezone.now()
+    send_after = now + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW)
+    params = []
+    for (user_id, channel), (recipient, items) in grouped.items():
+        params += [user_id, channel, event, recipient, json.dumps(items, cls=DjangoJSONEncoder), send_after, now]
+    sql = UPSERT_SQL.format(
+        table=NotificationDigest._meta.db_table,
+        values=', '.join(['(%s, %s, %s, %s, %s::jsonb, %s, %s)'] * len(grouped)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _sum(values):
+    try:
+        return sum(Decimal(str(value)) for value in values)
+    except InvalidOperation:
+        return None
+
+
+def merge_contexts(items):
+    """Contexte d'un groupe : valeurs communes gardées, sommes ou listes sinon"""
+    unique = []
+    for item in items:
+        if item not in unique:
+            unique.append(item)
+    if len(unique) == 1:
+        return {**unique[0], 'package_count': 1}
+
+    merged = {}
+    for key in dict.fromkeys(key for item in unique for key in item):
+        values = [item[key] for item in unique if key in item]
+        total = _sum(values) if key in SUM_VARIABLES else None
+        if total is not None:
+            merged[key] = total
+        elif all(value == values[0] for value in values):
+            merged[key] = values[0]
+        else:
+            merged[key] = ', '.join(str(value) for value in dict.fromkeys(values))
+    merged['package_count'] = len(unique)
+    return merged
+
+
+def flush_due_digests(batch_size=500):
+    """
+    Transforme les groupes dont la fenêtre est écoulée en notifications de
+    l'outbox et retourne le nombre de groupes traités. Les lignes réservées
+    avec SKIP LOCKED ne sont vidées que par un seul worker.
+    """
+    with transaction.atomic():
+        digests = list(
+            NotificationDigest.objects
+            .select_for_update(skip_locked=True)
+            .filter(send_after__lte=timezone.now())
+            .order_by('send_after')[:batch_size]
+        )
+        if not digests:
+            return 0
+        NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(
+                event=digest.event,
+                channel=digest.channel,
+                user_id=digest.user_id,
+                recipient=digest.recipient,
+                context=merge_contexts(digest.items),
+            )
+            for digest in digests
+        ])
+        NotificationDigest.objects.filter(pk__in=[digest.pk for digest in digests]).delete()
+    return len(digests)
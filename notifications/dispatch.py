@@ -0,0 +1,166 @@
+"""
+Envoi asynchrone des notifications de l'outbox.
+
+Chaque lot est réservé avec SKIP LOCKED puis envoyé par canal : une seule
+connexion SMTP pour tous les emails du lot, appels HTTP SMS/WhatsApp
+concurrents via asyncio. Les échecs sont replanifiés avec un délai
+exponentiel jusqu'à NOTIFICATION_MAX_ATTEMPTS.
+"""
+import asyncio
+import json
+import urllib.request
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from configuration.snapshot import get_config_snapshot
+from .models import NotificationOutbox
+from .rendering import get_active_templates, render_message
+
+SENDING_LEASE = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+
+
+def claim_batch(batch_size):
+    """
+    Réserve un lot de notifications dues. Le bail (next_attempt_at) permet
+    de reprendre les notifications d'un worker arrêté en cours d'envoi.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+            status='sending', next_attempt_at=now + SENDING_LEASE
+        )
+    return rows
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def record_results(rows, errors):
+    """Marque les notifications envoyées ou les replanifie selon `errors` (pk -> message)"""
+    now = timezone.now()
+    for row in rows:
+        error = errors.get(row.pk)
+        if error is None:
+            row.status = 'sent'
+            row.sent_at = now
+            row.last_error = ''
+            continue
+        row.attempts += 1
+        row.last_error = error
+        if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            row.status = 'failed'
+        else:
+            row.status = 'pending'
+            row.next_attempt_at = now + backoff(row.attempts)
+    NotificationOutbox.objects.bulk_update(
+        rows, ['status', 'sent_at', 'attempts', 'last_error', 'next_attempt_at']
+    )
+
+
+def send_emails(rows, messages):
+    """Envoie les emails du lot sur une seule connexion SMTP"""
+    errors = {}
+    config = get_config_snapshot()
+    connection = get_connection(
+        host=config.smtp_host or settings.EMAIL_HOST,
+        port=config.smtp_port,
+        username=config.smtp_username or settings.EMAIL_HOST_USER,
+        password=settings.EMAIL_HOST_PASSWORD,
+        use_tls=config.smtp_use_tls,
+        timeout=settings.NOTIFICATION_TIMEOUT,
+    )
+    try:
+        connection.open()
+    except Exception as e:
+        return {row.pk: f"Connexion SMTP impossible : {e}" for row in rows}
+
+    try:
+        for row in rows:
+            subject, body = messages[row.pk]
+            try:
+                connection.send_messages([EmailMessage(subject, body, to=[row.recipient], connection=connection)])
+            except Exception as e:
+                errors[row.pk] = str(e)
+    finally:
+        connection.close()
+    return errors
+
+
+def _post_message(channel, recipient, body):
+    provider = settings.NOTIFICATION_PROVIDERS[channel]
+    request = urllib.request.Request(
+        provider['url'],
+        data=json.dumps({'to': recipient, 'message': body}).encode(),
+        method='POST',
+    )
+    request.add_header('Content-Type', 'application/json')
+    if provider['token']:
+        request.add_header('Authorization', f"Bearer {provider['token']}")
+    with urllib.request.urlopen(request, timeout=settings.NOTIFICATION_TIMEOUT) as response:
+        response.read()
+
+
+async def send_http_messages(channel, rows, messages, concurrency):
+    """Envoie les SMS/WhatsApp du lot en parallèle (au plus `concurrency` appels)"""
+    if not settings.NOTIFICATION_PROVIDERS[channel]['url']:
+        return {row.pk: f"Aucun fournisseur {channel} configuré" for row in rows}
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(row):
+        async with semaphore:
+            try:
+                await asyncio.to_thread(_post_message, channel, row.recipient, messages[row.pk][1])
+            except Exception as e:
+                return row.pk, str(e)
+            return row.pk, None
+
+    results = await asyncio.gather(*(send(row) for row in rows))
+    return {pk: error for pk, error in results if error is not None}
+
+
+async def dispatch_batch(batch_size=200, concurrency=20):
+    """Envoie un lot de notifications et retourne le nombre de notifications traitées"""
+    rows = await sync_to_async(claim_batch)(batch_size)
+    if not rows:
+        return 0
+
+    templates = await sync_to_async(get_active_templates)()
+    errors, messages, by_channel = {}, {}, {}
+    for row in rows:
+        template = templates.get(row.event)
+        if template is None:
+            errors[row.pk] = f"Aucun template actif pour {row.event}"
+            continue
+        try:
+            messages[row.pk] = render_message(template, row.channel, row.context)
+        except (ValueError, IndexError) as e:
+            errors[row.pk] = f"Template invalide : {e}"
+            continue
+        by_channel.setdefault(row.channel, []).append(row)
+
+    tasks = []
+    if 'email' in by_channel:
+        tasks.append(asyncio.to_thread(send_emails, by_channel['email'], messages))
+    for channel in ('sms', 'whatsapp'):
+        if channel in by_channel:
+            tasks.append(send_http_messages(channel, by_channel[channel], messages, concurrency))
+    for channel_errors in await asyncio.gather(*tasks):
+        errors.update(channel_errors)
+
+    await sync_to_async(record_results)(rows, errors)
+    return len(rows)
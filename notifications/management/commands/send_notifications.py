@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from notifications.digest import flush_due_digests
+from notifications.dispatch import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = "Envoie les notifications en attente (email, SMS, WhatsApp)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Notifications par lot (défaut: 200)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Appels SMS/WhatsApp simultanés (défaut: 20)')
+        parser.add_argument('--loop', action='store_true', help='Continuer à interroger la file')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Pause quand la file est vide, en secondes')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = asyncio.run(self.work(options))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} notification(s) traitée(s) en {elapsed:.2f}s"
+        ))
+
+    async def work(self, options):
+        processed = 0
+        while True:
+            await sync_to_async(flush_due_digests)()
+            count = await dispatch_batch(options['batch_size'], options['concurrency'])
+            processed += count
+            if count == 0:
+                if not options['loop']:
+                    return processed
+                await asyncio.sleep(options['sleep'])
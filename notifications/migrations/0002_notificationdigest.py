@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:22
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('package_received', 'Colis reçu'), ('shipment_created', 'Expédition créée'), ('shipment_shipped', 'Expédition envoyée'), ('shipment_delivered', 'Expédition livrée'), ('payment_received', 'Paiement reçu'), ('account_created', 'Compte créé')], max_length=50)),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('whatsapp', 'WhatsApp')], max_length=20)),
+                ('recipient', models.CharField(max_length=254)),
+                ('items', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('send_after', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_digests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notification groupée',
+                'verbose_name_plural': 'Notifications groupées',
+                'constraints': [models.UniqueConstraint(fields=('user', 'channel', 'event'), name='digest_user_channel_event_unique')],
+            },
+        ),
+    ]
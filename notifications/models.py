@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from configuration.models import NotificationTemplate
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notification à envoyer, écrite dans la même transaction que le changement
+    de statut qui la déclenche et envoyée plus tard par send_notifications
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+        ('whatsapp', 'WhatsApp'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sending', 'En cours d\'envoi'),
+        ('sent', 'Envoyée'),
+        ('failed', 'Échouée'),
+    ]
+    
+    event = models.CharField(max_length=50, choices=NotificationTemplate.TEMPLATE_TYPES)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    recipient = models.CharField(max_length=254)
+    context = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Notification à envoyer"
+        verbose_name_plural = "Notifications à envoyer"
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                name='outbox_due_idx',
+                condition=models.Q(status__in=['pending', 'sending']),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_display()} ({self.channel}) -> {self.recipient}"
+
+
+class NotificationDigest(models.Model):
+    """
+    Événements d'un même utilisateur/canal regroupés pendant la fenêtre
+    NOTIFICATION_DIGEST_WINDOW ; une seule ligne ouverte par
+    (utilisateur, canal, événement), garantie par la contrainte unique
+    """
+    event = models.CharField(max_length=50, choices=NotificationTemplate.TEMPLATE_TYPES)
+    channel = models.CharField(max_length=20, choices=NotificationOutbox.CHANNEL_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_digests')
+    recipient = models.CharField(max_length=254)
+    items = models.JSONField(encoder=DjangoJSONEncoder, default=list)
+    send_after = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Notification groupée"
+        verbose_name_plural = "Notifications groupées"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'channel', 'event'], name='digest_user_channel_event_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_display()} ({self.channel}) x{len(self.items)} -> {self.recipient}"
@@ -0,0 +1,89 @@
+"""
+Écriture dans la file de notifications (outbox transactionnelle).
+
+Les vues appellent enqueue_notification() dans la transaction de leur
+changement de statut : la notification n'existe que si le changement est
+validé, et aucun envoi SMTP/WhatsApp ne bloque la requête.
+"""
+from configuration.snapshot import get_config_snapshot
+from .digest import add_to_digests, is_digest_event
+from .models import NotificationOutbox
+
+# Options de configuration qui activent chaque événement (toujours actif si absent)
+EVENT_FLAGS = {
+    'package_received': 'notify_on_package_received',
+    'shipment_created': 'notify_on_shipment_created',
+    'shipment_shipped': 'notify_on_shipment_shipped',
+    'shipment_delivered': 'notify_on_shipment_delivered',
+}
+
+CHANNEL_FLAGS = {
+    'email': 'email_notifications_enabled',
+    'sms': 'sms_notifications_enabled',
+    'whatsapp': 'whatsapp_notifications_enabled',
+}
+
+
+def _recipient(user, channel):
+    return user.email if channel == 'email' else user.phone
+
+
+def enqueue_notifications(event, items):
+    """
+    Ajoute une notification par canal actif pour chaque (utilisateur, contexte).
+    Une seule requête INSERT quel que soit le nombre de notifications.
+    Retourne les notifications créées (aucune pour un événement regroupé).
+    """
+    config = get_config_snapshot()
+    flag = EVENT_FLAGS.get(event)
+    if flag and not getattr(config, flag):
+        return []
+
+    channels = [channel for channel, flag in CHANNEL_FLAGS.items() if getattr(config, flag)]
+    entries = [
+        (user.pk, channel, _recipient(user, channel), context)
+        for user, context in items
+        for channel in channels
+        if _recipient(user, channel)
+    ]
+    # Événements regroupés : envoyés plus tard en un seul message par utilisateur/canal
+    if is_digest_event(event):
+        add_to_digests(event, entries)
+        return []
+
+    return NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(event=event, channel=channel, user_id=user_id, recipient=recipient, context=context)
+        for user_id, channel, recipient, context in entries
+    ])
+
+
+def enqueue_notification(event, user, context):
+    return enqueue_notifications(event, [(user, context)])
+
+
+def package_context(package):
+    return {
+        'user_name': package.user.get_full_name(),
+        'package_number': package.tracking_number,
+        'tracking_number': package.tracking_number,
+        'weight': package.weight,
+    }
+
+
+def shipment_context(shipment):
+    return {
+        'user_name': shipment.user.get_full_name(),
+        'shipment_number': shipment.shipment_number,
+        'tracking_number': shipment.tracking_number_haiti,
+        'total_cost': shipment.total_cost,
+        'delivery_address': shipment.delivery_address,
+        'delivery_date': shipment.delivered_at.strftime('%d/%m/%Y') if shipment.delivered_at else '',
+    }
+
+
+def payment_context(payment, user):
+    return {
+        'user_name': user.get_full_name(),
+        'amount': payment.amount,
+        'payment_method': payment.get_payment_method_display(),
+    }
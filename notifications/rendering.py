@@ -0,0 +1,153 @@
+"""
+Compilation et rendu des templates de notification.
+
+Chaque texte ({user_name}, {package_number}...) est analysé une seule fois
+en une fonction de rendu ; le résultat est mis en cache par
+(name, updated_at), donc une modification dans l'admin invalide
+automatiquement l'ancienne version. Les templates actifs sont lus depuis
+un instantané versionné, invalidé à chaque sauvegarde dans l'admin.
+
+Seules les variables simples sont acceptées ({weight}, {weight:.2f}) : les
+conversions ({weight!r}) sont refusées à la validation plutôt qu'ignorées
+au rendu.
+"""
+from collections import namedtuple
+from string import Formatter
+
+from configuration.models import NotificationTemplate
+from core.snapshots import VersionedSnapshot
+
+TEMPLATE_FIELDS = ('email_subject', 'email_body', 'sms_body')
+
+CompiledTemplate = namedtuple('CompiledTemplate', ['updated_at', 'email_subject', 'email_body', 'sms_body'])
+RenderedMessage = namedtuple('RenderedMessage', ['user_id', 'recipient', 'subject', 'body', 'context'])
+TEMPLATES_VERSION_KEY = 'notification_templates:version'
+
+_formatter = Formatter()
+# name -> CompiledTemplate ; name est unique et updated_at (auto_now) change à
+# chaque save(). Un QuerySet.update() qui ne touche pas updated_at n'est pas
+# vu : le texte compilé reste l'ancien jusqu'à la prochaine sauvegarde.
+_compiled = {}
+
+
+class TemplateSyntaxError(ValueError):
+    pass
+
+
+def parse_template(text):
+    """Découpe le texte en (littéral, variable, format) ; lève TemplateSyntaxError si invalide"""
+    try:
+        parsed = list(_formatter.parse(text))
+    except ValueError as e:
+        raise TemplateSyntaxError(str(e)) from e
+    for _, field_name, _, conversion in parsed:
+        if conversion:
+            raise TemplateSyntaxError(f"conversion non prise en charge : {{{field_name}!{conversion}}}")
+    return [(literal, field_name, format_spec or '') for literal, field_name, format_spec, _ in parsed]
+
+
+def template_variables(text):
+    return {field_name for _, field_name, _ in parse_template(text) if field_name is not None}
+
+
+def validate_template(text, allowed):
+    """Retourne la liste triée des variables utilisées mais non déclarées"""
+    return sorted(template_variables(text) - set(allowed))
+
+
+def compile_template(text):
+    """
+    Compile le texte en fonction render(context) -> str. Une variable absente
+    du contexte est laissée telle quelle ({variable}).
+    """
+    parts = []
+    for literal, field_name, format_spec in parse_template(text):
+        if literal:
+            parts.append((literal, None, None))
+        if field_name is not None:
+            placeholder = '{' + field_name + (':' + format_spec if format_spec else '') + '}'
+            parts.append((placeholder, field_name, format_spec))
+
+    def render(context):
+        chunks = []
+        for text, field_name, format_spec in parts:
+            if field_name is None or field_name not in context:
+                chunks.append(text)
+            else:
+                chunks.append(format(context[field_name], format_spec))
+        return ''.join(chunks)
+
+    return render
+
+
+def get_compiled_template(template):
+    """Version compilée du template, recompilée seulement si updated_at a changé"""
+    compiled = _compiled.get(template.name)
+    if compiled is None or compiled.updated_at != template.updated_at:
+        compiled = CompiledTemplate(
+            template.updated_at,
+            *(compile_template(getattr(template, field)) for field in TEMPLATE_FIELDS)
+        )
+        _compiled[template.name] = compiled
+    return compiled
+
+
+def _load_templates():
+    return {template.name: template for template in NotificationTemplate.objects.filter(is_active=True)}
+
+
+templates_snapshot = VersionedSnapshot(TEMPLATES_VERSION_KEY, _load_templates, name='notification_templates')
+
+
+def get_active_templates():
+    """Templates actifs par nom, sans requête tant qu'aucun template n'est modifié"""
+    return templates_snapshot.get()
+
+
+def render_message(template, channel, context):
+    """Retourne (sujet, corps) du message pour le canal"""
+    compiled = get_compiled_template(template)
+    if channel == 'email':
+        return compiled.email_subject(context), compiled.email_body(context)
+    return None, compiled.sms_body(context)
+
+
+# Colonnes lues en une seule requête (jointure sur l'utilisateur)
+PACKAGE_MESSAGE_COLUMNS = (
+    'tracking_number', 'weight',
+    'user_id', 'user__first_name', 'user__last_name', 'user__email', 'user__phone',
+)
+
+
+def package_row_context(row):
+    return {
+        'user_name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+        'package_number': row['tracking_number'],
+        'tracking_number': row['tracking_number'],
+        'weight': row['weight'],
+    }
+
+
+def render_package_messages(packages, channel, event='package_received'):
+    """
+    Rend le message `event` pour chaque colis du queryset, en une requête
+    pour les colis et leurs destinataires. Retourne une liste de RenderedMessage.
+    """
+    template = get_active_templates().get(event)
+    if template is None:
+        return []
+
+    compiled = get_compiled_template(template)
+    recipient_column = 'user__email' if channel == 'email' else 'user__phone'
+    messages = []
+    for row in packages.values(*PACKAGE_MESSAGE_COLUMNS).iterator(chunk_size=2000):
+        recipient = row[recipient_column]
+        if not recipient:
+            continue
+        context = package_row_context(row)
+        if channel == 'email':
+            subject, body = compiled.email_subject(context), compiled.email_body(context)
+        else:
+            subject, body = None, compiled.sms_body(context)
+        messages.append(RenderedMessage(row['user_id'], recipient, subject, body, context))
+    return messages
@@ -0,0 +1,373 @@
+import asyncio
+import json
+import socketserver
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from packages.models import Package
+from configuration.models import AppConfiguration, NotificationTemplate
+from .digest import flush_due_digests, merge_contexts
+from .dispatch import backoff
+from .models import NotificationDigest, NotificationOutbox
+from .outbox import enqueue_notification
+from .rendering import (
+    TemplateSyntaxError, compile_template, get_active_templates, render_message, render_package_messages,
+    validate_template,
+)
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal : accepte tout et garde les messages reçus"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply('220 sink')
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                self.server.messages.append(b''.join(data).decode())
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            else:
+                self.reply('250 OK')
+
+
+class ProviderStubHandler(BaseHTTPRequestHandler):
+    """Fournisseur SMS/WhatsApp local : répond server.status et garde les appels"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.calls.append((self.headers.get('Authorization'), json.loads(body)))
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def close_worker_connections():
+    # La commande lance asyncio.run : ses requêtes passent par le thread de sync_to_async
+    asyncio.run(sync_to_async(connections.close_all)())
+
+
+class OutboxDispatchTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(close_worker_connections)
+        self.smtp = start_server(socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPSinkHandler))
+        self.smtp.messages = []
+        self.provider = start_server(ThreadingHTTPServer(('127.0.0.1', 0), ProviderStubHandler))
+        self.provider.calls = []
+        self.provider.status = 200
+        for server in (self.smtp, self.provider):
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+
+        AppConfiguration.objects.create(
+            is_active=True, smtp_host='127.0.0.1', smtp_port=self.smtp.server_address[1], smtp_use_tls=False,
+            email_notifications_enabled=True, whatsapp_notifications_enabled=True, sms_notifications_enabled=False,
+        )
+        NotificationTemplate.objects.create(
+            name='shipment_created', email_subject='Expédition {shipment_number}',
+            email_body='Bonjour {user_name}', sms_body='Expédition {shipment_number} créée',
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com', username='client', password='secret',
+            first_name='Marie', last_name='Joseph', phone='50937000000',
+        )
+        providers = {
+            'sms': {'url': '', 'token': ''},
+            'whatsapp': {'url': f"http://127.0.0.1:{self.provider.server_address[1]}/send", 'token': 'wa-token'},
+        }
+        settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            NOTIFICATION_PROVIDERS=providers,
+            NOTIFICATION_MAX_ATTEMPTS=3,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def enqueue(self):
+        return enqueue_notification('shipment_created', self.user, {'user_name': 'Marie Joseph', 'shipment_number': 'EXP-1'})
+
+    def drain(self):
+        call_command('send_notifications', stdout=StringIO())
+
+    def test_drain_sends_each_channel(self):
+        self.enqueue()
+        self.drain()
+
+        self.assertEqual(set(NotificationOutbox.objects.values_list('status', flat=True)), {'sent'})
+        self.assertEqual(len(self.smtp.messages), 1)
+        self.assertIn('Subject: =?utf-8?q?Exp=C3=A9dition_EXP-1?=', self.smtp.messages[0])
+        self.assertIn('To: client@example.com', self.smtp.messages[0])
+        self.assertEqual(self.provider.calls, [
+            ('Bearer wa-token', {'to': '50937000000', 'message': 'Expédition EXP-1 créée'}),
+        ])
+
+    def test_failed_call_is_retried_with_backoff(self):
+        self.enqueue()
+        self.provider.status = 500
+        before = timezone.now()
+        self.drain()
+
+        row = NotificationOutbox.objects.get(channel='whatsapp')
+        self.assertEqual(row.status, 'pending')
+        self.assertEqual(row.attempts, 1)
+        self.assertIn('500', row.last_error)
+        self.assertGreaterEqual(row.next_attempt_at, before + backoff(1))
+        self.assertEqual(NotificationOutbox.objects.get(channel='email').status, 'sent')
+
+        # Pas de nouvel envoi avant l'échéance, puis succès au nouvel essai
+        self.provider.status = 200
+        self.drain()
+        self.assertEqual(len(self.provider.calls), 1)
+
+        NotificationOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        self.drain()
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'sent')
+        self.assertEqual(len(self.provider.calls), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.enqueue()
+        self.provider.status = 503
+        for _ in range(3):
+            NotificationOutbox.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+            self.drain()
+
+        row = NotificationOutbox.objects.get(channel='whatsapp')
+        self.assertEqual(row.status, 'failed')
+        self.assertEqual(row.attempts, 3)
+        self.assertEqual(len(self.provider.calls), 3)
+
+    def test_unreachable_smtp_server_reschedules_emails(self):
+        AppConfiguration.objects.update(smtp_port=1)
+        cache.clear()
+        self.enqueue()
+        self.drain()
+
+        row = NotificationOutbox.objects.get(channel='email')
+        self.assertEqual(row.status, 'pending')
+        self.assertTrue(row.last_error.startswith('Connexion SMTP impossible'))
+        self.assertEqual(self.smtp.messages, [])
+
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertEqual(backoff(1), timedelta(seconds=30))
+        self.assertEqual(backoff(3), timedelta(seconds=120))
+        self.assertEqual(backoff(20), timedelta(hours=6))
+
+
+class ActiveTemplatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template = NotificationTemplate.objects.create(
+                name='shipment_created', email_subject='Expédition {shipment_number}',
+                email_body='Bonjour {user_name}', sms_body='Expédition {shipment_number} créée',
+            )
+
+    def test_templates_are_loaded_once(self):
+        get_active_templates()
+        with self.assertNumQueries(0):
+            templates = get_active_templates()
+        self.assertEqual(set(templates), {'shipment_created'})
+
+    def test_admin_edit_is_picked_up(self):
+        get_active_templates()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template.sms_body = 'Votre expédition {shipment_number} est créée'
+            self.template.save()
+
+        template = get_active_templates()['shipment_created']
+        self.assertEqual(
+            render_message(template, 'sms', {'shipment_number': 'EXP-1'}),
+            (None, 'Votre expédition EXP-1 est créée'),
+        )
+
+    def test_deactivated_template_is_dropped(self):
+        get_active_templates()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template.is_active = False
+            self.template.save()
+
+        self.assertEqual(get_active_templates(), {})
+
+
+class TemplateRenderingTests(TestCase):
+    def test_compile_template_renders_context(self):
+        render = compile_template('Colis {package_number} : {weight:.1f} lbs')
+        self.assertEqual(render({'package_number': 'BP1', 'weight': Decimal('2.25')}), 'Colis BP1 : 2.2 lbs')
+        self.assertEqual(render({}), 'Colis {package_number} : {weight:.1f} lbs')
+        self.assertEqual(compile_template('{{littéral}} {user_name}')({'user_name': 'Marie'}), '{littéral} Marie')
+
+    def test_unknown_variables_are_reported(self):
+        self.assertEqual(validate_template('{user_name} {montant} {amount}', ('user_name', 'amount')), ['montant'])
+        self.assertEqual(validate_template('Bonjour', ('user_name',)), [])
+
+    def test_invalid_syntax_and_conversions_are_rejected(self):
+        for text in ('Bonjour {user_name', '{user_name!r}', '{weight!s:>5}'):
+            with self.assertRaises(TemplateSyntaxError, msg=text):
+                validate_template(text, ('user_name', 'weight'))
+
+    def test_clean_rejects_undeclared_variables(self):
+        template = NotificationTemplate(
+            name='payment_received', email_subject='Paiement {amount}',
+            email_body='Bonjour {user_name}, colis {package_number}', sms_body='{amount!r}',
+        )
+        with self.assertRaises(ValidationError) as raised:
+            template.clean()
+        errors = raised.exception.message_dict
+        self.assertEqual(set(errors), {'email_body', 'sms_body'})
+        self.assertIn('{package_number}', errors['email_body'][0])
+        self.assertTrue(errors['sms_body'][0].startswith('Template invalide'))
+
+        template.email_body, template.sms_body = 'Bonjour {user_name}', 'Paiement {amount} reçu'
+        template.clean()
+
+
+class PackageMessagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationTemplate.objects.create(
+                name='package_received', email_subject='Colis {package_number}',
+                email_body='Bonjour {user_name}, {weight} lbs', sms_body='Colis {tracking_number} reçu',
+            )
+
+    def create_packages(self, count, start=0):
+        for n in range(start, start + count):
+            user = User.objects.create_user(
+                email=f"client{n}@example.com", username=f"client{n}", password='secret',
+                first_name='Client', last_name=str(n), phone=f"509370000{n:02d}" if n % 2 else '',
+            )
+            Package.objects.create(
+                user=user, tracking_number=f"BP{n:04d}", description='Colis', weight=Decimal('2.50'),
+                length=10, width=10, height=10, value=50,
+            )
+
+    def test_query_count_does_not_grow_with_packages(self):
+        get_active_templates()
+        self.create_packages(2)
+        with self.assertNumQueries(1):
+            render_package_messages(Package.objects.all(), 'email')
+
+        self.create_packages(10, start=2)
+        with self.assertNumQueries(1):
+            messages = render_package_messages(Package.objects.all(), 'email')
+        self.assertEqual(len(messages), 12)
+
+    def test_messages_per_channel(self):
+        self.create_packages(2)
+        messages = {m.recipient: m for m in render_package_messages(Package.objects.order_by('tracking_number'), 'email')}
+        self.assertEqual(messages['client0@example.com'].subject, 'Colis BP0000')
+        self.assertEqual(messages['client1@example.com'].body, 'Bonjour Client 1, 2.50 lbs')
+
+        # Sans téléphone, pas de SMS
+        sms = render_package_messages(Package.objects.all(), 'sms')
+        self.assertEqual([(m.recipient, m.subject, m.body) for m in sms], [('50937000001', None, 'Colis BP0001 reçu')])
+
+    def test_inactive_event_renders_nothing(self):
+        self.create_packages(1)
+        self.assertEqual(render_package_messages(Package.objects.all(), 'email', event='shipment_created'), [])
+
+
+@override_settings(NOTIFICATION_DIGEST_WINDOW=600)
+class DigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        AppConfiguration.objects.create(
+            is_active=True, email_notifications_enabled=True, whatsapp_notifications_enabled=True,
+            sms_notifications_enabled=False,
+        )
+        self.marie = User.objects.create_user(
+            email='marie@example.com', username='marie', password='secret', first_name='Marie', phone='50937000000',
+        )
+        self.jean = User.objects.create_user(email='jean@example.com', username='jean', password='secret')
+
+    def receive(self, user, tracking_number, weight='2.50'):
+        enqueue_notification('package_received', user, {
+            'user_name': user.get_full_name(), 'package_number': tracking_number,
+            'tracking_number': tracking_number, 'weight': Decimal(weight),
+        })
+
+    def test_merge_contexts(self):
+        one = {'user_name': 'Marie', 'tracking_number': 'BP1', 'weight': '2.50'}
+        self.assertEqual(merge_contexts([one, one]), {**one, 'package_count': 1})
+        self.assertEqual(
+            merge_contexts([one, {'user_name': 'Marie', 'tracking_number': 'BP2', 'weight': '1.25'}]),
+            {'user_name': 'Marie', 'tracking_number': 'BP1, BP2', 'weight': Decimal('3.75'), 'package_count': 2},
+        )
+        # Une valeur non numérique n'est pas additionnée
+        merged = merge_contexts([{'weight': '2.50'}, {'weight': 'n/d'}])
+        self.assertEqual(merged['weight'], '2.50, n/d')
+
+    def test_repeated_enqueues_share_one_digest(self):
+        self.receive(self.marie, 'BP1')
+        send_after = NotificationDigest.objects.get(user=self.marie, channel='email').send_after
+        self.receive(self.marie, 'BP2')
+        self.receive(self.marie, 'BP3')
+        self.receive(self.jean, 'BP4')
+
+        self.assertEqual(NotificationOutbox.objects.count(), 0)
+        digests = {(d.user_id, d.channel): d for d in NotificationDigest.objects.all()}
+        self.assertEqual(set(digests), {
+            (self.marie.pk, 'email'), (self.marie.pk, 'whatsapp'), (self.jean.pk, 'email'),
+        })
+        marie = digests[(self.marie.pk, 'email')]
+        self.assertEqual([item['tracking_number'] for item in marie.items], ['BP1', 'BP2', 'BP3'])
+        # La fenêtre part du premier événement
+        self.assertEqual(marie.send_after, send_after)
+
+    def test_flush_sends_one_message_per_recipient_and_window(self):
+        for tracking_number in ('BP1', 'BP2', 'BP3'):
+            self.receive(self.marie, tracking_number)
+        self.receive(self.jean, 'BP4')
+        self.assertEqual(flush_due_digests(), 0)
+
+        NotificationDigest.objects.update(send_after=timezone.now())
+        self.assertEqual(flush_due_digests(), 3)
+
+        self.assertFalse(NotificationDigest.objects.exists())
+        outbox = {(row.user_id, row.channel): row for row in NotificationOutbox.objects.all()}
+        self.assertEqual(len(outbox), 3)
+        marie = outbox[(self.marie.pk, 'whatsapp')]
+        self.assertEqual(marie.recipient, '50937000000')
+        self.assertEqual(marie.context['package_count'], 3)
+        self.assertEqual(marie.context['tracking_number'], 'BP1, BP2, BP3')
+        self.assertEqual(outbox[(self.jean.pk, 'email')].context['package_count'], 1)
+
+        # Un nouvel événement ouvre une nouvelle fenêtre
+        self.receive(self.marie, 'BP5')
+        self.assertEqual(NotificationDigest.objects.filter(user=self.marie).count(), 2)
+        self.assertEqual(flush_due_digests(), 0)
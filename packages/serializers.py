@@ -1,6 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Package, PackageConsolidation
 from accounts.serializers import UserSerializer
+from notifications.outbox import enqueue_notification, package_context
+from reports.rollups import mark_packages_dirty
 
 class PackageSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -59,13 +62,15 @@ class PackageRegistrationSerializer(serializers.ModelSerializer):
         agent_in = self.context['request'].user
         
         # Créer le colis avec statut "received" (reçu à l'entrepôt)
-        package = Package.objects.create(
-            user=client,
-            agent_in=agent_in,
-            status='received',
-            received_at=timezone.now(),
-            **validated_data
-        )
+        with transaction.atomic():
+            package = Package.objects.create(
+                user=client,
+                agent_in=agent_in,
+                status='received',
+                received_at=timezone.now(),
+                **validated_data
+            )
+            enqueue_notification('package_received', client, package_context(package))
         
         return package
 
@@ -144,5 +149,6 @@ class PackageConsolidationCreateSerializer(serializers.ModelSerializer):
         consolidation.calculate_totals()
         
         packages.update(status='waiting')
+        mark_packages_dirty(package_ids)
         
         return consolidation
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.urls import path
+from core.async_api import deployment_view
 from . import views
 
 app_name = 'packages'
@@ -7,6 +8,7 @@ urlpatterns = [
     # Gestion des colis
     path('', views.PackageListCreateView.as_view(), name='package_list_create'),
     path('<uuid:pk>/', views.PackageDetailView.as_view(), name='package_detail'),
+    path('track/<str:tracking_number>/', deployment_view(views.track_package, views.atrack_package), name='package_tracking'),
     
     # Agent In - Enregistrement de colis
     path('register/', views.PackageRegistrationView.as_view(), name='package_registration'),
@@ -1,7 +1,13 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from core.async_api import json_response
+from notifications.outbox import enqueue_notification, package_context
+from reports.rollups import mark_packages_dirty
+from shipments.models import Shipment
 from .models import Package, PackageConsolidation
 from .serializers import (
     PackageSerializer,
@@ -13,6 +19,48 @@ from .serializers import (
     PackageConsolidationCreateSerializer
 )
 
+TRACKING_FIELDS = ('id', 'tracking_number', 'status', 'shipping_mode', 'announced_at', 'received_at')
+TRACKING_SHIPMENT_FIELDS = ('shipment_number', 'status', 'tracking_number_haiti', 'shipped_at', 'delivered_at')
+
+
+def tracking_payload(package, shipments):
+    package.pop('id')
+    package['status_display'] = dict(Package.STATUS_CHOICES).get(package['status'], package['status'])
+    package['shipments'] = shipments
+    return package
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def track_package(request, tracking_number):
+    """
+    Suivi public d'un colis par numéro de suivi (sans authentification).
+    Aucune donnée personnelle : statut, dates et expéditions uniquement.
+    """
+    package = Package.objects.filter(tracking_number=tracking_number.strip()).values(*TRACKING_FIELDS).first()
+    if package is None:
+        return Response({'detail': 'Colis introuvable.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    shipments = list(
+        Shipment.objects.filter(packages=package['id']).order_by('-created_at').values(*TRACKING_SHIPMENT_FIELDS)
+    )
+    return Response(tracking_payload(package, shipments))
+
+
+@require_safe
+async def atrack_package(request, tracking_number):
+    """track_package pour un déploiement ASGI (vue async)"""
+    package = await Package.objects.filter(tracking_number=tracking_number.strip()).values(*TRACKING_FIELDS).afirst()
+    if package is None:
+        return json_response({'detail': 'Colis introuvable.'}, status=404)
+    
+    shipments = [
+        shipment async for shipment in
+        Shipment.objects.filter(packages=package['id']).order_by('-created_at').values(*TRACKING_SHIPMENT_FIELDS)
+    ]
+    return json_response(tracking_payload(package, shipments))
+
+
 class PackageListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -58,6 +106,7 @@ class PackageConsolidationDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def perform_destroy(self, instance):
         instance.packages.update(status='received')
+        mark_packages_dirty(instance.packages.values('pk'))
         instance.is_active = False
         instance.save()
 
@@ -121,6 +170,7 @@ def remove_package_from_consolidation(request, consolidation_id, package_id):
         
         if consolidation.packages.count() < 2:
             consolidation.packages.update(status='received')
+            mark_packages_dirty(consolidation.packages.values('pk'))
             consolidation.is_active = False
             consolidation.save()
             return Response({
@@ -198,7 +248,9 @@ def process_announced_package(request, package_id):
             if field != 'client_email':  # Ignore client_email car déjà défini
                 setattr(package, field, value)
         
-        package.save()
+        with transaction.atomic():
+            package.save()
+            enqueue_notification('package_received', package.user, package_context(package))
         
         return Response({
             'message': 'Colis traité avec succès',
@@ -283,7 +335,10 @@ def update_package_status(request, package_id):
         else:
             package.notes = f"[{timezone.now().strftime('%Y-%m-%d %H:%M')} - {request.user.get_full_name()}]: {notes}"
     
-    package.save()
+    with transaction.atomic():
+        package.save()
+        if new_status == 'received' and old_status != 'received':
+            enqueue_notification('package_received', package.user, package_context(package))
     
     return Response({
         'message': f'Statut du colis mis à jour de "{old_status}" vers "{new_status}"',
@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.rollups import first_source_day, refresh_days, refresh_dirty_days
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats journaliers des jours modifiés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recent-days', type=int, default=0,
+                            help="Recalculer aussi les N derniers jours (filet de sécurité pour les UPDATE en masse)")
+        parser.add_argument('--all', action='store_true', help="Reconstruire tout l'historique")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        today = timezone.localdate()
+        days = []
+
+        if options['all']:
+            first_day = first_source_day()
+            if first_day:
+                days = [first_day + timedelta(days=i) for i in range((today - first_day).days + 1)]
+        elif options['recent_days']:
+            days = [today - timedelta(days=i) for i in range(options['recent_days'])]
+
+        # Par tranches de 31 jours pour borner la taille des transactions
+        for start in range(0, len(days), 31):
+            refresh_days(days[start:start + 31])
+        days = set(days) | set(refresh_dirty_days())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(days)} jour(s) recalculé(s) en {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyPackageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shipping_mode', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('destination', models.CharField(blank=True, max_length=200)),
+                ('package_count', models.PositiveIntegerField(default=0)),
+                ('total_weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier des colis',
+                'verbose_name_plural': 'Agrégats journaliers des colis',
+                'constraints': [models.UniqueConstraint(fields=('day', 'shipping_mode', 'status', 'destination'), name='unique_package_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyShipmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shipping_type', models.CharField(max_length=10)),
+                ('status', models.CharField(max_length=20)),
+                ('shipment_count', models.PositiveIntegerField(default=0)),
+                ('total_weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('billed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier des expéditions',
+                'verbose_name_plural': 'Agrégats journaliers des expéditions',
+                'constraints': [models.UniqueConstraint(fields=('day', 'shipping_type', 'status'), name='unique_shipment_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rollupdirtyday',
+            name='day',
+            field=models.DateField(db_index=True),
+        ),
+    ]
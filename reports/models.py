@@ -0,0 +1,61 @@
+from django.db import models
+
+
+class DailyShipmentRollup(models.Model):
+    """Agrégat journalier des expéditions par type d'expédition et statut"""
+    day = models.DateField()
+    shipping_type = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    shipment_count = models.PositiveIntegerField(default=0)
+    total_weight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    billed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = "Agrégat journalier des expéditions"
+        verbose_name_plural = "Agrégats journaliers des expéditions"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'shipping_type', 'status'],
+                name='unique_shipment_rollup_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} - {self.shipping_type} - {self.status}"
+
+
+class DailyPackageRollup(models.Model):
+    """Agrégat journalier des colis par mode d'expédition, statut et destination"""
+    day = models.DateField()
+    shipping_mode = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    destination = models.CharField(max_length=200, blank=True)
+    package_count = models.PositiveIntegerField(default=0)
+    total_weight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = "Agrégat journalier des colis"
+        verbose_name_plural = "Agrégats journaliers des colis"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'shipping_mode', 'status', 'destination'],
+                name='unique_package_rollup_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} - {self.shipping_mode} - {self.status} - {self.destination}"
+
+
+class RollupDirtyDay(models.Model):
+    """
+    Jour dont les agrégats doivent être recalculés : une ligne par écriture,
+    supprimée seulement par le recalcul qui l'a lue
+    """
+    day = models.DateField(db_index=True)
+    marked_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.day}"
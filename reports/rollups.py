@@ -0,0 +1,213 @@
+"""
+Maintenance incrémentale des agrégats journaliers et lecture des rapports.
+
+Chaque écriture sur Shipment, Payment ou Package marque son jour comme
+« sale » (RollupDirtyDay) dans la même transaction ; la commande
+refresh_report_rollups recalcule uniquement ces jours. Une marque n'est
+supprimée que par le recalcul qui l'a lue : une écriture validée pendant un
+recalcul laisse sa marque pour le suivant. Les rapports ne lisent que les
+tables d'agrégats.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from packages.models import Package
+from shipments.models import Payment, Shipment
+from .models import DailyPackageRollup, DailyShipmentRollup, RollupDirtyDay
+
+PERIODS = ('week', 'month', 'quarter', 'year')
+
+
+def local_day(value):
+    return timezone.localdate(value) if value else None
+
+
+def mark_days_dirty(days):
+    days = {day for day in days if day is not None}
+    if days:
+        # Insertion sans conflit possible : aucune attente sur un recalcul en cours
+        RollupDirtyDay.objects.bulk_create([RollupDirtyDay(day=day) for day in days])
+
+
+def mark_shipments_dirty(shipment_ids):
+    """Marque les jours des expéditions modifiées par un UPDATE en masse"""
+    mark_days_dirty(
+        Shipment.objects.filter(pk__in=shipment_ids)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values_list('day', flat=True)
+        .distinct()
+    )
+
+
+def mark_packages_dirty(package_ids):
+    """Marque les jours des colis modifiés par un UPDATE en masse"""
+    days = set()
+    rows = Package.objects.filter(pk__in=package_ids).values_list('received_at', 'announced_at')
+    for received_at, announced_at in rows:
+        days.update((local_day(received_at), local_day(announced_at)))
+    mark_days_dirty(days)
+
+
+def _day_bounds(days):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(min(days), time.min), tz)
+    end = timezone.make_aware(datetime.combine(max(days) + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _shipment_rollups(days, start, end):
+    collected = {
+        (row['day'], row['shipment__shipping_type'], row['shipment__status']): row['total']
+        for row in Payment.objects.filter(
+            status='completed',
+            shipment__created_at__gte=start,
+            shipment__created_at__lt=end,
+        )
+        .annotate(day=TruncDate('shipment__created_at'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'shipment__shipping_type', 'shipment__status')
+        .annotate(total=Sum('amount'))
+    }
+    rows = (
+        Shipment.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate('created_at'))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'shipping_type', 'status')
+        .annotate(
+            shipment_count=Count('id'),
+            total_weight=Sum('total_weight'),
+            billed_amount=Sum('total_cost'),
+        )
+    )
+    return [
+        DailyShipmentRollup(
+            collected_amount=collected.get((row['day'], row['shipping_type'], row['status']), 0),
+            **row
+        )
+        for row in rows
+    ]
+
+
+def _package_rollups(days, start, end):
+    rows = (
+        Package.objects.filter(
+            Q(received_at__gte=start, received_at__lt=end) |
+            Q(received_at__isnull=True, announced_at__gte=start, announced_at__lt=end)
+        )
+        .annotate(day=TruncDate(Coalesce('received_at', 'announced_at')))
+        .filter(day__in=days)
+        .order_by()
+        .values('day', 'shipping_mode', 'status', 'destination')
+        .annotate(
+            package_count=Count('id'),
+            total_weight=Sum('weight'),
+            total_value=Sum('value'),
+        )
+    )
+    return [DailyPackageRollup(**row) for row in rows]
+
+
+def first_source_day():
+    """Premier jour présent dans les tables sources des agrégats (None si elles sont vides)"""
+    firsts = [
+        *Shipment.objects.aggregate(Min('created_at')).values(),
+        *Package.objects.aggregate(Min('received_at'), Min('announced_at')).values(),
+    ]
+    days = [local_day(value) for value in firsts if value is not None]
+    return min(days) if days else None
+
+
+def refresh_days(days):
+    """Recalcule entièrement les agrégats des jours donnés"""
+    days = sorted(set(days))
+    if not days:
+        return
+    start, end = _day_bounds(days)
+
+    with transaction.atomic():
+        shipment_rollups = _shipment_rollups(days, start, end)
+        package_rollups = _package_rollups(days, start, end)
+        DailyShipmentRollup.objects.filter(day__in=days).delete()
+        DailyPackageRollup.objects.filter(day__in=days).delete()
+        DailyShipmentRollup.objects.bulk_create(shipment_rollups)
+        DailyPackageRollup.objects.bulk_create(package_rollups)
+
+
+def refresh_dirty_days():
+    """Recalcule les jours marqués comme modifiés et retourne la liste des jours traités"""
+    with transaction.atomic():
+        # Sans skip_locked : deux recalculs concurrents ne traitent pas le même jour en même temps
+        marks = list(RollupDirtyDay.objects.select_for_update().values_list('pk', 'day'))
+        days = sorted({day for _, day in marks})
+        refresh_days(days)
+        RollupDirtyDay.objects.filter(pk__in=[pk for pk, _ in marks]).delete()
+    return days
+
+
+def period_bounds(period, reference):
+    """Premier et dernier jour de la période contenant `reference`"""
+    if period == 'week':
+        start = reference - timedelta(days=reference.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'month':
+        start = reference.replace(day=1)
+    elif period == 'quarter':
+        start = reference.replace(month=3 * ((reference.month - 1) // 3) + 1, day=1)
+    else:
+        start = reference.replace(month=1, day=1)
+
+    months = {'month': 1, 'quarter': 3, 'year': 12}[period]
+    month_index = start.month - 1 + months
+    next_start = start.replace(year=start.year + month_index // 12, month=month_index % 12 + 1)
+    return start, next_start - timedelta(days=1)
+
+
+def _breakdown(queryset, field, **aggregates):
+    return {
+        str(row[field]): {key: row[key] for key in aggregates}
+        for row in queryset.values(field).order_by(field).annotate(**aggregates)
+    }
+
+
+def build_report(period, reference):
+    """Rapport de la période, calculé uniquement à partir des agrégats journaliers"""
+    start, end = period_bounds(period, reference)
+    shipments = DailyShipmentRollup.objects.filter(day__gte=start, day__lte=end)
+    packages = DailyPackageRollup.objects.filter(day__gte=start, day__lte=end)
+
+    shipment_aggregates = {
+        'count': Sum('shipment_count'),
+        'total_weight': Sum('total_weight'),
+        'billed_amount': Sum('billed_amount'),
+        'collected_amount': Sum('collected_amount'),
+    }
+    package_aggregates = {
+        'count': Sum('package_count'),
+        'total_weight': Sum('total_weight'),
+        'total_value': Sum('total_value'),
+    }
+
+    return {
+        'period': period,
+        'start': start,
+        'end': end,
+        'shipments': {
+            **shipments.aggregate(**shipment_aggregates),
+            'by_shipping_type': _breakdown(shipments, 'shipping_type', **shipment_aggregates),
+            'by_status': _breakdown(shipments, 'status', **shipment_aggregates),
+            'by_day': _breakdown(shipments, 'day', **shipment_aggregates),
+        },
+        'packages': {
+            **packages.aggregate(**package_aggregates),
+            'by_shipping_mode': _breakdown(packages, 'shipping_mode', **package_aggregates),
+            'by_status': _breakdown(packages, 'status', **package_aggregates),
+            'by_destination': _breakdown(packages, 'destination', **package_aggregates),
+        },
+    }
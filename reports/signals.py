@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from packages.models import Package
+from shipments.models import Payment, Shipment
+from .rollups import local_day, mark_days_dirty
+
+
+@receiver([post_save, post_delete], sender=Shipment)
+def shipment_changed(sender, instance, **kwargs):
+    mark_days_dirty([local_day(instance.created_at)])
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    # Les encaissements sont rattachés au jour de création de l'expédition
+    created_at = Shipment.objects.filter(pk=instance.shipment_id).values_list('created_at', flat=True).first()
+    mark_days_dirty([local_day(created_at)])
+
+
+@receiver([post_save, post_delete], sender=Package)
+def package_changed(sender, instance, **kwargs):
+    # Un colis reçu quitte le jour de son annonce : les deux jours sont recalculés
+    mark_days_dirty([local_day(instance.received_at), local_day(instance.announced_at)])
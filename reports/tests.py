@@ -0,0 +1,82 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from packages.models import Package
+from shipments.models import Shipment
+from .models import DailyPackageRollup, DailyShipmentRollup, RollupDirtyDay
+from .rollups import mark_days_dirty, refresh_days, refresh_dirty_days
+
+
+class RollupRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        self.today = timezone.localdate()
+
+    def create_shipment(self):
+        return Shipment.objects.create(
+            user=self.user, shipping_type='air', total_weight=Decimal('2.00'), shipping_cost=Decimal('9.00'),
+            total_cost=Decimal('9.00'), delivery_address='Pétion-Ville', recipient_name='Marie',
+            recipient_phone='50937000000',
+        )
+
+    def test_write_marks_its_day_and_refresh_rebuilds_it(self):
+        self.create_shipment()
+        self.assertTrue(RollupDirtyDay.objects.filter(day=self.today).exists())
+
+        self.assertEqual(refresh_dirty_days(), [self.today])
+        rollup = DailyShipmentRollup.objects.get(day=self.today)
+        self.assertEqual(rollup.shipment_count, 1)
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+    def test_mark_made_during_refresh_survives(self):
+        mark_days_dirty([self.today])
+
+        def refresh_with_concurrent_write(days):
+            # Écriture validée pendant le recalcul, après la lecture des marques
+            mark_days_dirty(days)
+            refresh_days(days)
+
+        with mock.patch('reports.rollups.refresh_days', side_effect=refresh_with_concurrent_write):
+            refresh_dirty_days()
+
+        self.assertEqual(list(RollupDirtyDay.objects.values_list('day', flat=True)), [self.today])
+
+    def test_full_rebuild_starts_at_the_first_package(self):
+        package = Package.objects.create(
+            user=self.user, description='Colis', weight=2, length=10, width=10, height=10, value=50,
+        )
+        received = timezone.now() - timedelta(days=10)
+        Package.objects.filter(pk=package.pk).update(received_at=received, status='received')
+        RollupDirtyDay.objects.all().delete()
+
+        # Aucune expédition : la reconstruction part quand même du premier colis
+        call_command('refresh_report_rollups', '--all', stdout=StringIO())
+        rollup = DailyPackageRollup.objects.get()
+        self.assertEqual(rollup.day, timezone.localdate(received))
+        self.assertEqual(rollup.package_count, 1)
+
+        # Une expédition plus récente ne déplace pas le début
+        self.create_shipment()
+        DailyPackageRollup.objects.all().delete()
+        call_command('refresh_report_rollups', '--all', stdout=StringIO())
+        self.assertTrue(DailyPackageRollup.objects.filter(day=timezone.localdate(received)).exists())
+
+    def test_report_defaults_to_local_day(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret', is_staff=True
+        )
+        self.client.force_login(admin)
+        # 2 h UTC le 1er juillet : encore le 30 juin à Port-au-Prince
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2026, 7, 1, 2, 0, tzinfo=dt_timezone.utc)):
+            response = self.client.get(reverse('reports:report_summary'), {'period': 'month'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['start'], str(date(2026, 6, 1)))
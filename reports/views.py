@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from configuration.snapshot import get_config_snapshot
+from .rollups import PERIODS, build_report
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def report_summary(request):
+    """
+    Rapport de revenus et de volumes pour une semaine, un mois, un trimestre ou une année.
+    Servi depuis les agrégats journaliers (voir refresh_report_rollups).
+    """
+    period = request.GET.get('period') or get_config_snapshot().default_report_period
+    if period not in PERIODS:
+        return Response(
+            {'error': f'Période invalide. Périodes valides: {list(PERIODS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        reference = date.fromisoformat(request.GET['date']) if 'date' in request.GET else timezone.localdate()
+    except ValueError:
+        return Response(
+            {'error': 'Date invalide (format AAAA-MM-JJ)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(build_report(period, reference))
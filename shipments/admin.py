@@ -1,3 +1,109 @@
-from django.contrib import admin
+import csv
+import io
+import zipfile
+from datetime import date, timedelta
 
-# Register your models here.
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import Payment, RepricingRun, ShipmentCostAudit
+from .reconciliation import REPORT_HEADERS, ReconciliationError, reconcile_statement
+
+
+class ReconciliationForm(forms.Form):
+    statement = forms.FileField(label="Relevé CSV")
+    since = forms.DateField(label="Début de la période", initial=lambda: date.today() - timedelta(days=30))
+    until = forms.DateField(label="Fin de la période", initial=date.today)
+    transaction_column = forms.CharField(label="Colonne transaction", initial='transaction_id')
+    amount_column = forms.CharField(label="Colonne montant", initial='amount')
+    dry_run = forms.BooleanField(label="Simulation (sans mise à jour)", required=False)
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'shipment', 'payment_method', 'amount', 'status', 'transaction_id', 'created_at')
+    list_filter = ('status', 'payment_method')
+    search_fields = ('transaction_id', 'payment_reference', 'shipment__shipment_number')
+    list_select_related = ('shipment', 'shipment__user')
+    change_list_template = 'admin/shipments/payment/change_list.html'
+    
+    def get_urls(self):
+        return [
+            path(
+                'reconcile/',
+                self.admin_site.admin_view(self.reconcile_view),
+                name='shipments_payment_reconcile'
+            ),
+        ] + super().get_urls()
+    
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'can_reconcile': self.has_change_permission(request), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+    
+    def reconcile_view(self, request):
+        """Upload d'un relevé : retourne une archive ZIP avec les rapports"""
+        # Le rapprochement modifie les statuts des paiements
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ReconciliationForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            data = form.cleaned_data
+            buffers = {name: io.StringIO() for name in REPORT_HEADERS}
+            statement = io.TextIOWrapper(data['statement'].file, encoding='utf-8-sig', newline='')
+            try:
+                counts = reconcile_statement(
+                    statement, data['since'], data['until'],
+                    reports={name: csv.writer(buffer) for name, buffer in buffers.items()},
+                    transaction_column=data['transaction_column'],
+                    amount_column=data['amount_column'],
+                    dry_run=data['dry_run'],
+                )
+            except ReconciliationError as e:
+                messages.error(request, str(e))
+            else:
+                archive = io.BytesIO()
+                with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for name, buffer in buffers.items():
+                        zf.writestr(f'{name}.csv', buffer.getvalue())
+                    zf.writestr('summary.txt', '\n'.join(f'{k}: {v}' for k, v in counts.items()))
+                response = HttpResponse(archive.getvalue(), content_type='application/zip')
+                response['Content-Disposition'] = (
+                    f'attachment; filename="rapprochement_{data["since"]}_{data["until"]}.zip"'
+                )
+                return response
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Rapprochement des paiements',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/shipments/payment/reconcile.html', context)
+
+
+@admin.register(RepricingRun)
+class RepricingRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'trigger', 'status', 'repriced_count', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('trigger', 'status', 'repriced_count', 'error', 'started_at', 'finished_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ShipmentCostAudit)
+class ShipmentCostAuditAdmin(admin.ModelAdmin):
+    list_display = ('shipment', 'run', 'old_shipping_cost', 'new_shipping_cost', 'old_total_cost', 'new_total_cost')
+    list_filter = ('run',)
+    list_select_related = ('shipment', 'shipment__user', 'run')
+    search_fields = ('shipment__shipment_number',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
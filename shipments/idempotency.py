@@ -0,0 +1,119 @@
+"""
+Gestion de l'en-tête Idempotency-Key pour les POST de paiement.
+
+Un client mobile qui rejoue une requête avec la même clé reçoit la réponse
+enregistrée lors du premier passage, sans toucher aux tables de paiement.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.metrics import record_cache
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_CACHE_TIMEOUT = 60 * 60 * 24  # 24 heures
+MAX_KEY_LENGTH = 100
+
+
+def _cache_key(user_id, key):
+    return f"idempotency:{user_id}:{hashlib.md5(key.encode()).hexdigest()}"
+
+
+def _request_hash(endpoint, request, kwargs):
+    payload = json.dumps(
+        {'endpoint': endpoint, 'kwargs': kwargs, 'data': request.data},
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(stored, request_hash):
+    if stored['request_hash'] != request_hash:
+        return Response(
+            {'error': 'Cette clé d\'idempotence a déjà été utilisée pour une autre requête'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(stored['response_body'], status=stored['response_status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _stored_response(user, key):
+    """Réponse enregistrée pour cette clé : cache d'abord, table ensuite"""
+    cache_key = _cache_key(user.pk, key)
+    stored = cache.get(cache_key)
+    record_cache('idempotency', stored is not None)
+    if stored is None:
+        stored = IdempotencyKey.objects.filter(user=user, key=key).values(
+            'request_hash', 'response_status', 'response_body'
+        ).first()
+        if stored is not None:
+            cache.set(cache_key, stored, IDEMPOTENCY_CACHE_TIMEOUT)
+    return stored
+
+
+def idempotent(endpoint):
+    """
+    Décorateur pour les vues POST : rejoue la réponse enregistrée si la clé
+    Idempotency-Key a déjà été traitée pour cet utilisateur.
+
+    La vue et l'enregistrement de la clé partagent la même transaction : si
+    deux requêtes concurrentes portent la même clé, la seconde est annulée
+    par la contrainte d'unicité et reçoit la réponse de la première.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(IDEMPOTENCY_HEADER, '').strip()
+            if not key:
+                return view_func(request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'Idempotency-Key trop longue ({MAX_KEY_LENGTH} caractères max)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            request_hash = _request_hash(endpoint, request, kwargs)
+            stored = _stored_response(request.user, key)
+            if stored is not None:
+                return _replay(stored, request_hash)
+
+            try:
+                with transaction.atomic():
+                    response = view_func(request, *args, **kwargs)
+                    if not status.is_success(response.status_code):
+                        # Les erreurs ne sont pas mémorisées : le client peut corriger et réessayer
+                        return response
+                    stored = {
+                        'request_hash': request_hash,
+                        'response_status': response.status_code,
+                        'response_body': json.loads(json.dumps(response.data, cls=DjangoJSONEncoder)),
+                    }
+                    IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        endpoint=endpoint,
+                        **stored
+                    )
+            except IntegrityError:
+                # Une requête concurrente avec la même clé a gagné
+                stored = _stored_response(request.user, key)
+                if stored is None:
+                    raise
+                return _replay(stored, request_hash)
+
+            transaction.on_commit(
+                lambda: cache.set(_cache_key(request.user.pk, key), stored, IDEMPOTENCY_CACHE_TIMEOUT)
+            )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shipments.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Applique les notifications de paiement en attente aux paiements et expéditions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Nombre de workers parallèles (défaut: 4)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Événements par lot (défaut: 500)')
+        parser.add_argument('--loop', action='store_true', help='Continuer à interroger la boîte de réception')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Pause quand la file est vide, en secondes')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                executor.submit(self.work, options['batch_size'], options['loop'], options['sleep'])
+                for _ in range(options['workers'])
+            ]
+            processed = sum(future.result() for future in futures)
+        elapsed = time.perf_counter() - started
+
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} événement(s) traité(s) en {elapsed:.2f}s ({rate:.0f} événements/s)"
+        ))
+
+    def work(self, batch_size, loop, sleep):
+        processed = 0
+        try:
+            while True:
+                count = process_pending_events(batch_size)
+                processed += count
+                if count == 0:
+                    if not loop:
+                        return processed
+                    time.sleep(sleep)
+        finally:
+            # Chaque thread possède sa propre connexion
+            connection.close()
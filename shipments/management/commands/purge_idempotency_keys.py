@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shipments.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence plus anciennes que la période de rétention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Rétention en jours (défaut: 7)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clé(s) d'idempotence supprimée(s)"))
@@ -0,0 +1,57 @@
+import csv
+import os
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shipments.reconciliation import REPORT_HEADERS, ReconciliationError, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = "Rapproche un relevé CSV (MonCash, banque) avec les paiements de la période"
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Chemin du relevé CSV')
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Début de la période (AAAA-MM-JJ, défaut: il y a 30 jours)')
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help="Fin de la période (AAAA-MM-JJ, défaut: aujourd'hui)")
+        parser.add_argument('--transaction-column', default='transaction_id')
+        parser.add_argument('--amount-column', default='amount')
+        parser.add_argument('--output-dir', default='.', help='Dossier des rapports CSV')
+        parser.add_argument('--dry-run', action='store_true', help='Ne pas mettre à jour les statuts')
+
+    def handle(self, *args, **options):
+        until = options['until'] or date.today()
+        since = options['since'] or until - timedelta(days=30)
+        os.makedirs(options['output_dir'], exist_ok=True)
+
+        report_files = {
+            name: open(os.path.join(options['output_dir'], f'{name}.csv'), 'w', newline='')
+            for name in REPORT_HEADERS
+        }
+        try:
+            with open(options['statement'], newline='', encoding='utf-8-sig') as statement:
+                counts = reconcile_statement(
+                    statement, since, until,
+                    reports={name: csv.writer(f) for name, f in report_files.items()},
+                    transaction_column=options['transaction_column'],
+                    amount_column=options['amount_column'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ReconciliationError) as e:
+            raise CommandError(str(e))
+        finally:
+            for f in report_files.values():
+                f.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Période {since} - {until} : {counts['matched']} rapproché(s), "
+            f"{counts['amount_mismatch']} écart(s) de montant, "
+            f"{counts['missing_in_db']} absent(s) en base, "
+            f"{counts['missing_in_statement']} absent(s) du relevé, "
+            f"{counts['unexpected_status']} échoué(s) ou remboursé(s), "
+            f"{counts['duplicates']} doublon(s)"
+        ))
+        action = 'à mettre à jour' if options['dry_run'] else 'mis à jour'
+        self.stdout.write(f"{counts['completed']} paiement(s) {action} en 'completed'")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shipments.repricing import process_scheduled_runs, reprice_pending_shipments
+
+
+class Command(BaseCommand):
+    help = "Recalcule les coûts des expéditions en attente selon les tarifs actifs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true',
+                            help='Exécuter les recalculs demandés par les changements de tarif')
+        parser.add_argument('--loop', action='store_true', help='Continuer à interroger la file (avec --queue)')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Pause quand la file est vide, en secondes')
+
+    def handle(self, *args, **options):
+        if options['queue']:
+            self.work(options['loop'], options['sleep'])
+            return
+
+        run = reprice_pending_shipments('Commande reprice_shipments')
+        if run.status == 'failed':
+            raise CommandError(run.error)
+        self.stdout.write(self.style.SUCCESS(f"{run.repriced_count} expédition(s) recalculée(s)"))
+
+    def work(self, loop, sleep):
+        while True:
+            processed = process_scheduled_runs()
+            if processed or not loop:
+                self.stdout.write(f"{processed} recalcul(s) exécuté(s)")
+            if not loop:
+                return
+            if not processed:
+                time.sleep(sleep)
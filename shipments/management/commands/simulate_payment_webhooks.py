@@ -0,0 +1,72 @@
+import json
+import statistics
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shipments.models import Payment
+from shipments.webhooks import sign_payload
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule un fournisseur de paiement : envoie une rafale de webhooks au récepteur "
+        "et mesure le débit d'ingestion"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/shipments/webhooks/moncash/')
+        parser.add_argument('--provider', default='moncash', choices=['moncash', 'bank_transfer'])
+        parser.add_argument('--events', type=int, default=5000, help="Nombre d'événements (défaut: 5000)")
+        parser.add_argument('--concurrency', type=int, default=50, help='Requêtes simultanées (défaut: 50)')
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help="Part d'événements rejoués avec le même transaction_id (défaut: 0.1)")
+
+    def handle(self, *args, **options):
+        bodies = self.build_events(options['events'], options['duplicates'])
+        secret = settings.PAYMENT_WEBHOOK_SECRETS.get(options['provider'])
+
+        def send(body):
+            request = urllib.request.Request(options['url'], data=body, method='POST')
+            request.add_header('Content-Type', 'application/json')
+            if secret:
+                request.add_header('X-Webhook-Signature', sign_payload(secret, body))
+            started = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            latencies = sorted(executor.map(send, bodies))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(bodies)} webhook(s) en {elapsed:.2f}s ({len(bodies) / elapsed:.0f} req/s) - "
+            f"p50 {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+        ))
+
+    def build_events(self, count, duplicate_ratio):
+        """Événements pour les paiements en attente, complétés par des références inconnues"""
+        references = [
+            (str(pk), str(amount))
+            for pk, amount in Payment.objects.filter(status='pending').values_list('pk', 'amount')[:count]
+        ]
+        references += [(str(uuid.uuid4()), '10.00') for _ in range(count - len(references))]
+
+        unique_count = max(1, int(count * (1 - duplicate_ratio)))
+        events = [
+            {
+                'transaction_id': f"SIM{uuid.uuid4().hex[:12].upper()}", 'reference': reference,
+                'amount': amount, 'status': 'completed',
+            }
+            for reference, amount in references[:unique_count]
+        ]
+        # Rejouer une partie des événements comme le ferait un fournisseur
+        events += [events[i % unique_count] for i in range(count - unique_count)]
+        return [json.dumps(event).encode() for event in events]
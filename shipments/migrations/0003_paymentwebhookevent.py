@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('moncash', 'MonCash'), ('stripe', 'Stripe'), ('bank_transfer', 'Virement bancaire')], max_length=20)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('applied', 'Appliqué'), ('duplicate', 'Doublon'), ('ignored', 'Ignoré'), ('failed', 'Échoué')], default='pending', max_length=20)),
+                ('transaction_id', models.CharField(blank=True, max_length=200)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='webhook_pending_idx')],
+            },
+        ),
+    ]
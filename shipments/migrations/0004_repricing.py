@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0003_paymentwebhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepricingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigger', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('running', 'En cours'), ('completed', 'Terminé'), ('failed', 'Échoué')], default='running', max_length=20)),
+                ('repriced_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentCostAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_shipping_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_shipping_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_total_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_total_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audits', to='shipments.repricingrun')),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_audits', to='shipments.shipment')),
+            ],
+        ),
+    ]
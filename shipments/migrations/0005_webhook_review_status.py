@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0004_repricing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentwebhookevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('applied', 'Appliqué'), ('duplicate', 'Doublon'), ('ignored', 'Ignoré'), ('review', 'À vérifier'), ('failed', 'Échoué')], default='pending', max_length=20),
+        ),
+    ]
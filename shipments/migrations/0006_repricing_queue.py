@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0005_webhook_review_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repricingrun',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('completed', 'Terminé'), ('failed', 'Échoué')], default='pending', max_length=20),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from packages.models import Package, PackageConsolidation
 import uuid
 
@@ -120,3 +121,96 @@ class Payment(models.Model):
     
     def __str__(self):
         return f"Paiement {self.id} - {self.shipment.shipment_number}"
+
+
+class IdempotencyKey(models.Model):
+    """Réponse enregistrée pour une requête rejouée avec l'en-tête Idempotency-Key"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=100)
+    endpoint = models.CharField(max_length=50)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"{self.endpoint} - {self.key}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """Boîte de réception des notifications de paiement (MonCash, Stripe, banque)"""
+    PROVIDER_CHOICES = [
+        ('moncash', 'MonCash'),
+        ('stripe', 'Stripe'),
+        ('bank_transfer', 'Virement bancaire'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('applied', 'Appliqué'),
+        ('duplicate', 'Doublon'),
+        ('ignored', 'Ignoré'),
+        ('review', 'À vérifier'),
+        ('failed', 'Échoué'),
+    ]
+    
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    payload = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    transaction_id = models.CharField(max_length=200, blank=True)
+    error = models.CharField(max_length=200, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='webhook_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Webhook {self.get_provider_display()} #{self.pk} ({self.status})"
+
+
+class RepricingRun(models.Model):
+    """Recalcul des coûts des expéditions en attente après un changement de tarif"""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+    
+    trigger = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    repriced_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Recalcul {self.started_at:%d/%m/%Y %H:%M} ({self.repriced_count} expéditions)"
+
+
+class ShipmentCostAudit(models.Model):
+    """Coûts avant/après d'une expédition recalculée"""
+    run = models.ForeignKey(RepricingRun, on_delete=models.CASCADE, related_name='audits')
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='cost_audits')
+    old_shipping_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    new_shipping_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    old_total_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    new_total_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.shipment_id}: {self.old_total_cost} -> {self.new_total_cost}"
@@ -0,0 +1,25 @@
+"""
+Tarifs actifs sérialisés, partagés par toutes les requêtes : la liste n'est
+relue qu'après la modification d'un tarif (voir core.snapshots).
+"""
+from core.snapshots import VersionedSnapshot
+from .models import ShippingRate
+from .serializers import ShippingRateSerializer
+
+RATES_VERSION_KEY = 'shipping_rates:version'
+
+
+def _load_rates():
+    rates = ShippingRate.objects.filter(is_active=True)
+    return tuple(dict(item) for item in ShippingRateSerializer(rates, many=True).data)
+
+
+rates_snapshot = VersionedSnapshot(RATES_VERSION_KEY, _load_rates, name='shipping_rates')
+
+
+def get_active_rates():
+    return rates_snapshot.get()
+
+
+async def aget_active_rates():
+    return await rates_snapshot.aget()
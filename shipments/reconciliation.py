@@ -0,0 +1,181 @@
+"""
+Rapprochement des paiements avec les relevés des fournisseurs (MonCash, banques).
+
+Le relevé CSV est lu en flux et joint en mémoire (table de hachage sur
+transaction_id) aux paiements de la période, chargés en une requête par
+table avec values_list : aucune requête par ligne de relevé. Seuls les
+paiements en attente passent en « completed » ; un paiement échoué ou
+remboursé retrouvé dans le relevé est signalé sans être modifié, comme les
+transaction_id présents plusieurs fois en base ou dans le relevé.
+"""
+import csv
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from packages.models import PackagePayment
+from reports.rollups import mark_shipments_dirty
+from .models import Payment, Shipment
+
+UPDATE_CHUNK_SIZE = 5000
+
+REPORT_HEADERS = {
+    'matched': ['transaction_id', 'kind', 'payment_id', 'amount', 'previous_status'],
+    'missing_in_db': ['transaction_id', 'statement_amount', 'line'],
+    'missing_in_statement': ['transaction_id', 'kind', 'payment_id', 'amount', 'status'],
+    'amount_mismatch': ['transaction_id', 'kind', 'payment_id', 'amount', 'statement_amount', 'line'],
+    'unexpected_status': ['transaction_id', 'kind', 'payment_id', 'amount', 'status', 'line'],
+    'duplicates': ['transaction_id', 'source', 'kind', 'payment_id', 'amount', 'line'],
+}
+
+PaymentEntry = namedtuple('PaymentEntry', ['kind', 'pk', 'amount', 'status'])
+
+
+class ReconciliationError(Exception):
+    pass
+
+
+def parse_amount(raw):
+    """Montant d'un relevé : séparateurs de milliers et espaces ignorés"""
+    try:
+        return Decimal(raw.replace(',', '').replace(' ', '').strip())
+    except (InvalidOperation, AttributeError):
+        return None
+
+
+def load_payment_index(since, until):
+    """
+    Index transaction_id -> paiement pour les Payment et PackagePayment de la
+    période, et transaction_id -> paiements pour ceux présents plusieurs fois
+    """
+    index, duplicates = {}, {}
+    sources = (
+        ('shipment', Payment.objects),
+        ('package', PackagePayment.objects),
+    )
+    for kind, manager in sources:
+        rows = manager.filter(
+            created_at__date__gte=since,
+            created_at__date__lte=until,
+        ).exclude(transaction_id='').values_list('transaction_id', 'pk', 'amount', 'status')
+        for transaction_id, pk, amount, status in rows.iterator(chunk_size=UPDATE_CHUNK_SIZE):
+            entry = PaymentEntry(kind, pk, amount, status)
+            if transaction_id in duplicates:
+                duplicates[transaction_id].append(entry)
+            elif transaction_id in index:
+                duplicates[transaction_id] = [index.pop(transaction_id), entry]
+            else:
+                index[transaction_id] = entry
+    return index, duplicates
+
+
+def _chunks(values, size=UPDATE_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _complete_payments(to_complete):
+    """Passe en 'completed' les paiements rapprochés encore en attente, par lots"""
+    now = timezone.now()
+    with transaction.atomic():
+        for chunk in _chunks(to_complete['shipment']):
+            # Verrouiller les expéditions avant les paiements (même ordre que confirm_payment
+            # et les webhooks), sinon un rapprochement concurrent peut finir en interblocage
+            list(
+                Shipment.objects.select_for_update()
+                .filter(pk__in=Payment.objects.filter(pk__in=chunk).values('shipment_id'))
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            # Relu sous verrou : un paiement remboursé ou échoué entre-temps reste tel quel
+            pending = list(
+                Payment.objects.select_for_update().filter(pk__in=chunk, status='pending')
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            Payment.objects.filter(pk__in=pending).update(status='completed', completed_at=now)
+            Shipment.objects.filter(payments__pk__in=pending, status='pending').update(
+                status='paid', paid_at=now
+            )
+            mark_shipments_dirty(Payment.objects.filter(pk__in=pending).values('shipment_id'))
+        for chunk in _chunks(to_complete['package']):
+            PackagePayment.objects.filter(pk__in=chunk, status='pending').update(
+                status='completed', paid_at=now
+            )
+
+
+def reconcile_statement(statement, since, until, reports=None,
+                        transaction_column='transaction_id', amount_column='amount',
+                        dry_run=False):
+    """
+    Rapproche un relevé (fichier texte CSV) avec les paiements de la période.
+
+    `reports` associe chaque nom de REPORT_HEADERS à un csv.writer optionnel.
+    Retourne le nombre de lignes par catégorie.
+    """
+    reports = reports or {}
+    for name, writer in reports.items():
+        writer.writerow(REPORT_HEADERS[name])
+
+    def report(name, row):
+        writer = reports.get(name)
+        if writer is not None:
+            writer.writerow(row)
+
+    reader = csv.DictReader(statement)
+    missing_columns = {transaction_column, amount_column} - set(reader.fieldnames or [])
+    if missing_columns:
+        raise ReconciliationError(f"Colonnes absentes du relevé : {', '.join(sorted(missing_columns))}")
+
+    index, db_duplicates = load_payment_index(since, until)
+    counts = dict.fromkeys(REPORT_HEADERS, 0)
+    to_complete = {'shipment': [], 'package': []}
+    seen = set()
+
+    for transaction_id, entries in db_duplicates.items():
+        for entry in entries:
+            counts['duplicates'] += 1
+            report('duplicates', [transaction_id, 'db', entry.kind, entry.pk, entry.amount, ''])
+
+    for line_number, row in enumerate(reader, start=2):
+        transaction_id = (row[transaction_column] or '').strip()
+        if not transaction_id:
+            continue
+        statement_amount = parse_amount(row[amount_column])
+        # Ligne répétée dans le relevé, ou transaction ambiguë en base : rien n'est modifié
+        if transaction_id in seen or transaction_id in db_duplicates:
+            counts['duplicates'] += 1
+            report('duplicates', [transaction_id, 'statement', '', '', row[amount_column], line_number])
+            continue
+        seen.add(transaction_id)
+        entry = index.pop(transaction_id, None)
+
+        if entry is None:
+            counts['missing_in_db'] += 1
+            report('missing_in_db', [transaction_id, row[amount_column], line_number])
+        elif statement_amount != entry.amount:
+            counts['amount_mismatch'] += 1
+            report('amount_mismatch', [transaction_id, entry.kind, entry.pk, entry.amount,
+                                       row[amount_column], line_number])
+        elif entry.status not in ('pending', 'completed'):
+            counts['unexpected_status'] += 1
+            report('unexpected_status', [transaction_id, entry.kind, entry.pk, entry.amount,
+                                         entry.status, line_number])
+        else:
+            counts['matched'] += 1
+            report('matched', [transaction_id, entry.kind, entry.pk, entry.amount, entry.status])
+            if entry.status == 'pending':
+                to_complete[entry.kind].append(entry.pk)
+
+    # Paiements de la période absents du relevé
+    for transaction_id, entry in index.items():
+        counts['missing_in_statement'] += 1
+        report('missing_in_statement', [transaction_id, entry.kind, entry.pk, entry.amount, entry.status])
+
+    counts['completed'] = len(to_complete['shipment']) + len(to_complete['package'])
+    if not dry_run:
+        _complete_payments(to_complete)
+    return counts
@@ -0,0 +1,142 @@
+"""
+Recalcul ensembliste des coûts des expéditions en attente.
+
+Une seule requête UPDATE ... FROM sur une CTE des tarifs applicables met à
+jour toutes les expéditions 'pending' et le montant de leurs paiements en
+attente, et enregistre l'audit avant/après, au lieu d'un appel à
+Shipment.calculate_shipping_cost par expédition.
+
+Un changement de tarif enregistre un RepricingRun 'pending' dans la même
+transaction, sauf si un recalcul en attente (pas encore réservé par un
+worker) existe déjà : il lira aussi ce tarif. La commande
+reprice_shipments --queue les exécute : un worker réserve le recalcul en le
+passant 'running', puis verrouille sa ligne jusqu'à la fin. Un recalcul
+resté 'running' sans verrou (worker interrompu) est repris par le worker
+suivant.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reports.rollups import mark_shipments_dirty
+from .models import Payment, RepricingRun, Shipment, ShipmentCostAudit, ShippingRate
+
+logger = logging.getLogger(__name__)
+
+# Même règle que Shipment.calculate_shipping_cost : premier tarif actif
+# (par poids minimum croissant) dont la tranche contient le poids total
+REPRICE_SQL = """
+WITH rate AS (
+    SELECT DISTINCT ON (s.id) s.id AS shipment_id,
+           ROUND(r.price_per_kg * s.total_weight, 2) AS shipping_cost
+    FROM {shipment} s
+    JOIN {rate} r
+      ON r.shipping_type = s.shipping_type
+     AND r.is_active
+     AND s.total_weight BETWEEN r.min_weight AND r.max_weight
+    WHERE s.status = 'pending'
+    ORDER BY s.id, r.min_weight
+),
+old AS (
+    SELECT s.id, s.shipping_cost, s.total_cost
+    FROM {shipment} s
+    JOIN rate ON rate.shipment_id = s.id
+),
+updated AS (
+    UPDATE {shipment} s
+    SET shipping_cost = rate.shipping_cost,
+        total_cost = rate.shipping_cost + s.insurance_cost
+    FROM rate, old
+    WHERE s.id = rate.shipment_id
+      AND old.id = s.id
+      AND s.status = 'pending'
+      AND (s.shipping_cost <> rate.shipping_cost
+           OR s.total_cost <> rate.shipping_cost + s.insurance_cost)
+    RETURNING s.id, old.shipping_cost AS old_shipping_cost, s.shipping_cost,
+              old.total_cost AS old_total_cost, s.total_cost
+),
+-- Le client paie le nouveau montant et le rapprochement compare au bon montant
+payments AS (
+    UPDATE {payment} p
+    SET amount = updated.total_cost
+    FROM updated
+    WHERE p.shipment_id = updated.id
+      AND p.status = 'pending'
+)
+INSERT INTO {audit} (run_id, shipment_id, old_shipping_cost, new_shipping_cost,
+                     old_total_cost, new_total_cost)
+SELECT %s, id, old_shipping_cost, shipping_cost, old_total_cost, total_cost
+FROM updated
+"""
+
+
+def _execute(run):
+    """Exécute le recalcul `run` (dont la ligne est verrouillée par l'appelant)"""
+    sql = REPRICE_SQL.format(
+        shipment=Shipment._meta.db_table,
+        rate=ShippingRate._meta.db_table,
+        payment=Payment._meta.db_table,
+        audit=ShipmentCostAudit._meta.db_table,
+    )
+    run.error = ''
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [run.pk])
+                run.repriced_count = cursor.rowcount
+            mark_shipments_dirty(run.audits.values('shipment_id'))
+    except Exception as e:
+        logger.exception("Échec du recalcul des coûts (%s)", run.trigger)
+        run.status = 'failed'
+        run.error = str(e)
+    else:
+        run.status = 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'repriced_count', 'error', 'finished_at'])
+    return run
+
+
+def reprice_pending_shipments(trigger):
+    """Recalcule les coûts de toutes les expéditions en attente et retourne le RepricingRun"""
+    with transaction.atomic():
+        run = RepricingRun.objects.create(trigger=trigger[:200], status='running')
+        return _execute(run)
+
+
+def schedule_repricing(trigger):
+    """Demande un recalcul, exécuté par la commande reprice_shipments --queue"""
+    with transaction.atomic():
+        # Une ligne verrouillée est en cours de réservation par un worker : elle ne compte pas
+        pending = (
+            RepricingRun.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .values_list('pk', flat=True)[:1]
+        )
+        if not list(pending):
+            RepricingRun.objects.create(trigger=trigger[:200], status='pending')
+
+
+def process_scheduled_runs():
+    """Exécute les recalculs demandés, un par un, et retourne leur nombre"""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            run = (
+                RepricingRun.objects.select_for_update(skip_locked=True)
+                .filter(status__in=('pending', 'running'))
+                .order_by('pk')
+                .first()
+            )
+            if run is None:
+                return processed
+            # Réservé : visible 'running' et plus compté comme en attente
+            run.status = 'running'
+            run.save(update_fields=['status'])
+        with transaction.atomic():
+            # Un autre worker a pu le reprendre entre les deux transactions
+            run = RepricingRun.objects.select_for_update().filter(pk=run.pk, status='running').first()
+            if run is None:
+                continue
+            _execute(run)
+        processed += 1
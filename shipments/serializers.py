@@ -1,4 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
+from notifications.outbox import enqueue_notification, shipment_context
 from .models import ShippingRate, Shipment, Payment
 from packages.models import Package, PackageConsolidation
 
@@ -84,19 +86,21 @@ class ShipmentCreateSerializer(serializers.ModelSerializer):
         consolidation_id = validated_data.pop('consolidation_id', None)
         user = self.context['request'].user
         
-        shipment = Shipment.objects.create(user=user, **validated_data)
-        
-        if package_ids:
-            packages = Package.objects.filter(id__in=package_ids, user=user)
-            shipment.packages.set(packages)
-            shipment.total_weight = sum(p.weight for p in packages)
-        
-        if consolidation_id:
-            consolidation = PackageConsolidation.objects.get(id=consolidation_id, user=user)
-            shipment.consolidation = consolidation
-            shipment.total_weight = consolidation.total_weight
-        
-        shipment.calculate_shipping_cost()
+        with transaction.atomic():
+            shipment = Shipment.objects.create(user=user, **validated_data)
+            
+            if package_ids:
+                packages = Package.objects.filter(id__in=package_ids, user=user)
+                shipment.packages.set(packages)
+                shipment.total_weight = sum(p.weight for p in packages)
+            
+            if consolidation_id:
+                consolidation = PackageConsolidation.objects.get(id=consolidation_id, user=user)
+                shipment.consolidation = consolidation
+                shipment.total_weight = consolidation.total_weight
+            
+            shipment.calculate_shipping_cost()
+            enqueue_notification('shipment_created', user, shipment_context(shipment))
         return shipment
 
 class ShipmentUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ShippingRate
+from .rates import rates_snapshot
+from .repricing import schedule_repricing
+
+
+@receiver(post_save, sender=ShippingRate)
+def shipping_rate_saved(sender, instance, **kwargs):
+    transaction.on_commit(rates_snapshot.invalidate)
+    schedule_repricing(f"Tarif modifié : {instance}")
+
+
+@receiver(post_delete, sender=ShippingRate)
+def shipping_rate_deleted(sender, instance, **kwargs):
+    transaction.on_commit(rates_snapshot.invalidate)
+    schedule_repricing(f"Tarif supprimé : {instance}")
@@ -1,3 +1,424 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import urllib.error
+import urllib.request
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from packages.models import Package, PackagePayment
+from .models import IdempotencyKey, Payment, PaymentWebhookEvent, RepricingRun, Shipment, ShippingRate
+from .reconciliation import reconcile_statement
+from . import repricing
+from .repricing import process_scheduled_runs
+from .webhooks import process_pending_events, sign_payload, verify_signature
+
+WEBHOOK_SECRET = 'test-webhook-secret'
+WEBHOOK_SECRETS = {'moncash': WEBHOOK_SECRET, 'stripe': WEBHOOK_SECRET, 'bank_transfer': ''}
+
+
+def create_shipment(user, total_cost=Decimal('25.00'), **fields):
+    return Shipment.objects.create(
+        user=user,
+        shipping_type='air',
+        total_weight=Decimal('2.00'),
+        shipping_cost=total_cost,
+        total_cost=total_cost,
+        delivery_address='Delmas 33, Port-au-Prince',
+        recipient_name='Marie Joseph',
+        recipient_phone='50937000000',
+        **fields
+    )
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        self.shipment = create_shipment(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.create_url = reverse('shipments:create_payment', kwargs={'shipment_id': self.shipment.pk})
+
+    def post(self, url, data, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post(url, data, format='json', headers=headers)
+
+    def test_replayed_creation_returns_stored_response(self):
+        first = self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+        replay = self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+        response = self.post(self.create_url, {'payment_method': 'stripe'}, key='create-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_errors_are_not_stored(self):
+        response = self.post(self.create_url, {'payment_method': 'inconnu'}, key='create-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+        self.assertEqual(response.status_code, 201)
+
+    def test_replayed_confirmation_does_not_touch_payment_tables(self):
+        payment = Payment.objects.create(shipment=self.shipment, payment_method='moncash', amount=Decimal('25.00'))
+        url = reverse('shipments:confirm_payment', kwargs={'payment_id': payment.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.post(url, {'transaction_id': 'MC-1'}, key='confirm-1')
+
+        # Réponse servie par le cache, sans requête SQL
+        with self.assertNumQueries(0):
+            replay = self.post(url, {'transaction_id': 'MC-1'}, key='confirm-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(replay.json(), first.json())
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'paid')
+
+    def test_replay_falls_back_to_table_when_cache_is_empty(self):
+        first = self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+        cache.clear()
+        replay = self.post(self.create_url, {'payment_method': 'moncash'}, key='create-1')
+
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class ProviderStub:
+    """Fournisseur de paiement local : signe et envoie ses notifications en HTTP comme MonCash"""
+
+    def __init__(self, base_url, provider='moncash', secret=WEBHOOK_SECRET):
+        self.url = base_url + reverse('shipments:payment_webhook', kwargs={'provider': provider})
+        self.secret = secret
+
+    def notify(self, signature=None, **event):
+        body = json.dumps(event).encode()
+        request = urllib.request.Request(self.url, data=body, method='POST')
+        request.add_header('Content-Type', 'application/json')
+        if self.secret or signature:
+            request.add_header('X-Webhook-Signature', signature or sign_payload(self.secret, body))
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRETS=WEBHOOK_SECRETS)
+class PaymentWebhookReceiverTests(LiveServerTestCase):
+    def test_signed_event_is_stored_raw(self):
+        status = ProviderStub(self.live_server_url).notify(transaction_id='MC-1', reference='ref', amount='10.00')
+
+        self.assertEqual(status, 200)
+        event = PaymentWebhookEvent.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(json.loads(event.payload)['transaction_id'], 'MC-1')
+
+    def test_bad_signature_is_rejected(self):
+        status = ProviderStub(self.live_server_url).notify(signature='0' * 64, transaction_id='MC-1')
+
+        self.assertEqual(status, 401)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_provider_without_secret_is_refused(self):
+        stub = ProviderStub(self.live_server_url, provider='bank_transfer', secret='')
+        self.assertEqual(stub.notify(transaction_id='BK-1', reference='ref'), 503)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_burst_with_replays_is_applied_once(self):
+        user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        payments = [
+            Payment.objects.create(shipment=create_shipment(user), payment_method='moncash', amount=Decimal('25.00'))
+            for _ in range(5)
+        ]
+        stub = ProviderStub(self.live_server_url)
+        for _ in range(2):
+            for i, payment in enumerate(payments):
+                stub.notify(transaction_id=f'MC-{i}', reference=str(payment.pk), amount='25.00', status='completed')
+
+        self.assertEqual(process_pending_events(batch_size=3), 3)
+        while process_pending_events(batch_size=3):
+            pass
+
+        self.assertEqual(Payment.objects.filter(status='completed').count(), 5)
+        self.assertEqual(Shipment.objects.filter(status='paid').count(), 5)
+        self.assertEqual(PaymentWebhookEvent.objects.filter(status='applied').count(), 5)
+        self.assertEqual(PaymentWebhookEvent.objects.filter(status='duplicate').count(), 5)
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRETS=WEBHOOK_SECRETS)
+class PaymentWebhookProcessingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        self.shipment = create_shipment(self.user)
+        self.payment = Payment.objects.create(
+            shipment=self.shipment, payment_method='moncash', amount=Decimal('25.00')
+        )
+
+    def receive(self, provider='moncash', **event):
+        return PaymentWebhookEvent.objects.create(provider=provider, payload=json.dumps(event))
+
+    def test_matching_event_completes_payment_and_shipment(self):
+        event = self.receive(transaction_id='MC-1', reference=str(self.payment.pk), amount='25.00')
+        process_pending_events()
+
+        event.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.shipment.refresh_from_db()
+        self.assertEqual(event.status, 'applied')
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.payment.transaction_id, 'MC-1')
+        self.assertEqual(self.shipment.status, 'paid')
+
+    def test_transaction_already_completed_is_duplicate(self):
+        self.receive(transaction_id='MC-1', reference=str(self.payment.pk), amount='25.00')
+        process_pending_events()
+        replay = self.receive(transaction_id='MC-1', reference=str(self.payment.pk), amount='25.00')
+        process_pending_events()
+
+        replay.refresh_from_db()
+        self.assertEqual(replay.status, 'duplicate')
+
+    def test_amount_mismatch_is_held_for_review(self):
+        event = self.receive(transaction_id='MC-1', reference=str(self.payment.pk), amount='1.00')
+        missing = self.receive(transaction_id='MC-2', reference=str(self.payment.pk))
+        process_pending_events()
+
+        event.refresh_from_db()
+        missing.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.shipment.refresh_from_db()
+        self.assertEqual(event.status, 'review')
+        self.assertEqual(missing.status, 'review')
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertEqual(self.shipment.status, 'pending')
+
+    def test_stripe_amount_in_cents(self):
+        event = self.receive('stripe', type='payment_intent.succeeded', data={'object': {
+            'id': 'pi_1', 'amount_received': 2500, 'metadata': {'payment_id': str(self.payment.pk)},
+        }})
+        process_pending_events()
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'applied')
+
+    def test_refunded_payment_is_not_completed(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status='refunded')
+        event = self.receive(transaction_id='MC-1', reference=str(self.payment.pk), amount='25.00')
+        process_pending_events()
+
+        event.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(event.status, 'ignored')
+        self.assertEqual(self.payment.status, 'refunded')
+
+    def test_invalid_payload_fails(self):
+        event = PaymentWebhookEvent.objects.create(provider='moncash', payload='{pas du json')
+        process_pending_events()
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+
+    def test_stripe_signature(self):
+        body = b'{"type": "charge.succeeded"}'
+        headers = {'Stripe-Signature': f"t=1700000000,v1={sign_payload(WEBHOOK_SECRET, b'1700000000.' + body)}"}
+        self.assertTrue(verify_signature('stripe', body, headers))
+        self.assertFalse(verify_signature('stripe', body + b' ', headers))
+
+    @override_settings(DEBUG=False)
+    def test_unsigned_events_refused_without_secret(self):
+        self.assertFalse(verify_signature('bank_transfer', b'{}', {}))
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        self.today = timezone.localdate()
+
+    def payment(self, transaction_id, status='pending', amount=Decimal('25.00')):
+        return Payment.objects.create(
+            shipment=create_shipment(self.user), payment_method='moncash', amount=amount,
+            status=status, transaction_id=transaction_id,
+        )
+
+    def reconcile(self, *lines):
+        statement = io.StringIO('transaction_id,amount\n' + ''.join(f'{tid},{amount}\n' for tid, amount in lines))
+        buffers = {name: io.StringIO() for name in ('matched', 'unexpected_status', 'duplicates')}
+        counts = reconcile_statement(
+            statement, self.today - timedelta(days=1), self.today,
+            reports={name: csv.writer(buffer) for name, buffer in buffers.items()},
+        )
+        reports = {name: list(csv.reader(io.StringIO(buffer.getvalue())))[1:] for name, buffer in buffers.items()}
+        return counts, reports
+
+    def test_pending_payment_is_completed(self):
+        payment = self.payment('MC-1')
+        counts, _ = self.reconcile(('MC-1', '25.00'))
+
+        payment.refresh_from_db()
+        self.assertEqual(counts['matched'], 1)
+        self.assertEqual(counts['completed'], 1)
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(payment.shipment.status, 'paid')
+
+    def test_shipments_are_locked_before_payments(self):
+        self.payment('MC-1')
+        self.payment('MC-2')
+        with CaptureQueriesContext(connection) as queries:
+            self.reconcile(('MC-1', '25.00'), ('MC-2', '25.00'))
+
+        locked = [
+            query['sql'].split(' FROM ')[1].split()[0].strip('"')
+            for query in queries.captured_queries if query['sql'].endswith('FOR UPDATE')
+        ]
+        self.assertEqual(locked, [Shipment._meta.db_table, Payment._meta.db_table])
+
+    def test_refunded_and_failed_payments_are_reported_not_completed(self):
+        refunded = self.payment('MC-1', status='refunded')
+        failed = self.payment('MC-2', status='failed')
+        package = Package.objects.create(
+            user=self.user, description='Colis', weight=2, length=10, width=10, height=10, value=50
+        )
+        package_payment = PackagePayment.objects.create(
+            package=package, amount=Decimal('12.00'), method='moncash', status='refunded', transaction_id='MC-3'
+        )
+        counts, reports = self.reconcile(('MC-1', '25.00'), ('MC-2', '25.00'), ('MC-3', '12.00'))
+
+        self.assertEqual(counts['unexpected_status'], 3)
+        self.assertEqual(counts['matched'], 0)
+        self.assertEqual({row[4] for row in reports['unexpected_status']}, {'refunded', 'failed'})
+        for obj, status in ((refunded, 'refunded'), (failed, 'failed'), (package_payment, 'refunded')):
+            obj.refresh_from_db()
+            self.assertEqual(obj.status, status)
+        refunded.shipment.refresh_from_db()
+        self.assertEqual(refunded.shipment.status, 'pending')
+
+    def test_repeated_statement_line_is_a_duplicate(self):
+        self.payment('MC-1', status='completed')
+        counts, reports = self.reconcile(('MC-1', '25.00'), ('MC-1', '25.00'))
+
+        self.assertEqual(counts['matched'], 1)
+        self.assertEqual(counts['duplicates'], 1)
+        self.assertEqual(counts['missing_in_db'], 0)
+        self.assertEqual(reports['duplicates'][0][:2], ['MC-1', 'statement'])
+
+    def test_transaction_id_repeated_in_db_is_not_applied(self):
+        first, second = self.payment('MC-1'), self.payment('MC-1')
+        counts, reports = self.reconcile(('MC-1', '25.00'))
+
+        self.assertEqual(counts['matched'], 0)
+        self.assertEqual(counts['completed'], 0)
+        self.assertEqual(counts['duplicates'], 3)
+        self.assertEqual(sorted(row[1] for row in reports['duplicates']), ['db', 'db', 'statement'])
+        for payment in (first, second):
+            payment.refresh_from_db()
+            self.assertEqual(payment.status, 'pending')
+
+    def test_reconcile_view_requires_change_permission(self):
+        staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='secret', is_staff=True
+        )
+        staff.user_permissions.add(Permission.objects.get(codename='view_payment'))
+        self.client.force_login(staff)
+        url = reverse('admin:shipments_payment_reconcile')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        staff.user_permissions.add(Permission.objects.get(codename='change_payment'))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class RepricingTests(TestCase):
+    def setUp(self):
+        self.rate = ShippingRate.objects.create(
+            shipping_type='air', min_weight=0, max_weight=50, price_per_kg=Decimal('4.00'), delivery_days=5
+        )
+        RepricingRun.objects.all().delete()
+        user = User.objects.create_user(email='client@example.com', username='client', password='secret')
+        self.shipment = create_shipment(user, total_cost=Decimal('8.00'))
+        self.payment = Payment.objects.create(shipment=self.shipment, payment_method='moncash', amount=Decimal('8.00'))
+
+    def test_rate_change_queues_a_run_that_reprices_pending_payments(self):
+        self.rate.price_per_kg = Decimal('5.00')
+        self.rate.save()
+        run = RepricingRun.objects.get()
+        self.assertEqual(run.status, 'pending')
+
+        self.assertEqual(process_scheduled_runs(), 1)
+
+        run.refresh_from_db()
+        self.shipment.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual(run.repriced_count, 1)
+        self.assertEqual(self.shipment.total_cost, Decimal('10.00'))
+        self.assertEqual(self.payment.amount, Decimal('10.00'))
+
+    def test_rate_changes_share_the_pending_run(self):
+        for price in ('5.00', '6.00', '7.00'):
+            self.rate.price_per_kg = Decimal(price)
+            self.rate.save()
+        ShippingRate.objects.create(
+            shipping_type='sea', min_weight=0, max_weight=50, price_per_kg=Decimal('2.00'), delivery_days=30
+        )
+        self.assertEqual(RepricingRun.objects.filter(status='pending').count(), 1)
+
+        self.assertEqual(process_scheduled_runs(), 1)
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.total_cost, Decimal('14.00'))
+
+        # Après l'exécution, un nouveau changement demande un nouveau recalcul
+        self.rate.save()
+        self.assertEqual(RepricingRun.objects.filter(status='pending').count(), 1)
+
+    def test_claimed_run_is_running(self):
+        run = RepricingRun.objects.create(trigger='test')
+        statuses = []
+        real_execute = repricing._execute
+
+        def execute(claimed):
+            statuses.append(RepricingRun.objects.get(pk=claimed.pk).status)
+            return real_execute(claimed)
+
+        with mock.patch.object(repricing, '_execute', side_effect=execute):
+            self.assertEqual(process_scheduled_runs(), 1)
+        self.assertEqual(statuses, ['running'])
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'completed')
+
+    def test_completed_payments_keep_their_amount(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status='completed')
+        ShippingRate.objects.filter(pk=self.rate.pk).update(price_per_kg=Decimal('5.00'))
+        RepricingRun.objects.create(trigger='test')
+        process_scheduled_runs()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.amount, Decimal('8.00'))
+
+    def test_interrupted_run_is_resumed(self):
+        ShippingRate.objects.filter(pk=self.rate.pk).update(price_per_kg=Decimal('5.00'))
+        run = RepricingRun.objects.create(trigger='worker interrompu', status='running')
+
+        self.assertEqual(process_scheduled_runs(), 1)
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'completed')
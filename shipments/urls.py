@@ -1,11 +1,12 @@
 from django.urls import path
+from core.async_api import deployment_view
 from . import views
 
 app_name = 'shipments'
 
 urlpatterns = [
     # Tarifs d'expédition
-    path('rates/', views.ShippingRateListView.as_view(), name='shipping_rates'),
+    path('rates/', deployment_view(views.ShippingRateListView.as_view(), views.ashipping_rate_list), name='shipping_rates'),
     path('calculate-cost/', views.calculate_shipping_cost, name='calculate_shipping_cost'),
     
     # Expéditions
@@ -17,6 +18,7 @@ urlpatterns = [
     path('payments/', views.PaymentListView.as_view(), name='payment_list'),
     path('payments/<uuid:pk>/', views.PaymentDetailView.as_view(), name='payment_detail'),
     path('payments/<uuid:payment_id>/confirm/', views.confirm_payment, name='confirm_payment'),
+    path('webhooks/<str:provider>/', views.payment_webhook, name='payment_webhook'),
     
     # Admin endpoints
     path('admin/', views.AdminShipmentListView.as_view(), name='admin_shipment_list'),
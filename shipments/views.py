@@ -1,9 +1,17 @@
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import ShippingRate, Shipment, Payment
+from django.views.decorators.http import require_safe
+from core.async_api import aget_user, invalid_page, json_response, not_authenticated, paginate_list
+from notifications.outbox import enqueue_notification, payment_context, shipment_context
+from .idempotency import idempotent
+from .rates import aget_active_rates, get_active_rates
+from .webhooks import verify_signature, webhook_secret
+from .models import ShippingRate, Shipment, Payment, PaymentWebhookEvent
 from .serializers import (
     ShippingRateSerializer,
     ShipmentSerializer,
@@ -14,9 +22,23 @@ from .serializers import (
 )
 
 class ShippingRateListView(generics.ListAPIView):
-    queryset = ShippingRate.objects.filter(is_active=True)
-    serializer_class = ShippingRateSerializer
+    """Tarifs actifs, servis depuis l'instantané partagé"""
     permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        return self.get_paginated_response(self.paginate_queryset(list(get_active_rates())))
+
+@require_safe
+async def ashipping_rate_list(request):
+    """ShippingRateListView pour un déploiement ASGI (vue async)"""
+    if await aget_user(request) is None:
+        return not_authenticated(request)
+    
+    page = paginate_list(request, await aget_active_rates())
+    if page is None:
+        return invalid_page()
+    rates, envelope = page
+    return json_response({**envelope, 'results': rates})
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -80,57 +102,100 @@ class ShipmentDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent('create_payment')
 def create_payment(request, shipment_id):
-    shipment = get_object_or_404(
-        Shipment,
-        id=shipment_id,
-        user=request.user,
-        status='pending'
-    )
-    
-    serializer = PaymentCreateSerializer(
-        data=request.data,
-        context={'shipment': shipment}
-    )
-    
-    if serializer.is_valid():
-        payment = serializer.save()
-        return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
+    with transaction.atomic():
+        # Verrouiller l'expédition pour sérialiser les créations concurrentes
+        shipment = get_object_or_404(
+            Shipment.objects.select_for_update(),
+            id=shipment_id,
+            user=request.user,
+            status='pending'
+        )
+        
+        serializer = PaymentCreateSerializer(
+            data=request.data,
+            context={'shipment': shipment}
+        )
+        
+        if serializer.is_valid():
+            payment = serializer.save()
+            return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent('confirm_payment')
 def confirm_payment(request, payment_id):
-    payment = get_object_or_404(
-        Payment,
-        id=payment_id,
-        shipment__user=request.user,
-        status='pending'
-    )
-    
-    transaction_id = request.data.get('transaction_id')
-    if transaction_id:
-        payment.transaction_id = transaction_id
-        payment.status = 'completed'
-        payment.completed_at = timezone.now()
-        payment.save()
-        
-        shipment = payment.shipment
-        shipment.status = 'paid'
-        shipment.paid_at = timezone.now()
-        shipment.save()
+    with transaction.atomic():
+        # Verrouiller l'expédition avant de relire le paiement : deux confirmations
+        # concurrentes ne peuvent pas s'appliquer deux fois
+        shipment = get_object_or_404(
+            Shipment.objects.select_for_update(of=('self',)),
+            payments__id=payment_id,
+            user=request.user
+        )
+        payment = get_object_or_404(
+            Payment,
+            id=payment_id,
+            shipment=shipment,
+            status='pending'
+        )
         
-        return Response({
-            'message': 'Paiement confirmé',
-            'payment': PaymentSerializer(payment).data
-        })
+        transaction_id = request.data.get('transaction_id')
+        if transaction_id:
+            now = timezone.now()
+            payment.transaction_id = transaction_id
+            payment.status = 'completed'
+            payment.completed_at = now
+            payment.save(update_fields=['transaction_id', 'status', 'completed_at'])
+            
+            if shipment.status == 'pending':
+                shipment.status = 'paid'
+                shipment.paid_at = now
+                shipment.save(update_fields=['status', 'paid_at'])
+            
+            enqueue_notification('payment_received', request.user, payment_context(payment, request.user))
+            
+            return Response({
+                'message': 'Paiement confirmé',
+                'payment': PaymentSerializer(payment).data
+            })
     
     return Response(
         {'error': 'ID de transaction requis'},
         status=status.HTTP_400_BAD_REQUEST
     )
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def payment_webhook(request, provider):
+    """
+    Récepteur des notifications de paiement des fournisseurs.
+    Enregistre le corps brut et répond immédiatement ; le traitement est
+    fait par la commande process_payment_webhooks.
+    """
+    if provider not in dict(PaymentWebhookEvent.PROVIDER_CHOICES):
+        return Response({'error': 'Fournisseur inconnu'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if not webhook_secret(provider) and not settings.DEBUG:
+        return Response(
+            {'error': 'Webhook non configuré pour ce fournisseur'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    body = request.body
+    if not verify_signature(provider, body, request.headers):
+        return Response({'error': 'Signature invalide'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    PaymentWebhookEvent.objects.create(
+        provider=provider,
+        payload=body.decode('utf-8', errors='replace')
+    )
+    return Response({'received': True})
+
 class PaymentListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PaymentSerializer
@@ -155,6 +220,24 @@ class AdminShipmentDetailView(generics.RetrieveUpdateAPIView):
     queryset = Shipment.objects.all()
     serializer_class = ShipmentUpdateSerializer
     permission_classes = [permissions.IsAdminUser]
+    
+    # Statut -> (horodatage, notification)
+    STATUS_EVENTS = {
+        'shipped': ('shipped_at', 'shipment_shipped'),
+        'delivered': ('delivered_at', 'shipment_delivered'),
+    }
+    
+    def perform_update(self, serializer):
+        old_status = serializer.instance.status
+        with transaction.atomic():
+            shipment = serializer.save()
+            event = self.STATUS_EVENTS.get(shipment.status)
+            if event and shipment.status != old_status:
+                timestamp_field, notification = event
+                if getattr(shipment, timestamp_field) is None:
+                    setattr(shipment, timestamp_field, timezone.now())
+                    shipment.save(update_fields=[timestamp_field])
+                enqueue_notification(notification, shipment.user, shipment_context(shipment))
 
 class AdminShippingRateListCreateView(generics.ListCreateAPIView):
     queryset = ShippingRate.objects.all()
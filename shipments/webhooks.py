@@ -0,0 +1,221 @@
+"""
+Ingestion asynchrone des notifications de paiement.
+
+Le récepteur HTTP vérifie la signature puis insère le corps brut dans
+PaymentWebhookEvent ; les workers (commande process_payment_webhooks)
+appliquent ensuite les événements par lots aux paiements et expéditions.
+Un événement dont le montant diffère du paiement est mis de côté pour
+vérification au lieu de compléter le paiement.
+"""
+import hashlib
+import hmac
+import json
+import uuid
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notifications.outbox import enqueue_notifications, payment_context
+from reports.rollups import mark_shipments_dirty
+from .models import Payment, PaymentWebhookEvent, Shipment
+
+ParsedEvent = namedtuple('ParsedEvent', ['transaction_id', 'reference', 'succeeded', 'amount'])
+
+SUCCESS_STATUSES = {'completed', 'success', 'successful', 'paid'}
+STRIPE_SUCCESS_TYPES = {'payment_intent.succeeded', 'charge.succeeded'}
+
+
+def webhook_secret(provider):
+    return settings.PAYMENT_WEBHOOK_SECRETS.get(provider) or ''
+
+
+def sign_payload(secret, body):
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(provider, body, headers):
+    """
+    Vérifie la signature HMAC-SHA256 du fournisseur. Sans secret configuré,
+    les événements ne sont acceptés qu'en DEBUG (développement local).
+    """
+    secret = webhook_secret(provider)
+    if not secret:
+        return settings.DEBUG
+
+    if provider == 'stripe':
+        # Format Stripe : "t=<timestamp>,v1=<signature>"
+        parts = dict(
+            item.split('=', 1) for item in headers.get('Stripe-Signature', '').split(',') if '=' in item
+        )
+        signed_payload = f"{parts.get('t', '')}.".encode() + body
+        signature = parts.get('v1', '')
+    else:
+        signed_payload = body
+        signature = headers.get('X-Webhook-Signature', '')
+
+    return hmac.compare_digest(sign_payload(secret, signed_payload), signature)
+
+
+def _amount(value, cents=False):
+    """Montant notifié en Decimal (None si absent)"""
+    if value is None or value == '':
+        return None
+    amount = Decimal(str(value))
+    if not amount.is_finite():
+        raise InvalidOperation(value)
+    return amount / 100 if cents else amount
+
+
+def parse_event(provider, payload):
+    """Extrait transaction_id, référence du paiement et succès d'un corps brut"""
+    data = json.loads(payload)
+
+    if provider == 'stripe':
+        obj = data.get('data', {}).get('object', {})
+        return ParsedEvent(
+            transaction_id=str(obj.get('id') or ''),
+            reference=str(obj.get('metadata', {}).get('payment_id') or ''),
+            succeeded=data.get('type') in STRIPE_SUCCESS_TYPES,
+            # Stripe notifie en centimes
+            amount=_amount(obj.get('amount_received', obj.get('amount')), cents=True),
+        )
+
+    # MonCash et virements bancaires : format plat
+    return ParsedEvent(
+        transaction_id=str(data.get('transaction_id') or data.get('transactionId') or ''),
+        reference=str(data.get('reference') or data.get('orderId') or ''),
+        succeeded=str(data.get('status', 'completed')).lower() in SUCCESS_STATUSES,
+        amount=_amount(data.get('amount')),
+    )
+
+
+def _split_references(references):
+    """Sépare les références en identifiants de Payment (UUID) et payment_reference"""
+    payment_ids, payment_references = set(), set()
+    for reference in references:
+        try:
+            payment_ids.add(uuid.UUID(reference))
+        except ValueError:
+            payment_references.add(reference)
+    return payment_ids, payment_references
+
+
+def process_pending_events(batch_size=500):
+    """
+    Applique un lot d'événements en attente et retourne le nombre d'événements traités.
+
+    Les lignes sont réservées avec SKIP LOCKED : plusieurs workers peuvent
+    tourner en parallèle sans traiter deux fois le même événement.
+    """
+    with transaction.atomic():
+        events = list(
+            PaymentWebhookEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        now = timezone.now()
+        parsed = {}
+        for event in events:
+            event.processed_at = now
+            try:
+                result = parse_event(event.provider, event.payload)
+            except (ValueError, AttributeError, TypeError, InvalidOperation):
+                event.status = 'failed'
+                event.error = 'Payload invalide'
+                continue
+
+            event.transaction_id = result.transaction_id[:200]
+            if not result.succeeded or not result.transaction_id or not result.reference:
+                event.status = 'ignored'
+                event.error = 'Événement sans paiement réussi'
+                continue
+            parsed[event.pk] = result
+
+        # Déduplication sur transaction_id contre les paiements déjà complétés
+        seen_transactions = set(
+            Payment.objects.filter(
+                transaction_id__in={result.transaction_id for result in parsed.values()},
+                status='completed'
+            ).values_list('transaction_id', flat=True)
+        )
+
+        payment_ids, payment_references = _split_references(
+            {result.reference for result in parsed.values()}
+        )
+        payment_filter = Q(id__in=payment_ids) | Q(payment_reference__in=payment_references)
+
+        # Verrouiller les expéditions avant de relire les paiements (même ordre que confirm_payment)
+        list(
+            Shipment.objects.select_for_update()
+            .filter(pk__in=Payment.objects.filter(payment_filter).values('shipment_id'))
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        payments_by_reference = {}
+        for payment in Payment.objects.filter(payment_filter, status='pending').select_related('shipment__user'):
+            payments_by_reference[str(payment.id)] = payment
+            if payment.payment_reference:
+                payments_by_reference[payment.payment_reference] = payment
+
+        completed_payments = {}
+        paid_shipment_ids = set()
+        for event in events:
+            result = parsed.get(event.pk)
+            if result is None:
+                continue
+
+            if result.transaction_id in seen_transactions:
+                event.status = 'duplicate'
+                continue
+
+            try:
+                reference = str(uuid.UUID(result.reference))
+            except ValueError:
+                reference = result.reference
+            payment = payments_by_reference.get(reference)
+            if payment is None or payment.pk in completed_payments:
+                event.status = 'ignored'
+                event.error = 'Paiement introuvable ou déjà traité'
+                continue
+
+            if result.amount != payment.amount:
+                # Le paiement reste en attente : la finance tranche
+                event.status = 'review'
+                event.error = (
+                    'Montant absent' if result.amount is None
+                    else f'Montant notifié {result.amount} différent de {payment.amount}'
+                )[:200]
+                continue
+
+            payment.status = 'completed'
+            payment.transaction_id = result.transaction_id
+            payment.completed_at = now
+            completed_payments[payment.pk] = payment
+            paid_shipment_ids.add(payment.shipment_id)
+            seen_transactions.add(result.transaction_id)
+            event.status = 'applied'
+
+        Payment.objects.bulk_update(
+            completed_payments.values(), ['status', 'transaction_id', 'completed_at']
+        )
+        Shipment.objects.filter(pk__in=paid_shipment_ids, status='pending').update(
+            status='paid', paid_at=now
+        )
+        mark_shipments_dirty(paid_shipment_ids)
+        enqueue_notifications('payment_received', [
+            (payment.shipment.user, payment_context(payment, payment.shipment.user))
+            for payment in completed_payments.values()
+        ])
+        PaymentWebhookEvent.objects.bulk_update(
+            events, ['status', 'transaction_id', 'error', 'processed_at']
+        )
+
+    return len(events)